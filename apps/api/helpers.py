@@ -5,6 +5,7 @@ import copy
 from dateutil.parser import parse
 
 from apps.indicator.models import Price
+from apps.indicator.models.events_elementary import filter_by_elementory_event
 from taskapp.helpers import get_source_name
 
 from settings import SHORT, POLONIEX, USDT, BTC, COUNTER_CURRENCY_CHOICES, SOURCE_CHOICES
@@ -37,6 +38,12 @@ def filter_queryset_by_timestamp(self, queryset=None):
         return queryset
         
 
+def filter_by_event_name(self, queryset):
+    event_name = self.request.query_params.get('event_name', None)
+    if event_name is not None:
+        queryset = filter_by_elementory_event(queryset, event_name)
+    return queryset
+
 def queryset_for_list_with_resample_period(self):
     source = self.request.query_params.get('source', None) # Return from the all sources by default
     transaction_currency = self.kwargs['transaction_currency']
@@ -60,18 +67,20 @@ def queryset_for_list_with_resample_period(self):
     queryset = filter_queryset_by_timestamp(self, queryset)
     return queryset
 
-def queryset_for_list_without_resample_period(self): # for Price and Volume
+def queryset_for_list_without_resample_period(self, model=None, queryset=None): # for Price and Volume
     source = self.request.query_params.get('source', None) # Return from the all sources by default
     transaction_currency = self.kwargs['transaction_currency']
     counter_currency = default_counter_currency(transaction_currency)
+    if queryset is None:
+        queryset = (model or self.model).objects
     if source:
-        queryset = self.model.objects.filter(
+        queryset = queryset.filter(
             source=source,
             transaction_currency=transaction_currency,
             counter_currency=counter_currency,
         )
     else:
-        queryset = self.model.objects.filter(
+        queryset = queryset.filter(
             transaction_currency=transaction_currency,
             counter_currency=counter_currency,
         )
@@ -79,6 +88,36 @@ def queryset_for_list_without_resample_period(self): # for Price and Volume
     queryset = filter_queryset_by_timestamp(self, queryset)
     return queryset
 
+class TieredQuerySet:
+    """
+    Raw ticks followed by older compacted TickBar rows (or the other way round for ascending order).
+    Supports what CursorPagination needs: order_by(), filter() and slicing. Bars are queried
+    only when a page reaches past the raw ticks.
+    """
+    def __init__(self, raw, bars):
+        self.raw = raw
+        self.bars = bars
+
+    def order_by(self, *fields):
+        return TieredQuerySet(self.raw.order_by(*fields), self.bars.order_by(*fields))
+
+    def filter(self, *args, **kwargs):
+        return TieredQuerySet(self.raw.filter(*args, **kwargs), self.bars.filter(*args, **kwargs))
+
+    def __getitem__(self, item):
+        assert isinstance(item, slice) and item.step is None, "Only slicing is supported"
+        newest_first = self.raw.query.order_by and self.raw.query.order_by[0].startswith('-')
+        first, second = (self.raw, self.bars) if newest_first else (self.bars, self.raw)
+        start = item.start or 0
+
+        results = list(first[start:item.stop])
+        if item.stop is not None and len(results) == item.stop - start:
+            return results
+        second_start = 0 if results else max(0, start - first.count())
+        second_stop = None if item.stop is None else second_start + item.stop - start - len(results)
+        return results + list(second[second_start:second_stop])
+
+
 def replace_exchange_code_with_name(items):
     replaced = {}
     for item in items:
@@ -3,7 +3,7 @@ import json
 from rest_framework import serializers
 
 from apps.signal.models import Signal
-from apps.indicator.models import Price, PriceResampl, Volume, Rsi, EventsElementary
+from apps.indicator.models import Price, PriceResampl, Volume, Rsi, EventsElementaryBits
 
 
 # ResampledPrice (model: PriceResampl)
@@ -45,10 +45,16 @@ class RsiSerializer(serializers.ModelSerializer):
 # EventsElementary
 class EventsElementarySerializer(serializers.ModelSerializer):
 
+    # fired events of the bar {event_name: event_value}, expanded from the bitmask
+    events = serializers.SerializerMethodField()
+
+    def get_events(self, object):
+        return object.get_events()
+
     class Meta:
-        model = EventsElementary
+        model = EventsElementaryBits
         fields = ['source', 'resample_period', 'transaction_currency', 'counter_currency', 'timestamp',\
-                    'event_name', 'event_value', 'event_second_value']
+                    'events', 'rsi_value']
 
 
 # Price (model: Price)
@@ -6,14 +6,13 @@ from apps.api.serializers import EventsElementarySerializer
 from apps.api.permissions import RestAPIPermission
 from apps.api.paginations import StandardResultsSetPagination, OneRecordPagination
 
-from apps.api.helpers import filter_queryset_by_timestamp, queryset_for_list_with_resample_period
+from apps.api.helpers import filter_queryset_by_timestamp, queryset_for_list_with_resample_period, filter_by_event_name
 
-from apps.indicator.models import EventsElementary
 
 
 
 class ListEventsElementary(ListAPIView):
-    """Return list of elementary events.
+    """Return list of elementary events, one item with all events of a pair fired at the same time.
 
     /api/v2/events-elementary/
 
@@ -41,15 +40,15 @@ class ListEventsElementary(ListAPIView):
     permission_classes = (RestAPIPermission, )
     pagination_class = StandardResultsSetPagination
     serializer_class = EventsElementarySerializer
-    filter_fields = ('source', 'resample_period', 'transaction_currency', 'counter_currency', 'event_name')
+    filter_fields = ('source', 'resample_period', 'transaction_currency', 'counter_currency')
 
     model = serializer_class.Meta.model
     def get_queryset(self):
         queryset = filter_queryset_by_timestamp(self)
-        return queryset
+        return filter_by_event_name(self, queryset)
 
 class ListEventElementary(ListAPIView):
-    """Return list of elementary events for {transaction_currency}.
+    """Return list of elementary events for {transaction_currency}, one item with all events fired at the same time.
 
     /api/v2/events-elementary/{transaction_currency}
 
@@ -77,10 +76,11 @@ class ListEventElementary(ListAPIView):
     serializer_class = EventsElementarySerializer
     pagination_class =  OneRecordPagination
 
-    filter_fields = ('source', 'counter_currency', 'event_name')
+    filter_fields = ('source', 'counter_currency')
 
     model = serializer_class.Meta.model
 
     def get_queryset(self):
         queryset = queryset_for_list_with_resample_period(self)
-        return queryset 
+        return filter_by_event_name(self, queryset)
+
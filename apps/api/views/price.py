@@ -4,14 +4,16 @@ from apps.api.serializers import PriceSerializer
 from apps.api.permissions import RestAPIPermission
 from apps.api.paginations import StandardResultsSetPagination, OneRecordPagination
 
-from apps.api.helpers import filter_queryset_by_timestamp, queryset_for_list_without_resample_period
+from apps.api.helpers import filter_queryset_by_timestamp, queryset_for_list_without_resample_period, TieredQuerySet
 
-from apps.indicator.models import Price
+from apps.indicator.models import TickBar
+from apps.indicator.models.price import price_ticks
 
 
 
 class ListPrices(ListAPIView):
     """Return list of prices from Price model. Thise are raw, non resampled prices from exchange tickers.
+    Ticks older than TICKS_COMPACT_AFTER_DAYS are returned as 10 minute mean prices from TickBar model.
 
     /api/v2/prices/
 
@@ -43,13 +45,18 @@ class ListPrices(ListAPIView):
     model = serializer_class.Meta.model
     
     def get_queryset(self):
-        queryset = filter_queryset_by_timestamp(self, self.model.objects)
+        queryset = filter_queryset_by_timestamp(self, price_ticks())
         return queryset
 
+    def filter_queryset(self, queryset):
+        bars = filter_queryset_by_timestamp(self, TickBar.objects.filter(price__isnull=False))
+        return TieredQuerySet(super().filter_queryset(queryset), super().filter_queryset(bars))
+
 
 class ListPrice(ListAPIView):
     """Return list of prices from Price model for {transaction_currency} with default counter_currency. 
     Default counter_currency is BTC. For BTC itself, counter_currency is USDT.
+    Ticks older than TICKS_COMPACT_AFTER_DAYS are returned as 10 minute mean prices from TickBar model.
     
     /api/v2/prices/{transaction_currency}
 
@@ -80,5 +87,9 @@ class ListPrice(ListAPIView):
     model = serializer_class.Meta.model
 
     def get_queryset(self):
-        queryset = queryset_for_list_without_resample_period(self)
+        queryset = queryset_for_list_without_resample_period(self, queryset=price_ticks())
         return queryset
+
+    def filter_queryset(self, queryset):
+        bars = queryset_for_list_without_resample_period(self, model=TickBar).filter(price__isnull=False)
+        return TieredQuerySet(super().filter_queryset(queryset), super().filter_queryset(bars))
@@ -7,7 +7,7 @@ from apps.api.permissions import RestAPIPermission
 
 from settings import EXCHANGE_MARKETS, COUNTER_CURRENCIES
 
-from apps.indicator.models import Price
+from apps.indicator.models.price import price_ticks
 
 from apps.api.helpers import group_items, replace_exchange_code_with_name, get_counter_currency_index, get_source_index
 
@@ -34,8 +34,8 @@ class TransactionCurrenciesView(APIView):
         exchange = request.query_params.get('exchange', None)
         transaction_currency = request.query_params.get('transaction_currency', None)
 
-        timestamp_qs = Price.objects.values('timestamp').order_by('-timestamp')
-        res_qs = Price.objects.values('source', 'transaction_currency', 'counter_currency')
+        timestamp_qs = price_ticks().values('timestamp').order_by('-timestamp')
+        res_qs = price_ticks().values('source', 'transaction_currency', 'counter_currency')
 
         if (exchange is not None) and (exchange in EXCHANGE_MARKETS):
             source =  get_source_index(exchange)
@@ -1,6 +1,6 @@
 import json
 import csv
-from apps.indicator.models import Price
+from apps.indicator.models.price import price_ticks
 from django.http import HttpResponse
 from django.views.generic import View
 
@@ -38,7 +38,7 @@ class CSV(View):
 
         elif request.GET.get('btc_prices', None):
 
-            for price in Price.objects.filter(transaction_currency="BTC").all():
+            for price in price_ticks().filter(transaction_currency="BTC").all():
                 writer.writerow([price.transaction_currency, price.price, str(price.timestamp)])
 
         return response
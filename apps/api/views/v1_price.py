@@ -3,7 +3,7 @@ import json
 from django.http import HttpResponse
 from django.views.generic import View
 
-from apps.indicator.models import Price as PriceModel
+from apps.indicator.models.price import price_ticks
 from settings import BTC
 
 
@@ -24,7 +24,7 @@ class Price(View):
         assert len(transaction_currency) > 1
         assert len(transaction_currency) < 8
 
-        price_object = PriceModel.objects.filter(transaction_currency=transaction_currency, counter_currency=counter_currency
+        price_object = price_ticks().filter(transaction_currency=transaction_currency, counter_currency=counter_currency
                                                  ).order_by('-timestamp').first()
         if price_object:
             response = {
@@ -3,7 +3,7 @@ import json
 from django.http import HttpResponse
 from django.views.generic import View
 
-from apps.indicator.models import Volume as VolumeModel
+from apps.indicator.models.volume import volume_ticks
 
 
 class Volume(View):
@@ -22,7 +22,7 @@ class Volume(View):
         assert len(transaction_currency) > 1
         assert len(transaction_currency) < 8
 
-        volume_data = VolumeModel.objects.filter(transaction_currency=transaction_currency
+        volume_data = volume_ticks().filter(transaction_currency=transaction_currency
                                                  ).order_by('-timestamp').first()
         if volume_data:
             response = {
@@ -6,7 +6,7 @@ from apps.api.paginations import StandardResultsSetPagination, OneRecordPaginati
 
 from apps.api.helpers import filter_queryset_by_timestamp, queryset_for_list_without_resample_period
 
-from apps.indicator.models import Volume
+from apps.indicator.models.volume import volume_ticks
 
 
 
@@ -44,7 +44,7 @@ class ListVolumes(ListAPIView):
     model = serializer_class.Meta.model
     
     def get_queryset(self):
-        queryset = filter_queryset_by_timestamp(self)
+        queryset = filter_queryset_by_timestamp(self, volume_ticks())
         return queryset
 
 
@@ -79,5 +79,5 @@ class ListVolume(ListAPIView):
     model = serializer_class.Meta.model
 
     def get_queryset(self):
-        queryset = queryset_for_list_without_resample_period(self)
+        queryset = queryset_for_list_without_resample_period(self, queryset=volume_ticks())
         return queryset
@@ -0,0 +1,171 @@
+"""
+Streaming resampling of incoming ticks into PriceResampl bars.
+
+Running bars are kept in the process for every (source, pair, period) and updated as ticks arrive,
+mean and variance with Welford's algorithm, so a bar is ready a few seconds after its period closes
+instead of being recomputed from raw ticks by the scheduled indicator run.
+Bars are the same as in resample_source: a bar at timestamp T covers ticks in (T - period, T].
+The first bar after a start is incomplete and is left to resample_source.
+"""
+import logging
+import threading
+import time
+from datetime import datetime
+
+from django.db import connection
+
+from apps.channel.ingestion import build_ticks
+from apps.common.utilities.db import bulk_insert_ignore
+from apps.indicator.models import PriceResampl
+
+from settings import PERIODS_LIST
+
+
+
+logger = logging.getLogger(__name__)
+
+
+class RunningBar:
+    "OHLC, mean and variance of a bar, updated one tick at a time"
+
+    def __init__(self):
+        self.first_timestamp = self.last_timestamp = None
+        self.first_price = self.last_price = None
+        self.low_price = self.high_price = None
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0 # sum of squared differences from the mean
+        self._timestamps = set() # a redelivered tick is counted once
+
+    def add(self, price, timestamp):
+        if timestamp in self._timestamps:
+            return False
+        self._timestamps.add(timestamp)
+
+        if self.count == 0 or timestamp < self.first_timestamp:
+            self.first_timestamp, self.first_price = timestamp, price
+        if self.count == 0 or timestamp >= self.last_timestamp:
+            self.last_timestamp, self.last_price = timestamp, price
+        self.low_price = price if self.low_price is None else min(self.low_price, price)
+        self.high_price = price if self.high_price is None else max(self.high_price, price)
+
+        self.count += 1
+        delta = price - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (price - self.mean)
+        return True
+
+    @property
+    def variance(self):
+        "Population variance, same as VAR_POP in resample_source"
+        return self._m2 / self.count if self.count else None
+
+    def to_price_resampl(self, source, transaction_currency, counter_currency, resample_period, bar_timestamp):
+        # NOTE: open/close follow resample_source and PriceResampl.compute,
+        # open_price is the most recent tick and close_price is the earliest one
+        return PriceResampl(
+            source=source,
+            transaction_currency=transaction_currency,
+            counter_currency=counter_currency,
+            resample_period=resample_period,
+            timestamp=datetime.utcfromtimestamp(bar_timestamp),
+            open_price=int(self.last_price),
+            close_price=int(self.first_price),
+            low_price=int(self.low_price),
+            high_price=int(self.high_price),
+            midpoint_price=int((self.high_price + self.low_price) / 2),
+            mean_price=int(self.mean),
+            price_variance=self.variance,
+            price_count=self.count,
+        )
+
+
+class BarStream:
+
+    def __init__(self, periods=PERIODS_LIST, grace_seconds=10):
+        """
+        :param periods: resample periods in minutes
+        :param grace_seconds: a bar is saved that long after its period closed, later ticks of the bar are not counted
+        """
+        self._periods = list(periods)
+        self._grace_seconds = grace_seconds
+        self._started_at = time.time()
+
+        self._lock = threading.Lock() # guards _bars and counters
+        self._bars = {} # (source, transaction_currency, counter_currency, resample_period, bar timestamp): RunningBar
+        self.late_ticks = 0
+        self.saved_bars = 0
+
+        self._stopped = threading.Event()
+        self._flusher = threading.Thread(target=self._flush_periodically, name='bar-stream-flusher', daemon=True)
+        self._flusher.start()
+
+    def add_items(self, items):
+        "Add price items in the standart format of poll_queue, other items are ignored"
+        prices, _, _ = build_ticks(items)
+        self.add_prices(prices)
+
+    def add_prices(self, prices, now=None):
+        "Add unsaved Price objects to the running bars"
+        now = time.time() if now is None else now
+        with self._lock:
+            for price in prices:
+                for resample_period in self._periods:
+                    period_seconds = resample_period * 60
+                    bar_timestamp = -(-price.timestamp // period_seconds) * period_seconds
+                    if bar_timestamp + self._grace_seconds <= now:
+                        self.late_ticks += 1 # bar is closed, resample_source picks the tick up if the bar is missing
+                        continue
+                    key = (price.source, price.transaction_currency, price.counter_currency, resample_period, bar_timestamp)
+                    self._bars.setdefault(key, RunningBar()).add(price.price, price.timestamp)
+
+    def flush(self, now=None):
+        "Save closed bars with one batch insert, bars already computed by resample_source are kept. Return number of saved bars"
+        now = time.time() if now is None else now
+        with self._lock:
+            closed_keys = [key for key in self._bars if key[4] + self._grace_seconds <= now]
+            closed = [(key, self._bars.pop(key)) for key in closed_keys]
+        if not closed:
+            return 0
+
+        new_objects = []
+        for (source, transaction_currency, counter_currency, resample_period, bar_timestamp), bar in closed:
+            if bar_timestamp - resample_period * 60 < self._started_at:
+                continue # we missed ticks of this bar before the start
+            new_objects.append(bar.to_price_resampl(source, transaction_currency, counter_currency, resample_period, bar_timestamp))
+        if not new_objects:
+            return 0
+
+        existing = set(PriceResampl.objects.filter(
+            source__in={bar.source for bar in new_objects},
+            resample_period__in={bar.resample_period for bar in new_objects},
+            timestamp__gte=min(bar.timestamp for bar in new_objects),
+            timestamp__lte=max(bar.timestamp for bar in new_objects),
+        ).values_list('source', 'transaction_currency', 'counter_currency', 'resample_period', 'timestamp'))
+        new_objects = [bar for bar in new_objects if (bar.source, bar.transaction_currency, bar.counter_currency,
+                                                      bar.resample_period, bar.timestamp) not in existing]
+        # resample_source can save the same bar between the check and the insert, the unique key keeps its one
+        saved = bulk_insert_ignore(PriceResampl, new_objects)
+
+        with self._lock:
+            self.saved_bars += saved
+        logger.info("Saved {} streamed bars".format(saved))
+        return saved
+
+    def stats(self):
+        with self._lock:
+            return {'running_bars': len(self._bars), 'saved_bars': self.saved_bars, 'late_ticks': self.late_ticks}
+
+    def close(self):
+        "Stop the flusher, bars of open periods are dropped"
+        self._stopped.set()
+        self._flusher.join()
+        self.flush()
+
+    def _flush_periodically(self):
+        while not self._stopped.wait(1):
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Error saving streamed bars") # bars are lost, resample_source computes them
+        connection.close()
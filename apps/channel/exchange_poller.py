@@ -0,0 +1,156 @@
+"""
+Asyncio poller for exchange tickers.
+
+Tickers from all EXCHANGE_MARKETS are fetched concurrently over keep-alive connections,
+converted to the standart item format and saved through the bulk ingestion path.
+"""
+import asyncio
+import logging
+import time
+
+import aiohttp
+
+from apps.channel.ingestion import save_ticks
+
+from settings import EXCHANGE_MARKETS, COUNTER_CURRENCIES
+
+
+
+logger = logging.getLogger(__name__)
+
+EXCHANGE_TICKER_URLS = {
+    'poloniex': 'https://poloniex.com/public?command=returnTicker',
+    'binance': 'https://api.binance.com/api/v1/ticker/24hr',
+    'bittrex': 'https://bittrex.com/api/v1.1/public/getmarketsummaries',
+}
+
+DEFAULT_TIMEOUT = 20 # seconds, per exchange request
+DEFAULT_MIN_INTERVAL = 10 # seconds between two requests to one exchange
+
+
+def _items(source, symbol, price, volume, timestamp):
+    return [
+        {'source': source, 'category': 'price', 'symbol': symbol, 'value': price, 'timestamp': timestamp},
+        {'source': source, 'category': 'volume', 'symbol': symbol, 'value': volume, 'timestamp': timestamp},
+    ]
+
+# a delisted or malformed ticker must not drop the whole exchange: fields are read with get() and
+# items with missing values or symbols are rejected one by one in build_ticks
+
+def parse_poloniex(data, timestamp):
+    # {"BTC_ETH": {"last": "0.07", "baseVolume": "1234.5", ...}, ...}
+    items = []
+    for currency_pair, ticker in data.items():
+        if not isinstance(ticker, dict):
+            continue
+        counter_currency, _, transaction_currency = str(currency_pair).partition('_')
+        items += _items('poloniex', transaction_currency + '/' + counter_currency, ticker.get('last'), ticker.get('baseVolume'), timestamp)
+    return items
+
+def parse_binance(data, timestamp):
+    # [{"symbol": "ETHBTC", "lastPrice": "0.07", "quoteVolume": "1234.5", ...}, ...]
+    items = []
+    for ticker in data:
+        if not isinstance(ticker, dict):
+            continue
+        symbol = str(ticker.get('symbol') or '')
+        counter_currency = next((cc for cc in COUNTER_CURRENCIES if symbol.endswith(cc)), None)
+        if counter_currency is None:
+            continue
+        transaction_currency = symbol[:-len(counter_currency)]
+        items += _items('binance', transaction_currency + '/' + counter_currency, ticker.get('lastPrice'), ticker.get('quoteVolume'), timestamp)
+    return items
+
+def parse_bittrex(data, timestamp):
+    # {"success": true, "result": [{"MarketName": "BTC-LTC", "Last": 0.07, "BaseVolume": 1234.5, ...}, ...]}
+    items = []
+    for ticker in data.get('result') or []:
+        if not isinstance(ticker, dict):
+            continue
+        counter_currency, _, transaction_currency = str(ticker.get('MarketName') or '').partition('-')
+        items += _items('bittrex', transaction_currency + '/' + counter_currency, ticker.get('Last'), ticker.get('BaseVolume'), timestamp)
+    return items
+
+TICKER_PARSERS = {
+    'poloniex': parse_poloniex,
+    'binance': parse_binance,
+    'bittrex': parse_bittrex,
+}
+
+
+class ExchangePoller:
+    """
+    Fetch tickers from several exchanges concurrently.
+    One pooled session is reused between polls, so connections are kept alive.
+    """
+
+    def __init__(self, exchanges=EXCHANGE_MARKETS, urls=None, timeouts=None, min_intervals=None, loop=None):
+        """
+        :param exchanges: exchange names, see EXCHANGE_TICKER_URLS
+        :param urls: override ticker urls, {'poloniex': 'http://localhost:8080/poloniex'}
+        :param timeouts: per exchange timeouts in seconds, DEFAULT_TIMEOUT by default
+        :param min_intervals: per exchange rate limit (seconds between requests), DEFAULT_MIN_INTERVAL by default
+        """
+        self.exchanges = [exchange for exchange in exchanges if exchange in TICKER_PARSERS]
+        self.urls = dict(EXCHANGE_TICKER_URLS, **(urls or {}))
+        self.timeouts = timeouts or {}
+        self.min_intervals = min_intervals or {}
+        self.loop = loop or asyncio.get_event_loop()
+
+        self._last_request_time = {}
+        self._session = None
+
+    def _get_session(self):
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit_per_host=2, keepalive_timeout=120, loop=self.loop)
+            self._session = aiohttp.ClientSession(connector=connector, loop=self.loop)
+        return self._session
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+
+    async def _wait_rate_limit(self, exchange):
+        min_interval = self.min_intervals.get(exchange, DEFAULT_MIN_INTERVAL)
+        last_request_time = self._last_request_time.get(exchange)
+        if last_request_time is not None:
+            delay = last_request_time + min_interval - time.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        self._last_request_time[exchange] = time.time()
+
+    async def fetch_tickers(self, exchange):
+        "Return items in the standart format for one exchange, or [] if the exchange failed"
+        await self._wait_rate_limit(exchange)
+        timeout = aiohttp.ClientTimeout(total=self.timeouts.get(exchange, DEFAULT_TIMEOUT))
+        start = time.time()
+        try:
+            async with self._get_session().get(self.urls[exchange], timeout=timeout) as response:
+                response.raise_for_status()
+                data = await response.json(content_type=None)
+            items = TICKER_PARSERS[exchange](data, time.time())
+        except asyncio.TimeoutError:
+            logger.warning("Timeout fetching tickers from {}".format(exchange))
+            return []
+        except (aiohttp.ClientError, ValueError, KeyError, TypeError) as e:
+            logger.warning("Error fetching tickers from {}: {}".format(exchange, e))
+            return []
+        logger.debug("Fetched {} items from {} in {:.2f}s".format(len(items), exchange, time.time() - start))
+        return items
+
+    async def poll_once(self):
+        "Fetch all exchanges concurrently, return {exchange: items}"
+        results = await asyncio.gather(*[self.fetch_tickers(exchange) for exchange in self.exchanges], loop=self.loop)
+        return dict(zip(self.exchanges, results))
+
+    def poll_and_save(self):
+        "One poll of all exchanges saved with the bulk ingestion path"
+        start = time.time()
+        tickers = self.loop.run_until_complete(self.poll_once())
+        for exchange, items in tickers.items():
+            if items:
+                counts = save_ticks(items)
+                logger.info("Tickers for {} saved to db. Ticks: {ticks}, prices: {prices}, volumes: {volumes}, duplicates: {duplicates}, rejected: {rejected}".format(
+                    exchange, **counts))
+        logger.info("Polled {} exchanges in {:.2f}s".format(len(tickers), time.time() - start))
+        return tickers
@@ -1,6 +1,9 @@
 import logging
+import threading
 import time
 
+from concurrent.futures import ThreadPoolExecutor, wait
+
 import boto3
 
 from settings import AWS_OPTIONS, DEBUG
@@ -12,22 +15,70 @@ logger = logging.getLogger(__name__)
 if not DEBUG:
     logging.getLogger("botocore").setLevel(logging.INFO)
 
+MAX_SQS_BATCH_SIZE = 10 # SQS limit for receive_message, delete_message_batch and change_message_visibility_batch
+
+_current_message = threading.local()
+
+def get_receive_time():
+    "When the message handled in this thread was received from SQS, None outside of SqsListener handlers"
+    return getattr(_current_message, 'receive_time', None)
+
+
+class ListenerStats:
+    "Thread safe counters for processed messages and handler latency"
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started_at = time.time()
+        self.processed = 0
+        self.failed = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+
+    def record(self, latency, ok=True):
+        with self._lock:
+            if ok:
+                self.processed += 1
+            else:
+                self.failed += 1
+            self.latency_total += latency
+            self.latency_max = max(self.latency_max, latency)
+
+    def snapshot(self):
+        with self._lock:
+            handled = self.processed + self.failed
+            elapsed = time.time() - self.started_at
+            return {
+                'processed': self.processed,
+                'failed': self.failed,
+                'messages_per_sec': handled / elapsed if elapsed else 0.0,
+                'latency_avg': self.latency_total / handled if handled else 0.0,
+                'latency_max': self.latency_max,
+            }
+
 
 class SqsListener:
 
     def __init__(self, queue_name, **kwargs):
         """
         :param queue_name: name of sqs queue
-        :param kwargs: settings for sqs listener, interval=10, region_name='us-east-1'
+        :param kwargs: settings for sqs listener, interval=10, region_name='us-east-1', wait_time=0,
+            max_messages=1, concurrency=1, visibility_timeout=30, stats_interval=60
         """
 
         self._queue_name = queue_name
         self._region_name = kwargs.get('region_name', 'us-east-1')
         self._poll_interval = kwargs.get('interval', 10) # by default poll messages every 10 sec
         self._wait_time = kwargs.get('wait_time', 0) #in seconds, wait_time=0 mean short polling
+        self._max_messages = min(kwargs.get('max_messages', 1), MAX_SQS_BATCH_SIZE) # messages per receive_message call
+        self._concurrency = kwargs.get('concurrency', 1) # handler threads
+        self._visibility_timeout = kwargs.get('visibility_timeout', 30) # in seconds, extended while handler is running
+        self._stats_interval = kwargs.get('stats_interval', 60) # log stats every 60 sec
 
+        self.stats = ListenerStats()
+        self.stats_callbacks = [] # called every stats_interval, to log stats of other components
         self._client = self._init_sqs_client()
-    
+
     def _init_sqs_client(self):
         self._session = boto3.Session(
             aws_access_key_id=AWS_OPTIONS['AWS_ACCESS_KEY_ID'],
@@ -39,6 +90,9 @@ class SqsListener:
         return sqs
 
     def listen(self):
+        if self._max_messages > 1 or self._concurrency > 1:
+            return self._listen_batched()
+
         while True:
             # short polling if WaitTimeSecconds=0 or not specified
             # better use long polling
@@ -48,12 +102,18 @@ class SqsListener:
             )
             if 'Messages' in messages:
                 logger.info('SQS messages received: ' + str(len(messages['Messages'])))
+                _current_message.receive_time = time.time()
 
                 for message in messages['Messages']:
                     receipt_handle = message['ReceiptHandle']
 
-                    self.handler(message['Body'])
-                    
+                    try:
+                        self.handler(message['Body'])
+                    except Exception as e:
+                        # keep message in the queue, it will be received again after visibility timeout
+                        logger.error("Error processing SQS message: {}".format(e))
+                        continue
+
                     self._client.delete_message(
                         QueueUrl=self._queue_url,
                         ReceiptHandle=receipt_handle
@@ -61,3 +121,75 @@ class SqsListener:
             else:
                 time.sleep(self._poll_interval)
 
+    def _listen_batched(self):
+        "High-throughput mode: receive up to 10 messages, handle them on a worker pool and delete them in one call"
+        last_stats_time = time.time()
+
+        with ThreadPoolExecutor(max_workers=self._concurrency) as executor:
+            while True:
+                messages = self._client.receive_message(
+                    QueueUrl=self._queue_url,
+                    WaitTimeSeconds=self._wait_time,
+                    MaxNumberOfMessages=self._max_messages,
+                    VisibilityTimeout=self._visibility_timeout,
+                ).get('Messages', [])
+
+                if messages:
+                    logger.debug('SQS messages received: ' + str(len(messages)))
+                    done_messages = self._handle_batch(executor, messages, receive_time=time.time())
+                    self._delete_batch(done_messages)
+                elif not self._wait_time:
+                    time.sleep(self._poll_interval)
+
+                if time.time() - last_stats_time >= self._stats_interval:
+                    last_stats_time = time.time()
+                    logger.info("SQS listener stats: {}".format(self.stats.snapshot()))
+                    for callback in self.stats_callbacks:
+                        callback()
+
+    def _handle_batch(self, executor, messages, receive_time):
+        "Run handler for every message on the pool, return messages handled without errors"
+        futures = {executor.submit(self._timed_handler, message, receive_time): message for message in messages}
+        pending = set(futures)
+
+        # extend visibility timeout of slow messages, so they don't reappear in the queue while we handle them
+        while True:
+            _, pending = wait(pending, timeout=self._visibility_timeout / 2)
+            if not pending:
+                break
+            self._extend_visibility([futures[future] for future in pending])
+
+        return [message for future, message in futures.items() if future.result()]
+
+    def _timed_handler(self, message, receive_time):
+        start = time.time()
+        _current_message.receive_time = receive_time
+        try:
+            self.handler(message['Body'])
+        except Exception as e:
+            # keep message in the queue, it will be received again after visibility timeout
+            logger.error("Error processing SQS message: {}".format(e))
+            self.stats.record(time.time() - start, ok=False)
+            return False
+        self.stats.record(time.time() - start)
+        return True
+
+    def _extend_visibility(self, messages):
+        logger.debug("Extending visibility timeout for {} messages".format(len(messages)))
+        self._client.change_message_visibility_batch(
+            QueueUrl=self._queue_url,
+            Entries=[
+                {'Id': str(idx), 'ReceiptHandle': message['ReceiptHandle'], 'VisibilityTimeout': self._visibility_timeout}
+                for idx, message in enumerate(messages)
+            ]
+        )
+
+    def _delete_batch(self, messages):
+        if not messages:
+            return
+        response = self._client.delete_message_batch(
+            QueueUrl=self._queue_url,
+            Entries=[{'Id': str(idx), 'ReceiptHandle': message['ReceiptHandle']} for idx, message in enumerate(messages)]
+        )
+        for failed in response.get('Failed', []):
+            logger.error("Error deleting SQS message: {}".format(failed))
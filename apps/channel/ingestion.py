@@ -0,0 +1,115 @@
+"""
+Batched ingestion of exchange ticker items into Tick (and legacy Price and Volume) tables.
+
+Items use the standart format documented in poll_queue:
+    {'source': 'poloniex', 'category': 'price', 'symbol': 'BTC/USDT', 'value': 12345678, 'timestamp': 1522066118.23}
+"""
+import logging
+
+from django.db import transaction
+
+from apps.common.utilities.db import bulk_insert_ignore, copy_insert_ignore
+from apps.indicator.models import Price, Volume, Tick
+
+from settings import SOURCE_CHOICES, COUNTER_CURRENCY_CHOICES
+from settings import TICKS_WRITE_LEGACY
+
+
+
+logger = logging.getLogger(__name__)
+
+# lookup tables, so we don't scan SOURCE_CHOICES/COUNTER_CURRENCY_CHOICES for every item
+SOURCE_CODES = {source_text: code for code, source_text in SOURCE_CHOICES}
+COUNTER_CURRENCY_CODES = {counter_currency: code for code, counter_currency in COUNTER_CURRENCY_CHOICES}
+
+TRANSACTION_CURRENCY_MAX_LENGTH = Price._meta.get_field('transaction_currency').max_length
+
+
+def build_ticks(items):
+    """
+    Validate items in memory and convert them to unsaved Price and Volume objects.
+    Return (prices, volumes, rejected), where rejected is a number of skipped items.
+    """
+    prices, volumes = [], []
+    rejected = 0
+
+    for item in items:
+        try:
+            source_code = SOURCE_CODES[item['source']]
+            (transaction_currency, counter_currency_text) = item['symbol'].split('/')
+            counter_currency_code = COUNTER_CURRENCY_CODES[counter_currency_text]
+            if not 0 < len(transaction_currency) <= TRANSACTION_CURRENCY_MAX_LENGTH:
+                raise ValueError("Wrong transaction currency: {}".format(transaction_currency))
+            timestamp = float(item['timestamp'])
+
+            if 'price' == item['category']:
+                prices.append(Price(
+                    source=source_code,
+                    transaction_currency=transaction_currency,
+                    counter_currency=counter_currency_code,
+                    price=int(float(item['value']) * 10 ** 8), # convert to satoshi
+                    timestamp=timestamp
+                ))
+            elif 'volume' == item['category']:
+                volumes.append(Volume(
+                    source=source_code,
+                    transaction_currency=transaction_currency,
+                    counter_currency=counter_currency_code,
+                    volume=float(item['value']),
+                    timestamp=timestamp
+                ))
+            else:
+                raise ValueError("Unknown category: {}".format(item['category']))
+        except (KeyError, ValueError, TypeError, AttributeError):
+            # skip unknown source, counter_currency or malformed item
+            rejected += 1
+
+    return prices, volumes, rejected
+
+
+def build_unified_ticks(prices, volumes):
+    """
+    Combine Price and Volume objects with the same source, pair and timestamp into one Tick.
+    A price without volume (or volume without price) gives a Tick with the other column empty.
+    """
+    ticks = {}
+    for price in prices:
+        key = (price.source, price.transaction_currency, price.counter_currency, price.timestamp)
+        ticks.setdefault(key, Tick(
+            source=price.source,
+            transaction_currency=price.transaction_currency,
+            counter_currency=price.counter_currency,
+            timestamp=price.timestamp
+        )).price = price.price
+    for volume in volumes:
+        key = (volume.source, volume.transaction_currency, volume.counter_currency, volume.timestamp)
+        ticks.setdefault(key, Tick(
+            source=volume.source,
+            transaction_currency=volume.transaction_currency,
+            counter_currency=volume.counter_currency,
+            timestamp=volume.timestamp
+        )).volume = volume.volume
+    return list(ticks.values())
+
+
+def save_ticks(items, use_copy=False):
+    """
+    Save items with one bulk insert per model inside one transaction.
+    use_copy=True loads big batches faster with postgres COPY.
+    While TICKS_WRITE_LEGACY is on, ticks are written to Price and Volume too.
+    Rows already saved from a redelivered message are skipped.
+    Return counts: {'ticks': 10, 'prices': 10, 'volumes': 10, 'duplicates': 0, 'rejected': 2}
+    """
+    prices, volumes, rejected = build_ticks(items)
+    ticks = build_unified_ticks(prices, volumes)
+    if not TICKS_WRITE_LEGACY:
+        prices, volumes = [], []
+
+    insert = copy_insert_ignore if use_copy else bulk_insert_ignore
+    with transaction.atomic():
+        ticks_saved = insert(Tick, ticks)
+        prices_saved = insert(Price, prices)
+        volumes_saved = insert(Volume, volumes)
+
+    duplicates = len(ticks) + len(prices) + len(volumes) - ticks_saved - prices_saved - volumes_saved
+    return {'ticks': ticks_saved, 'prices': prices_saved, 'volumes': volumes_saved, 'duplicates': duplicates, 'rejected': rejected}
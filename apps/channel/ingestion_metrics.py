@@ -0,0 +1,155 @@
+"""
+Ingestion lag metrics shared between poll_queue processes through the cache.
+
+Every process aggregates its messages in memory and adds them to per-minute cache counters
+every FLUSH_INTERVAL seconds (cache.incr is atomic in memcached).
+get_ingestion_metrics() reads the last minutes back as histograms and per-source throughput.
+"""
+import logging
+import threading
+import time
+from collections import Counter
+
+from django.core.cache import cache
+
+from settings import SOURCE_CHOICES
+
+
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'ingestion_metrics'
+KEY_TIMEOUT = 2 * 60 * 60 # keep two hours of minute buckets
+FLUSH_INTERVAL = 10 # seconds
+
+# lag histogram upper bounds in seconds, the last bucket is everything slower
+LAG_BUCKETS = (1, 2, 5, 10, 30, 60, 120, 300, 600, 1800, 3600)
+LAG_METRICS = (
+    'exchange_to_receive', # newest tick in the message vs. receive from the queue
+    'receive_to_commit',   # receive vs. transaction commit
+    'exchange_to_commit',  # end to end lag
+)
+
+
+def _bucket(seconds):
+    return next((idx for idx, upper_bound in enumerate(LAG_BUCKETS) if seconds <= upper_bound), len(LAG_BUCKETS))
+
+def _key(minute, name):
+    return '{}:{}:{}'.format(KEY_PREFIX, minute, name)
+
+def _commit_lags(exchange_time, receive_time, commit_time):
+    return {'receive_to_commit': commit_time - receive_time, 'exchange_to_commit': commit_time - exchange_time}
+
+def newest_timestamp(items):
+    "Newest tick timestamp of message items, None if no item has a valid one"
+    timestamps = []
+    for item in items:
+        try:
+            timestamps.append(float(item['timestamp']))
+        except (KeyError, ValueError, TypeError):
+            pass
+    return max(timestamps) if timestamps else None
+
+
+class IngestionMetrics:
+    "Thread safe in-process aggregation of ingestion metrics"
+
+    def __init__(self, flush_interval=FLUSH_INTERVAL):
+        self._lock = threading.Lock()
+        self._flush_interval = flush_interval
+        self._last_flush_time = time.time()
+        self._counters = Counter()
+
+    def record(self, source_name, items, exchange_time, receive_time, commit_time=None):
+        """
+        :param source_name: exchange name, e.g. poloniex
+        :param items: number of items in the message
+        :param exchange_time: newest tick timestamp in the message
+        :param receive_time: when the message was received from the queue
+        :param commit_time: when the items were committed, None if they are not saved yet
+        """
+        lags = {'exchange_to_receive': receive_time - exchange_time}
+        if commit_time is not None:
+            lags.update(_commit_lags(exchange_time, receive_time, commit_time))
+        self._add(receive_time, lags, {'messages': 1, 'items': items, 'items:' + str(source_name): items})
+
+    def record_commit(self, exchange_time, receive_time, commit_time):
+        "Commit lags of a message recorded before with commit_time=None, see TickBuffer"
+        self._add(receive_time, _commit_lags(exchange_time, receive_time, commit_time))
+
+    def _add(self, receive_time, lags, counts=None):
+        minute = int(receive_time // 60)
+        with self._lock:
+            for name, count in (counts or {}).items():
+                self._counters[_key(minute, name)] += count
+            for metric, lag in lags.items():
+                self._counters[_key(minute, '{}:{}'.format(metric, _bucket(lag)))] += 1
+            flush = time.time() - self._last_flush_time >= self._flush_interval
+
+        if flush:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            counters, self._counters = self._counters, Counter()
+            self._last_flush_time = time.time()
+        try:
+            for key, value in counters.items():
+                cache.add(key, 0, KEY_TIMEOUT)
+                cache.incr(key, value)
+        except Exception as e:
+            # metrics must never break ingestion
+            logger.warning("Error saving ingestion metrics: {}".format(e))
+
+
+metrics = IngestionMetrics()
+
+
+def get_ingestion_metrics(minutes=15, now=None):
+    """
+    Sum of the last minutes of metrics from all processes:
+    {'messages': 120, 'items': 9000, 'items_per_message': 75.0, 'items_per_minute': {'poloniex': 300.0, ...},
+     'exchange_to_commit': {'histogram': {'<=1s': 10, ..., '>3600s': 0}, 'p50': 2, 'p95': 10, 'p99': 30}, ...}
+    Percentiles are upper bounds of histogram buckets, None if there are no samples.
+    """
+    current_minute = int((now or time.time()) // 60)
+    minutes_list = range(current_minute - minutes + 1, current_minute + 1)
+    source_names = [source_name for _, source_name in SOURCE_CHOICES]
+
+    names = ['messages', 'items'] + ['items:' + source_name for source_name in source_names]
+    names += ['{}:{}'.format(metric, bucket) for metric in LAG_METRICS for bucket in range(len(LAG_BUCKETS) + 1)]
+    values = cache.get_many([_key(minute, name) for minute in minutes_list for name in names])
+
+    totals = Counter()
+    for minute in minutes_list:
+        for name in names:
+            totals[name] += values.get(_key(minute, name), 0)
+
+    result = {
+        'minutes': minutes,
+        'messages': totals['messages'],
+        'items': totals['items'],
+        'items_per_message': totals['items'] / totals['messages'] if totals['messages'] else 0.0,
+        'items_per_minute': {source_name: totals['items:' + source_name] / minutes
+                             for source_name in source_names if totals['items:' + source_name]},
+    }
+    for metric in LAG_METRICS:
+        counts = [totals['{}:{}'.format(metric, bucket)] for bucket in range(len(LAG_BUCKETS) + 1)]
+        labels = ['<={}s'.format(upper_bound) for upper_bound in LAG_BUCKETS] + ['>{}s'.format(LAG_BUCKETS[-1])]
+        result[metric] = {
+            'histogram': dict(zip(labels, counts)),
+            'p50': _percentile(counts, 0.50),
+            'p95': _percentile(counts, 0.95),
+            'p99': _percentile(counts, 0.99),
+        }
+    return result
+
+def _percentile(counts, fraction):
+    total = sum(counts)
+    if not total:
+        return None
+    running = 0
+    for idx, count in enumerate(counts):
+        running += count
+        if running >= fraction * total:
+            return LAG_BUCKETS[idx] if idx < len(LAG_BUCKETS) else float('inf')
@@ -0,0 +1,38 @@
+import logging
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from apps.channel.models import ExchangeData
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    '''
+    Compress legacy ExchangeData rows: move json from the data column into compressed_data.
+    Rows are processed in small chunks, every chunk in its own transaction.
+    NOTE: postgres reclaims the disk space only after VACUUM FULL (or pg_repack) of the table.
+    '''
+    help = "Compress raw ExchangeData payloads"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500, help="Rows per transaction")
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        logger.info("Compressing legacy ExchangeData payloads...")
+
+        compressed = 0
+        while True:
+            with transaction.atomic():
+                legacy_rows = list(ExchangeData.objects.filter(compressed_data__isnull=True).exclude(data="")[:chunk_size])
+                if not legacy_rows:
+                    break
+                for exchange_data in legacy_rows:
+                    exchange_data.set_payload(exchange_data.payload)
+                    exchange_data.save(update_fields=['data', 'compressed_data'])
+            compressed += len(legacy_rows)
+            logger.info("  ... {} rows compressed".format(compressed))
+
+        logger.info("Done. {} rows compressed".format(compressed))
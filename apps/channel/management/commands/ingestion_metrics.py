@@ -0,0 +1,29 @@
+import json
+import logging
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.channel.ingestion_metrics import get_ingestion_metrics
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    '''
+    Print poll_queue lag histograms and throughput for the last minutes.
+    With --max-lag the command fails when p95 end-to-end lag is higher, use it for alerting
+    before the lag threatens the hourly indicator run.
+    '''
+    help = "Show ingestion lag and throughput metrics"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--minutes', type=int, default=15, help="Time window in minutes")
+        parser.add_argument('--max-lag', type=int, default=None, help="Fail if p95 exchange to commit lag is higher, seconds")
+
+    def handle(self, *args, **options):
+        ingestion_metrics = get_ingestion_metrics(minutes=options['minutes'])
+        self.stdout.write(json.dumps(ingestion_metrics, indent=2, sort_keys=True))
+
+        p95_lag = ingestion_metrics['exchange_to_commit']['p95']
+        if options['max_lag'] is not None and (p95_lag is None or p95_lag > options['max_lag']):
+            raise CommandError("Ingestion lag p95 is {}s, more than {}s (or no messages ingested)".format(p95_lag, options['max_lag']))
@@ -0,0 +1,121 @@
+import csv
+import gzip
+import itertools
+import json
+import logging
+import time
+
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from apps.channel.ingestion import save_ticks, SOURCE_CODES
+from apps.indicator.models.price_resampl import resample_source
+
+from settings import PERIODS_LIST
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    '''
+    Load historical ticks from a CSV or JSONL dump (optionally gzipped).
+    Every row/line is one item in the poll_queue standart format:
+        {"source": "poloniex", "category": "price", "symbol": "BTC/USDT", "value": 8000.5, "timestamp": 1522066118.23}
+    CSV files need a header with the same column names.
+    The file is streamed in chunks, chunks are saved in parallel with COPY, ticks already in DB are skipped.
+    '''
+    help = "Bulk load historical ticks from CSV/JSONL dumps"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Path to .csv, .jsonl, .csv.gz or .jsonl.gz file")
+        parser.add_argument('--chunk-size', type=int, default=20000, help="Items per COPY")
+        parser.add_argument('--workers', type=int, default=4, help="Chunks loaded in parallel")
+        parser.add_argument('--resample', action='store_true', help="Compute resampled prices for the loaded range")
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if path.endswith('.csv') or path.endswith('.csv.gz'):
+            read_items = read_csv_items
+        elif path.endswith('.jsonl') or path.endswith('.jsonl.gz'):
+            read_items = read_jsonl_items
+        else:
+            raise CommandError("Unknown file format: {}, use .csv or .jsonl".format(path))
+
+        logger.info("Loading ticks from {}...".format(path))
+        start = time.time()
+        totals = {'ticks': 0, 'prices': 0, 'volumes': 0, 'duplicates': 0, 'rejected': 0}
+        loaded_ranges = {} # source: [first timestamp, last timestamp] of loaded prices
+        read = 0
+
+        open_file = gzip.open if path.endswith('.gz') else open
+        with open_file(path, 'rt') as dump_file, ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            items = read_items(dump_file)
+            pending = set()
+            while True:
+                chunk = list(itertools.islice(items, options['chunk_size']))
+                if not chunk:
+                    break
+                read += len(chunk)
+                _update_ranges(loaded_ranges, chunk)
+
+                # keep memory constant: not more than two chunks per worker in flight
+                if len(pending) >= options['workers'] * 2:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    _add_counts(totals, done)
+                pending.add(executor.submit(_save_chunk, chunk))
+
+                elapsed = time.time() - start
+                logger.info("  ... {} items read, {:.0f} items/sec".format(read, read / elapsed if elapsed else 0))
+
+            done, _ = wait(pending)
+            _add_counts(totals, done)
+
+        elapsed = time.time() - start
+        logger.info("Done. {} items in {:.1f}s, {:.0f} items/sec: {}".format(
+            read, elapsed, read / elapsed if elapsed else 0, totals))
+
+        if options['resample']:
+            self.resample(loaded_ranges)
+
+    def resample(self, loaded_ranges):
+        for source_name, (start_time, end_time) in loaded_ranges.items():
+            if source_name not in SOURCE_CODES:
+                continue # rejected on load too
+            for resample_period in PERIODS_LIST:
+                saved = resample_source(SOURCE_CODES[source_name], resample_period, end_time, start_time=start_time)
+                logger.info("  ... {} period {}: {} resampled prices saved".format(source_name, resample_period, saved))
+
+
+def read_csv_items(dump_file):
+    return csv.DictReader(dump_file)
+
+def read_jsonl_items(dump_file):
+    for line in dump_file:
+        if line.strip():
+            yield json.loads(line)
+
+def _save_chunk(chunk):
+    try:
+        return save_ticks(chunk, use_copy=True)
+    finally:
+        connection.close() # every worker thread has its own connection
+
+def _add_counts(totals, futures):
+    for future in futures:
+        for key, value in future.result().items():
+            totals[key] += value
+
+def _update_ranges(loaded_ranges, chunk):
+    for item in chunk:
+        if item.get('category') != 'price':
+            continue
+        try:
+            timestamp = float(item['timestamp'])
+            key = item['source']
+        except (KeyError, ValueError, TypeError):
+            continue
+        loaded_range = loaded_ranges.setdefault(key, [timestamp, timestamp])
+        loaded_range[0] = min(loaded_range[0], timestamp)
+        loaded_range[1] = max(loaded_range[1], timestamp)
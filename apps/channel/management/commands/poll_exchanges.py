@@ -0,0 +1,39 @@
+import logging
+import schedule
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.channel.exchange_poller import ExchangePoller
+
+from settings import EXCHANGE_MARKETS
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Polls tickers from all exchanges concurrently every minute"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--exchanges', nargs='+', default=list(EXCHANGE_MARKETS), help="Exchanges to poll")
+        parser.add_argument('--timeout', type=int, default=20, help="Per exchange request timeout, seconds")
+
+    def handle(self, *args, **options):
+        logger.info("Getting ready to poll {}...".format(", ".join(options['exchanges'])))
+        poller = ExchangePoller(
+            exchanges=options['exchanges'],
+            timeouts={exchange: options['timeout'] for exchange in options['exchanges']},
+        )
+        schedule.every().minute.do(poller.poll_and_save)
+
+        keep_going = True
+        while keep_going:
+            try:
+                schedule.run_pending()
+                time.sleep(1)
+            except Exception as e:
+                logger.debug(str(e))
+                logger.info("Exchange poller shut down.")
+                keep_going = False
+
+        poller.loop.run_until_complete(poller.close())
@@ -1,16 +1,19 @@
 import json
 import logging
+import os
+import tempfile
 import time
 
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
 
-#from apps.channel.models.exchange_data import SOURCE_CHOICES
-from apps.indicator.models import Price, Volume
-from taskapp.helpers import get_source_name
+from apps.channel.bar_stream import BarStream
+from apps.channel.incoming_queue import SqsListener, get_receive_time
+from apps.channel.ingestion_metrics import metrics, newest_timestamp
+from apps.channel.ingestion import save_ticks
+from apps.channel.tick_buffer import TickBuffer
 
-from apps.channel.incoming_queue import SqsListener
-
-from settings import INCOMING_SQS_QUEUE, SOURCE_CHOICES, COUNTER_CURRENCY_CHOICES
+from settings import INCOMING_SQS_QUEUE, AWS_OPTIONS
 
 
 
@@ -19,12 +22,49 @@ logger = logging.getLogger(__name__)
 class Command(BaseCommand):
     help = "Polls price data from the incoming queue"
 
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=4, help="Number of handler threads")
+        parser.add_argument('--workers', type=int, default=0, help="Number of pyqs worker processes, 0 to use SqsListener")
+        parser.add_argument('--buffer-rows', type=int, default=0, help="Write-behind: flush buffered items every N rows, 0 to save every message directly")
+        parser.add_argument('--buffer-ms', type=int, default=1000, help="Write-behind: flush buffered items at least every M milliseconds")
+        parser.add_argument('--journal', default=os.path.join(tempfile.gettempdir(), 'poll_queue_ticks.jsonl'),
+                            help="Write-behind: local journal for unflushed items")
+        parser.add_argument('--stream-bars', action='store_true',
+                            help="Resample ticks into PriceResampl bars as they arrive, bars are saved seconds after a period closes")
+
     def handle(self, *args, **options):
         logger.info("Getting ready to poll prices from the queue")
 
-        listener = SqsListener(INCOMING_SQS_QUEUE, wait_time=10)
-        listener.handler = process_message_from_queue
-        listener.listen()
+        if options['workers']:
+            if options['stream_bars']:
+                raise CommandError("--stream-bars keeps running bars in one process, it can't be used with --workers")
+            return poll_with_workers(options['workers'])
+
+        # long polling, up to 10 messages per call, handled on a pool of threads
+        listener = SqsListener(INCOMING_SQS_QUEUE, wait_time=20, max_messages=10, concurrency=options['concurrency'])
+        bar_stream = None
+        if options['stream_bars']:
+            bar_stream = BarStream()
+            listener.stats_callbacks.append(lambda: logger.info("Bar stream stats: {}".format(bar_stream.stats())))
+
+        try:
+            if options['buffer_rows']:
+                # messages are deleted from the queue once journaled, the buffer saves them with COPY later
+                tick_buffer = TickBuffer(options['journal'], flush_rows=options['buffer_rows'], flush_interval_ms=options['buffer_ms'])
+                listener.handler = lambda message_body: buffer_message_from_queue(tick_buffer, message_body, bar_stream)
+                listener.stats_callbacks.append(lambda: logger.info("Tick buffer stats: {}".format(tick_buffer.stats.snapshot())))
+                listener.stats_callbacks.append(metrics.flush)
+                try:
+                    listener.listen()
+                finally:
+                    tick_buffer.close()
+            else:
+                listener.handler = lambda message_body: process_message_from_queue(message_body, bar_stream)
+                listener.stats_callbacks.append(metrics.flush)
+                listener.listen()
+        finally:
+            if bar_stream is not None:
+                bar_stream.close()
 
 
 # * Standart Format
@@ -37,55 +77,62 @@ class Command(BaseCommand):
 #     }, ...
 # ]
 
-def process_message_from_queue(message_body):
+def poll_with_workers(workers):
+    "Run process_message_from_queue in pyqs worker processes, one dyno uses every core"
+    from pyqs.worker import ManagerWorker
+
+    logger.info("Starting {} pyqs workers".format(workers))
+    # children must not share DB sockets with the parent, each of them opens its own connection
+    connections.close_all()
+
+    manager = ManagerWorker(
+        queue_prefixes=[INCOMING_SQS_QUEUE],
+        worker_concurrency=workers,
+        custom_dispatch_func=process_decoded_message,
+        access_key_id=AWS_OPTIONS['AWS_ACCESS_KEY_ID'],
+        secret_access_key=AWS_OPTIONS['AWS_SECRET_ACCESS_KEY'],
+        worker_init_func=connections.close_all,
+    )
+    manager.start()
+    manager.sleep()
+
+
+def process_message_from_queue(message_body, bar_stream=None):
     "Save SQS message to DB: Price and Volume"
-    
-    body_dict = json.loads(message_body)
+    return process_decoded_message(json.loads(message_body), bar_stream)
+
+
+def process_decoded_message(body_dict, bar_stream=None):
+    "Same as process_message_from_queue for a message body already decoded by pyqs"
+    receive_time = get_receive_time() or time.time()
     exchange = json.loads(body_dict['Message'])
-    processed = []
-
-    for item in exchange:
-        #logger.debug("Save {category} for {symbol} from {source}".format(**item))
-    
-        source_code = next((code for code, source_text in SOURCE_CHOICES if source_text==item['source']), None)
-
-        (transaction_currency, counter_curency_text) = item['symbol'].split('/')
-
-        counter_currency_code = next((code for code, counter_currency in COUNTER_CURRENCY_CHOICES if counter_currency==counter_curency_text), None)
-        if None in (source_code, counter_currency_code):
-            continue # skip this source or counter_currency
-
-        if 'price' == item['category']:
-            price = int(float(item['value']) * 10 ** 8) # convert to satoshi
-            try:
-                Price.objects.create(
-                    source=source_code,
-                    transaction_currency=transaction_currency,
-                    counter_currency=counter_currency_code,
-                    price=price,
-                    timestamp=item['timestamp']
-                )
-                processed.append("{}/{}".format(transaction_currency, counter_currency_code))
-                #logger.debug(">>> Price saved: source={}, transaction_currency={}, counter_currency={}, price={}, timestamp={}".format(
-                #            source_code, transaction_currency, counter_currency_code, price, item['timestamp']))
-            except Exception as e:
-                logger.debug(">>>> Error saving Price for {}: {}".format(item['symbol'], e))
-
-
-        elif 'volume' == item['category']:
-            volume = float(item['value'])
-            try:
-                Volume.objects.create(
-                    source=source_code,
-                    transaction_currency=transaction_currency,
-                    counter_currency=counter_currency_code,
-                    volume=volume,
-                    timestamp=item['timestamp']
-                )
-                #logger.debug(">>> Volume saved: source={}, transaction_currency={}, counter_currency={}, volume={}, timestamp={}".format(
-                #            source_code, transaction_currency, counter_currency_code, volume, item['timestamp']))
-            except Exception as e:
-                logger.debug(">>>> Error saving Volume for {}: {}".format(item['symbol'], e))
-    
-    #logger.debug("Message for {} saved to db. Coins: {}".format(get_source_name(source_code), ",".join(processed)))
-    logger.info("Message for {} ({}) saved to db".format(get_source_name(source_code), len(processed)))
+
+    # validate all items in memory and write them with one bulk insert per model
+    counts = save_ticks(exchange)
+    if bar_stream is not None:
+        bar_stream.add_items(exchange)
+
+    source_name = exchange[0]['source'] if exchange else None
+    record_metrics(source_name, exchange, receive_time, commit_time=time.time())
+    logger.info("Message for {} saved to db. Ticks: {ticks}, prices: {prices}, volumes: {volumes}, duplicates: {duplicates}, rejected: {rejected}".format(
+        source_name, **counts))
+    return counts
+
+
+def buffer_message_from_queue(tick_buffer, message_body, bar_stream=None):
+    "Journal SQS message items in the write-behind buffer"
+    receive_time = get_receive_time() or time.time()
+    exchange = json.loads(json.loads(message_body)['Message'])
+    tick_buffer.add(exchange, newest_timestamp(exchange), receive_time)
+    if bar_stream is not None:
+        bar_stream.add_items(exchange)
+    # commit time is unknown until the buffer is flushed, the buffer records commit lags then
+    record_metrics(exchange[0]['source'] if exchange else None, exchange, receive_time)
+    return len(exchange)
+
+
+def record_metrics(source_name, exchange, receive_time, commit_time=None):
+    "Add message lag and size to ingestion metrics, see ingestion_metrics command"
+    exchange_time = newest_timestamp(exchange)
+    if exchange_time is not None:
+        metrics.record(source_name, len(exchange), exchange_time, receive_time, commit_time)
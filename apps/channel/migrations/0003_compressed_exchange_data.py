@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11 on 2026-10-18 17:48
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('channel', '0002_add_more_sources'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='exchangedata',
+            name='compressed_data',
+            field=models.BinaryField(null=True),
+        ),
+        migrations.AddIndex(
+            model_name='exchangedata',
+            index=models.Index(fields=['source', 'timestamp'], name='channel_exc_source_b2fc5c_idx'),
+        ),
+    ]
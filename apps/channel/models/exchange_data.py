@@ -1,3 +1,6 @@
+import json
+import zlib
+
 from django.db import models
 from django.contrib.postgres.fields import JSONField
 from unixtimestampfield.fields import UnixTimeStampField
@@ -14,10 +17,35 @@ from settings import SOURCE_CHOICES
 
 class ExchangeData(models.Model):
     source = models.SmallIntegerField(choices=SOURCE_CHOICES, null=False)
-    data = models.TextField(default="")
+    data = models.TextField(default="") # legacy uncompressed json, see archive_exchange_data command
+    compressed_data = models.BinaryField(null=True) # zlib compressed json
     timestamp = UnixTimeStampField(null=False)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['source', 'timestamp']),
+        ]
+
 
     # MODEL PROPERTIES
 
+    @property
+    def payload(self):
+        "Exchange ticker as a dict, from the compressed or the legacy column"
+        if self.compressed_data is not None:
+            return decompress_payload(self.compressed_data)
+        return json.loads(self.data)
+
     # MODEL FUNCTIONS
+
+    def set_payload(self, payload):
+        self.compressed_data = compress_payload(payload)
+        self.data = ""
+
+
+def compress_payload(payload):
+    return zlib.compress(json.dumps(payload, separators=(',', ':')).encode('utf-8'), 9)
+
+def decompress_payload(compressed_data):
+    # postgres returns memoryview for binary fields
+    return json.loads(zlib.decompress(bytes(compressed_data)).decode('utf-8'))
@@ -0,0 +1,73 @@
+from unittest import mock
+
+from django.test import TestCase
+
+from apps.channel.bar_stream import BarStream
+from apps.indicator.models import Price, PriceResampl
+from apps.indicator.models.price_resampl import resample_source
+
+from settings import BINANCE, BTC, SHORT
+
+BAR_TIMESTAMP = 1522069200 # 2018-03-26 13:00 UTC
+
+
+
+class TestBarStream(TestCase):
+
+    def setUp(self):
+        self.bar_stream = BarStream(periods=[SHORT])
+        self.bar_stream._started_at = BAR_TIMESTAMP - 2 * 3600
+        self.prices = self.build_prices()
+
+    def build_prices(self):
+        return [Price(source=BINANCE, transaction_currency='ETH', counter_currency=BTC, price=price, timestamp=timestamp)
+                for price, timestamp in [(7000000, BAR_TIMESTAMP - 3000), (7300000, BAR_TIMESTAMP - 100),
+                                         (6900000, BAR_TIMESTAMP - 2000), (7100000, BAR_TIMESTAMP)]]
+
+    def tearDown(self):
+        self.bar_stream.close()
+
+    def test_same_bar_as_resample_source(self):
+        Price.objects.bulk_create(self.build_prices())
+        resample_source(BINANCE, SHORT, BAR_TIMESTAMP, start_time=BAR_TIMESTAMP - 1)
+        expected = PriceResampl.objects.values().get()
+        PriceResampl.objects.all().delete()
+
+        self.bar_stream.add_prices(self.prices[:2], now=BAR_TIMESTAMP - 50)
+        self.bar_stream.add_prices(self.prices, now=BAR_TIMESTAMP + 5) # redelivered ticks are counted once
+        self.assertEqual(self.bar_stream.flush(now=BAR_TIMESTAMP + 5), 0) # late ticks can still come
+        self.assertEqual(self.bar_stream.flush(now=BAR_TIMESTAMP + 10), 1)
+
+        streamed = PriceResampl.objects.values().get()
+        for field in ('timestamp', 'open_price', 'close_price', 'low_price', 'high_price', 'midpoint_price', 'mean_price', 'price_count'):
+            self.assertEqual(streamed[field], expected[field], msg=field)
+        self.assertAlmostEqual(streamed['price_variance'], expected['price_variance'], delta=1e-6 * expected['price_variance'])
+
+    def test_bar_saved_concurrently_is_kept(self):
+        PriceResampl.objects.create(source=BINANCE, transaction_currency='ETH', counter_currency=BTC,
+                                    resample_period=SHORT, timestamp=BAR_TIMESTAMP, close_price=1)
+        self.bar_stream.add_prices(self.prices, now=BAR_TIMESTAMP)
+        # resample_source saves the bar after the stream has checked for existing ones
+        with mock.patch.object(PriceResampl.objects, 'filter') as existing:
+            existing.return_value.values_list.return_value = []
+            self.assertEqual(self.bar_stream.flush(now=BAR_TIMESTAMP + 10), 0)
+            self.assertTrue(existing.called)
+        self.assertEqual(PriceResampl.objects.get().close_price, 1)
+
+    def test_closed_and_incomplete_bars(self):
+        # bar was computed by resample_source before the stream flushed it
+        PriceResampl.objects.create(source=BINANCE, transaction_currency='ETH', counter_currency=BTC,
+                                    resample_period=SHORT, timestamp=BAR_TIMESTAMP, close_price=1)
+        self.bar_stream.add_prices(self.prices, now=BAR_TIMESTAMP)
+        self.assertEqual(self.bar_stream.flush(now=BAR_TIMESTAMP + 10), 0)
+        self.assertEqual(PriceResampl.objects.get().close_price, 1)
+
+        self.bar_stream.add_prices(self.prices, now=BAR_TIMESTAMP + 10)
+        self.assertEqual(self.bar_stream.stats()['late_ticks'], 4)
+
+        # started in the middle of the bar
+        self.bar_stream._started_at = BAR_TIMESTAMP + 600
+        self.bar_stream.add_prices([Price(source=BINANCE, transaction_currency='ETH', counter_currency=BTC,
+                                          price=7000000, timestamp=BAR_TIMESTAMP + 700)], now=BAR_TIMESTAMP + 700)
+        self.assertEqual(self.bar_stream.flush(now=BAR_TIMESTAMP + 3610), 0)
+        self.assertEqual(self.bar_stream.stats()['running_bars'], 0)
@@ -0,0 +1,35 @@
+import json
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from apps.channel.models import ExchangeData
+
+from settings import POLONIEX
+
+TICKER = {'BTC_ETH': {'last': '0.07', 'baseVolume': '1234.5'}, 'USDT_BTC': {'last': '8000.5', 'baseVolume': '10'}}
+
+
+
+class TestExchangeDataPayload(TestCase):
+
+    def test_compressed_payload(self):
+        exchange_data = ExchangeData(source=POLONIEX, timestamp=1522066118)
+        exchange_data.set_payload(TICKER)
+        exchange_data.save()
+
+        exchange_data = ExchangeData.objects.get()
+        self.assertEqual(exchange_data.data, "")
+        self.assertEqual(exchange_data.payload, TICKER)
+        self.assertLess(len(bytes(exchange_data.compressed_data)), len(json.dumps(TICKER)))
+
+    def test_archive_legacy_rows(self):
+        ExchangeData.objects.create(source=POLONIEX, timestamp=1522066118, data=json.dumps(TICKER))
+        ExchangeData.objects.create(source=POLONIEX, timestamp=1522066178, data=json.dumps(TICKER))
+        self.assertEqual(ExchangeData.objects.get(timestamp=1522066118).payload, TICKER) # legacy column is read too
+
+        call_command('archive_exchange_data', chunk_size=1)
+        for exchange_data in ExchangeData.objects.all():
+            self.assertEqual(exchange_data.data, "")
+            self.assertIsNotNone(exchange_data.compressed_data)
+            self.assertEqual(exchange_data.payload, TICKER)
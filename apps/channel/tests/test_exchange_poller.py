@@ -0,0 +1,114 @@
+import asyncio
+import os
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from django.test import TestCase, SimpleTestCase
+
+from apps.channel.exchange_poller import ExchangePoller, parse_poloniex, parse_binance, parse_bittrex
+from apps.channel.ingestion import build_ticks
+from apps.indicator.models import Price, Volume
+
+from settings import BINANCE, BTC, USDT
+
+
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+
+def _recorded_ticker(exchange, wait_for=None):
+    "Handler serving the recorded ticker once wait_for (a coroutine function) returns"
+    with open(os.path.join(FIXTURES_DIR, '{}_ticker.json'.format(exchange))) as f:
+        body = f.read()
+
+    async def handler(request):
+        if wait_for is not None:
+            await wait_for()
+        return web.Response(text=body, content_type='application/json')
+    return handler
+
+
+class TestTickerParsers(SimpleTestCase):
+    "A delisted or malformed ticker is skipped, other tickers of the exchange are kept"
+
+    def assert_one_good_ticker(self, items, symbol):
+        prices, volumes, rejected = build_ticks(items)
+        self.assertEqual([(price.transaction_currency, price.price) for price in prices], [(symbol, 7000000)])
+        self.assertEqual(len(volumes), 1)
+        self.assertGreater(rejected, 0)
+
+    def test_poloniex(self):
+        items = parse_poloniex({'BTC_ETH': {'last': '0.07', 'baseVolume': '1234.5'}, 'BTC_DEAD': {'isFrozen': '1'},
+                                'BROKEN': {'last': '1', 'baseVolume': '1'}, 'BTC_NULL': None}, 1522066118)
+        self.assert_one_good_ticker(items, 'ETH')
+
+    def test_binance(self):
+        items = parse_binance([{'symbol': 'ETHBTC', 'lastPrice': '0.07', 'quoteVolume': '1234.5'},
+                               {'symbol': 'DEADBTC'}, {'lastPrice': '1'}, 'broken'], 1522066118)
+        self.assert_one_good_ticker(items, 'ETH')
+
+    def test_bittrex(self):
+        items = parse_bittrex({'result': [{'MarketName': 'BTC-LTC', 'Last': 0.07, 'BaseVolume': 1234.5},
+                                          {'MarketName': 'BTC-DEAD', 'Last': None}, {'MarketName': 'BROKEN', 'Last': 1},
+                                          {'Last': 1}]}, 1522066118)
+        self.assert_one_good_ticker(items, 'LTC')
+        self.assertEqual(parse_bittrex({'success': False, 'result': None}, 1522066118), [])
+
+
+class TestExchangePoller(TestCase):
+    "Poll a local stand-in for exchange APIs serving recorded tickers"
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        # exchanges answer only when two requests are in flight at once (limit_per_host of the local server),
+        # so a sequential poll can't pass
+        self.arrived = 0
+        self.two_in_flight = asyncio.Event(loop=self.loop)
+        self.never = asyncio.Event(loop=self.loop)
+        app = web.Application()
+        for exchange in ('poloniex', 'binance', 'bittrex'):
+            app.router.add_get('/' + exchange, _recorded_ticker(exchange, wait_for=self._wait_for_two_in_flight))
+        app.router.add_get('/slow', _recorded_ticker('bittrex', wait_for=self.never.wait))
+        self.server = TestServer(app, loop=self.loop)
+        self.loop.run_until_complete(self.server.start_server(loop=self.loop))
+
+    async def _wait_for_two_in_flight(self):
+        self.arrived += 1
+        if self.arrived == 2:
+            self.two_in_flight.set()
+        await self.two_in_flight.wait()
+
+    def tearDown(self):
+        self.loop.run_until_complete(self.server.close())
+        self.loop.close()
+
+    def _poller(self, **kwargs):
+        urls = {exchange: str(self.server.make_url('/' + exchange)) for exchange in ('poloniex', 'binance', 'bittrex')}
+        urls.update(kwargs.pop('urls', {}))
+        return ExchangePoller(urls=urls, loop=self.loop, **kwargs)
+
+    def test_poll_and_save(self):
+        poller = self._poller()
+        tickers = poller.poll_and_save()
+        self.loop.run_until_complete(poller.close())
+
+        # exchanges are fetched concurrently, a sequential poll times out waiting for the other requests
+        self.assertTrue(self.two_in_flight.is_set())
+        self.assertEqual({exchange: len(items) for exchange, items in tickers.items()},
+                         {'poloniex': 4, 'binance': 4, 'bittrex': 4}) # ETHEUR is skipped
+        self.assertEqual(Price.objects.count(), 6)
+        self.assertEqual(Volume.objects.count(), 6)
+
+        eth_price = Price.objects.get(source=BINANCE, transaction_currency='ETH', counter_currency=BTC)
+        self.assertEqual(eth_price.price, 5835000)
+        self.assertEqual(Price.objects.filter(transaction_currency='BTC', counter_currency=USDT).count(), 3)
+
+    def test_timeout_does_not_block_other_exchanges(self):
+        poller = self._poller(exchanges=['poloniex', 'bittrex'], urls={'bittrex': str(self.server.make_url('/slow'))},
+                              timeouts={'bittrex': 0.5})
+        self.two_in_flight.set()
+        tickers = self.loop.run_until_complete(poller.poll_once()) # the slow exchange never answers
+        self.loop.run_until_complete(poller.close())
+
+        self.assertEqual(tickers['bittrex'], [])
+        self.assertEqual(len(tickers['poloniex']), 4)
@@ -0,0 +1,103 @@
+import threading
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from apps.channel.incoming_queue import SqsListener, get_receive_time
+
+
+class StopListening(Exception):
+    pass
+
+
+class StubSqsClient:
+    "receive_message returns the given batches, then stops the listener"
+
+    def __init__(self, batches):
+        self.batches = list(batches)
+        self.deleted = []
+        self.extended = []
+        self.delete_failures = []
+        self.extended_event = threading.Event()
+
+    def receive_message(self, **kwargs):
+        if not self.batches:
+            raise StopListening()
+        return {'Messages': self.batches.pop(0)}
+
+    def delete_message_batch(self, QueueUrl, Entries):
+        self.deleted.append([entry['ReceiptHandle'] for entry in Entries])
+        return {'Successful': [{'Id': entry['Id']} for entry in Entries], 'Failed': self.delete_failures}
+
+    def change_message_visibility_batch(self, QueueUrl, Entries):
+        self.extended.append([entry['ReceiptHandle'] for entry in Entries])
+        self.extended_event.set()
+
+
+def _listener(client, **kwargs):
+    with mock.patch.object(SqsListener, '_init_sqs_client', return_value=client):
+        listener = SqsListener('queue', **kwargs)
+    listener._queue_url = 'https://sqs/queue'
+    return listener
+
+
+def _messages(*bodies):
+    return [{'Body': body, 'ReceiptHandle': 'handle-' + body} for body in bodies]
+
+
+class TestBatchedListener(SimpleTestCase):
+
+    def listen(self, client, handler, **kwargs):
+        listener = _listener(client, max_messages=10, concurrency=4, interval=0, **kwargs)
+        listener.handler = handler
+        with self.assertRaises(StopListening):
+            listener.listen()
+        return listener, client
+
+    def test_handled_messages_are_deleted_in_batches(self):
+        receive_times = []
+
+        def handler(body):
+            receive_times.append(get_receive_time())
+            if body == 'bad':
+                raise ValueError("can't parse")
+
+        listener, client = self.listen(StubSqsClient([_messages('a', 'bad', 'b'), _messages('c')]), handler)
+
+        # one delete call per received batch, the failed message stays in the queue
+        self.assertEqual([sorted(handles) for handles in client.deleted], [['handle-a', 'handle-b'], ['handle-c']])
+        self.assertEqual(client.extended, [])
+        self.assertTrue(all(receive_times))
+        stats = listener.stats.snapshot()
+        self.assertEqual((stats['processed'], stats['failed']), (3, 1))
+
+    def test_nothing_to_delete_when_all_failed(self):
+        def handler(body):
+            raise ValueError("can't parse")
+
+        listener, client = self.listen(StubSqsClient([_messages('a', 'b')]), handler)
+        self.assertEqual(client.deleted, [])
+        self.assertEqual(listener.stats.snapshot()['failed'], 2)
+
+    def test_visibility_of_slow_messages_is_extended(self):
+        client = StubSqsClient([_messages('fast', 'slow')])
+
+        def handler(body):
+            if body == 'slow':
+                # finishes only after the listener has extended its visibility timeout
+                if not client.extended_event.wait(10):
+                    raise TimeoutError("visibility was not extended")
+
+        listener, client = self.listen(client, handler, visibility_timeout=0.2)
+
+        self.assertEqual(client.extended[0], ['handle-slow'])
+        self.assertEqual(sorted(client.deleted[0]), ['handle-fast', 'handle-slow'])
+        self.assertEqual(listener.stats.snapshot()['failed'], 0)
+
+    def test_failed_deletes_are_logged(self):
+        client = StubSqsClient([])
+        client.delete_failures = [{'Id': '0', 'Code': 'ReceiptHandleIsInvalid'}]
+        listener = _listener(client, max_messages=10)
+        with self.assertLogs('apps.channel.incoming_queue', level='ERROR') as logs:
+            listener._delete_batch(_messages('a'))
+        self.assertIn('ReceiptHandleIsInvalid', logs.output[0])
@@ -0,0 +1,50 @@
+from django.test import SimpleTestCase, TestCase
+
+from apps.channel.ingestion import build_ticks, save_ticks
+from apps.indicator.models import Price, Volume, Tick
+
+from settings import BINANCE, BTC, USDT
+
+
+
+class TestIngestion(SimpleTestCase):
+
+    def setUp(self):
+        self.items = [
+            {'source': 'binance', 'category': 'price', 'symbol': 'ETH/BTC', 'value': 0.07, 'timestamp': 1522066118.23},
+            {'source': 'binance', 'category': 'volume', 'symbol': 'ETH/BTC', 'value': 1234.5, 'timestamp': 1522066118.23},
+            {'source': 'binance', 'category': 'price', 'symbol': 'BTC/USDT', 'value': '8000.5', 'timestamp': 1522066118.23},
+            {'source': 'unknown_exchange', 'category': 'price', 'symbol': 'ETH/BTC', 'value': 0.07, 'timestamp': 1522066118.23},
+            {'source': 'binance', 'category': 'price', 'symbol': 'ETH/EUR', 'value': 450, 'timestamp': 1522066118.23},
+            {'source': 'binance', 'category': 'price', 'symbol': 'ETHBTC', 'value': 0.07, 'timestamp': 1522066118.23},
+            {'source': 'binance', 'category': 'trades', 'symbol': 'ETH/BTC', 'value': 10, 'timestamp': 1522066118.23},
+        ]
+
+    def test_build_ticks(self):
+        prices, volumes, rejected = build_ticks(self.items)
+        self.assertEqual(len(prices), 2)
+        self.assertEqual(len(volumes), 1)
+        self.assertEqual(rejected, 4)
+
+        self.assertEqual(prices[0].source, BINANCE)
+        self.assertEqual(prices[0].counter_currency, BTC)
+        self.assertEqual(prices[0].price, 7000000)
+        self.assertEqual(prices[1].counter_currency, USDT)
+        self.assertEqual(prices[1].price, 800050000000)
+        self.assertEqual(volumes[0].volume, 1234.5)
+
+
+class TestIdempotentIngestion(TestCase):
+
+    def test_redelivered_items_are_skipped(self):
+        items = [
+            {'source': 'binance', 'category': 'price', 'symbol': 'ETH/BTC', 'value': 0.07, 'timestamp': 1522066118.23},
+            {'source': 'binance', 'category': 'volume', 'symbol': 'ETH/BTC', 'value': 1234.5, 'timestamp': 1522066118.23},
+        ]
+        self.assertEqual(save_ticks(items), {'ticks': 1, 'prices': 1, 'volumes': 1, 'duplicates': 0, 'rejected': 0})
+        self.assertEqual(save_ticks(items), {'ticks': 0, 'prices': 0, 'volumes': 0, 'duplicates': 3, 'rejected': 0})
+        self.assertEqual(Price.objects.count(), 1)
+        self.assertEqual(Volume.objects.count(), 1)
+
+        tick = Tick.objects.get()
+        self.assertEqual((tick.price, tick.volume), (7000000, 1234.5))
@@ -0,0 +1,31 @@
+from django.core.cache import cache
+from django.test import SimpleTestCase
+
+from apps.channel.ingestion_metrics import IngestionMetrics, get_ingestion_metrics
+
+
+
+class TestIngestionMetrics(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_histogram(self):
+        now = 1522066118.0
+        ingestion_metrics = IngestionMetrics(flush_interval=60)
+        for lag in (0.5, 1.5, 3, 3, 45):
+            ingestion_metrics.record('poloniex', 100, exchange_time=now - lag, receive_time=now, commit_time=now + 0.2)
+        ingestion_metrics.record('binance', 50, exchange_time=now - 1, receive_time=now)
+        ingestion_metrics.flush()
+
+        result = get_ingestion_metrics(minutes=5, now=now)
+        self.assertEqual(result['messages'], 6)
+        self.assertEqual(result['items'], 550)
+        self.assertEqual(result['items_per_minute'], {'poloniex': 100.0, 'binance': 10.0})
+        self.assertEqual(result['exchange_to_receive']['histogram']['<=5s'], 2)
+        self.assertEqual(result['exchange_to_receive']['p50'], 2)
+        self.assertEqual(result['exchange_to_commit']['p95'], 60)
+        self.assertEqual(result['receive_to_commit']['histogram']['<=1s'], 5)
+
+        # metrics older than the window are not counted
+        self.assertEqual(get_ingestion_metrics(minutes=5, now=now + 10 * 60)['messages'], 0)
@@ -0,0 +1,40 @@
+import os
+import shutil
+import tempfile
+
+from django.core.management import call_command
+from django.test import TransactionTestCase
+
+from apps.indicator.models import Price, PriceResampl, Tick
+
+from settings import SHORT
+
+
+
+class TestLoadTicks(TransactionTestCase):
+
+    def setUp(self):
+        self.dump_dir = tempfile.mkdtemp()
+        self.dump_path = os.path.join(self.dump_dir, 'ticks.csv')
+        with open(self.dump_path, 'w') as dump_file:
+            dump_file.write('source,category,symbol,value,timestamp\n')
+            for minute in range(120):
+                timestamp = 1522065600 + minute * 60
+                dump_file.write('poloniex,price,ETH/BTC,{},{}\n'.format(0.07 + minute * 0.0001, timestamp))
+                dump_file.write('poloniex,volume,ETH/BTC,{},{}\n'.format(1000 + minute, timestamp))
+            dump_file.write('poloniex,price,ETH/EUR,450,1522065600\n')
+
+    def tearDown(self):
+        shutil.rmtree(self.dump_dir)
+
+    def test_load_and_resample(self):
+        call_command('load_ticks', self.dump_path, chunk_size=50, workers=1, resample=True)
+        self.assertEqual(Tick.objects.count(), 120)
+        self.assertEqual(Price.objects.count(), 120)
+        # the first tick is exactly on an hour boundary and closes a period of its own
+        self.assertEqual(PriceResampl.objects.filter(resample_period=SHORT).count(), 3)
+
+        # loading the same dump again does not create duplicates
+        call_command('load_ticks', self.dump_path, chunk_size=50, workers=1, resample=True)
+        self.assertEqual(Tick.objects.count(), 120)
+        self.assertEqual(PriceResampl.objects.filter(resample_period=SHORT).count(), 3)
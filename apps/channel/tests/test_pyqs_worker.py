@@ -0,0 +1,84 @@
+import queue
+import signal
+import time
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from pyqs.worker import ProcessWorker, ManagerWorker, DELETE_BATCH_SIZE
+
+
+def _packed_message(body):
+    return {'is_pyqs_task': False, 'queue': 'queue-id', 'message': mock.Mock(receipt_handle='handle-' + body),
+            'message_body': body, 'start_time': time.time(), 'timeout': 30}
+
+
+def _deleted(conn):
+    "Receipt handles of every DeleteMessageBatch call"
+    batches = []
+    for (action, params, queue_id), _ in conn.get_status.call_args_list:
+        assert action == 'DeleteMessageBatch' and queue_id == 'queue-id'
+        batches.append([params['DeleteMessageBatchRequestEntry.{}.ReceiptHandle'.format(index)]
+                        for index in range(1, len(params) // 2 + 1)])
+    return batches
+
+
+@mock.patch('signal.signal') # ProcessWorker.run ignores SIGINT and SIGTERM, not in the test process
+class TestProcessWorker(SimpleTestCase):
+
+    def setUp(self):
+        self.conn = mock.Mock()
+        self.internal_queue = queue.Queue()
+        self.dispatched = []
+        with mock.patch('pyqs.worker.get_conn', return_value=self.conn):
+            self.worker = ProcessWorker(self.internal_queue, self.dispatch)
+
+    def dispatch(self, body):
+        self.dispatched.append(body)
+        if body == 'bad':
+            raise ValueError("can't handle")
+
+    def put(self, *bodies):
+        for body in bodies:
+            self.internal_queue.put(_packed_message(body))
+
+    def test_flush_at_batch_limit(self, signal_mock):
+        for index in range(DELETE_BATCH_SIZE + 1):
+            self.worker.delete_message('queue-id', 'handle-{}'.format(index))
+        self.assertEqual(_deleted(self.conn), [['handle-{}'.format(index) for index in range(DELETE_BATCH_SIZE)]])
+        self.assertEqual(self.worker._pending_deletes, {'queue-id': ['handle-10']})
+
+    def test_flush_on_idle(self, signal_mock):
+        self.put('a', 'b', 'c')
+        # the first flush stops the worker, it comes when the internal queue is empty
+        self.conn.get_status.side_effect = lambda *args: self.worker.shutdown()
+        self.worker.run()
+        self.assertEqual(self.dispatched, ['a', 'b', 'c'])
+        self.assertEqual(_deleted(self.conn), [['handle-a', 'handle-b', 'handle-c']])
+
+    def test_flush_on_exit(self, signal_mock):
+        self.worker._messages_to_process_before_shutdown = 3
+        self.put('a', 'bad', 'c', 'd')
+        with self.assertLogs('pyqs', level='ERROR'):
+            self.worker.run()
+        self.assertEqual(self.dispatched, ['a', 'bad', 'c'])
+        # failed message stays in the queue
+        self.assertEqual(_deleted(self.conn), [['handle-a', 'handle-c']])
+        signal_mock.assert_any_call(signal.SIGTERM, signal.SIG_IGN)
+
+
+class TestManagerWorker(SimpleTestCase):
+
+    def test_dead_workers_are_replaced_in_place(self):
+        manager = ManagerWorker.__new__(ManagerWorker) # without connecting to SQS
+        children = [mock.Mock(is_alive=mock.Mock(return_value=alive)) for alive in (True, False, False, True)]
+        manager.worker_children = list(children)
+        new_workers = [mock.Mock(), mock.Mock()]
+        with mock.patch.object(manager, '_new_worker', side_effect=new_workers):
+            manager._replace_worker_children()
+
+        self.assertEqual(manager.worker_children, [children[0], new_workers[0], new_workers[1], children[3]])
+        for dead in children[1:3]:
+            dead.join.assert_called_once_with()
+        for new_worker in new_workers:
+            new_worker.start.assert_called_once_with()
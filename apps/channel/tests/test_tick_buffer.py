@@ -0,0 +1,64 @@
+import json
+import os
+import shutil
+import tempfile
+
+from django.core.cache import cache
+from django.test import TestCase
+
+from apps.channel.ingestion_metrics import IngestionMetrics, get_ingestion_metrics
+from apps.channel.tick_buffer import TickBuffer
+from apps.indicator.models import Price, Tick
+
+
+
+class TestTickBuffer(TestCase):
+
+    def setUp(self):
+        self.journal_dir = tempfile.mkdtemp()
+        self.journal_path = os.path.join(self.journal_dir, 'ticks.jsonl')
+        self.items = [
+            {'source': 'binance', 'category': 'price', 'symbol': 'ETH/BTC', 'value': 0.07, 'timestamp': 1522066118.23},
+            {'source': 'binance', 'category': 'volume', 'symbol': 'ETH/BTC', 'value': 1234.5, 'timestamp': 1522066118.23},
+        ]
+
+    def tearDown(self):
+        shutil.rmtree(self.journal_dir)
+
+    def test_flush_by_rows(self):
+        tick_buffer = TickBuffer(self.journal_path, flush_rows=4, flush_interval_ms=60*60*1000)
+        tick_buffer.add(self.items)
+        self.assertEqual(Tick.objects.count(), 0)
+        self.assertEqual(tick_buffer.stats.snapshot()['journal_depth'], 2)
+
+        tick_buffer.add([dict(item, timestamp=1522066178.23) for item in self.items])
+        self.assertEqual(Tick.objects.count(), 2)
+        self.assertEqual(Price.objects.count(), 2)
+
+        stats = tick_buffer.stats.snapshot()
+        self.assertEqual((stats['flushes'], stats['flush_size_max'], stats['journal_depth']), (1, 4, 0))
+        tick_buffer.close()
+
+    def test_commit_lag_is_recorded_on_flush(self):
+        cache.clear()
+        ingestion_metrics = IngestionMetrics(flush_interval=60)
+        tick_buffer = TickBuffer(self.journal_path, flush_rows=100, flush_interval_ms=60*60*1000, ingestion_metrics=ingestion_metrics)
+        receive_time = 1522066120.0
+        tick_buffer.add(self.items, exchange_time=1522066118.23, receive_time=receive_time)
+        tick_buffer.flush()
+        tick_buffer.close()
+        ingestion_metrics.flush()
+
+        result = get_ingestion_metrics(minutes=5, now=receive_time)
+        self.assertEqual(sum(result['exchange_to_commit']['histogram'].values()), 1)
+        self.assertEqual(sum(result['receive_to_commit']['histogram'].values()), 1)
+        self.assertEqual(result['messages'], 0) # counted when the message is received, see poll_queue
+
+    def test_unflushed_items_are_replayed(self):
+        # previous process died with one message journaled and a half written second one
+        with open(self.journal_path, 'w') as journal:
+            journal.write(json.dumps(self.items) + '\n' + '[{"source": "bin')
+
+        tick_buffer = TickBuffer(self.journal_path, flush_rows=100, flush_interval_ms=60*60*1000)
+        self.assertEqual(Tick.objects.count(), 1)
+        tick_buffer.close()
@@ -0,0 +1,181 @@
+"""
+Write-behind buffer for ticks received from the incoming queue.
+
+Items are appended to a local journal (fsync'ed) and kept in memory until flush_rows items
+are collected or flush_interval_ms passed, then saved with one COPY per table.
+Unflushed items left in the journal after a crash are saved on the next start.
+"""
+import json
+import logging
+import os
+import threading
+import time
+
+from django.db import connection
+
+from apps.channel.ingestion import save_ticks
+from apps.channel.ingestion_metrics import metrics
+
+
+
+logger = logging.getLogger(__name__)
+
+
+class TickBufferStats:
+    "Thread safe flush counters"
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.flushes = 0
+        self.flushed_items = 0
+        self.flush_size_max = 0
+        self.flush_latency_total = 0.0
+        self.flush_latency_max = 0.0
+        self.journal_depth = 0 # items written to the journal and not flushed yet
+
+    def record_flush(self, size, latency):
+        with self._lock:
+            self.flushes += 1
+            self.flushed_items += size
+            self.flush_size_max = max(self.flush_size_max, size)
+            self.flush_latency_total += latency
+            self.flush_latency_max = max(self.flush_latency_max, latency)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'flushes': self.flushes,
+                'flush_size_avg': self.flushed_items / self.flushes if self.flushes else 0.0,
+                'flush_size_max': self.flush_size_max,
+                'flush_latency_avg': self.flush_latency_total / self.flushes if self.flushes else 0.0,
+                'flush_latency_max': self.flush_latency_max,
+                'journal_depth': self.journal_depth,
+            }
+
+
+class TickBuffer:
+
+    def __init__(self, journal_path, flush_rows=5000, flush_interval_ms=1000, ingestion_metrics=metrics):
+        """
+        :param journal_path: local file for unflushed items, journal_path + '.flushing' is used during a flush
+        :param flush_rows: flush when that many items are buffered
+        :param flush_interval_ms: flush buffered items at least that often
+        :param ingestion_metrics: commit lags of buffered messages are recorded there after a flush
+        """
+        self._journal_path = journal_path
+        self._flushing_path = journal_path + '.flushing'
+        self._flush_rows = flush_rows
+        self._flush_interval = flush_interval_ms / 1000.0
+        self._metrics = ingestion_metrics
+
+        self.stats = TickBufferStats()
+        self._lock = threading.Lock() # guards _items and _journal
+        self._flush_lock = threading.Lock() # one flush at a time
+        self._items = []
+        self._received = [] # (exchange_time, receive_time) of buffered messages
+        self._last_flush_time = time.time()
+        self._stopped = threading.Event()
+
+        self.replay_journal()
+        self._journal = open(self._journal_path, 'a')
+        self._flusher = threading.Thread(target=self._flush_periodically, name='tick-buffer-flusher', daemon=True)
+        self._flusher.start()
+
+    def add(self, items, exchange_time=None, receive_time=None):
+        """
+        Journal and buffer items. When this returns, items survive a crash of the process.
+        exchange_time (newest tick) and receive_time of the message give its commit lags once flushed.
+        """
+        if not items:
+            return
+        with self._lock:
+            self._journal.write(json.dumps(items, separators=(',', ':')) + '\n')
+            self._journal.flush()
+            os.fsync(self._journal.fileno())
+            self._items.extend(items)
+            if exchange_time is not None and receive_time is not None:
+                self._received.append((exchange_time, receive_time))
+            self.stats.journal_depth += len(items)
+            full = len(self._items) >= self._flush_rows
+
+        if full:
+            self.flush()
+
+    def flush(self):
+        "Save buffered items to DB and drop them from the journal"
+        with self._flush_lock:
+            with self._lock:
+                self._last_flush_time = time.time()
+                if not self._items:
+                    return
+                items, self._items = self._items, []
+                received, self._received = self._received, []
+                self._rotate_journal()
+
+            start = time.time()
+            try:
+                counts = save_ticks(items, use_copy=True)
+            except Exception:
+                # items stay in .flushing journal and go back to the buffer for the next flush
+                logger.exception("Error flushing {} buffered ticks".format(len(items)))
+                with self._lock:
+                    self._items = items + self._items
+                    self._received = received + self._received
+                raise
+            commit_time = time.time()
+            os.remove(self._flushing_path)
+            latency = commit_time - start
+            for exchange_time, receive_time in received:
+                self._metrics.record_commit(exchange_time, receive_time, commit_time)
+
+            with self._lock:
+                self.stats.journal_depth -= len(items)
+            self.stats.record_flush(len(items), latency)
+            logger.debug("Flushed {} buffered items in {:.3f}s: {}".format(len(items), latency, counts))
+
+    def _rotate_journal(self):
+        "Move journaled items to .flushing, new items go to a fresh journal while we save these ones"
+        self._journal.close()
+        if os.path.exists(self._flushing_path):
+            # previous flush failed, keep its items and add the new ones
+            with open(self._journal_path) as journal, open(self._flushing_path, 'a') as flushing:
+                flushing.write(journal.read())
+                flushing.flush()
+                os.fsync(flushing.fileno())
+            os.remove(self._journal_path)
+        else:
+            os.replace(self._journal_path, self._flushing_path)
+        self._journal = open(self._journal_path, 'a')
+
+    def replay_journal(self):
+        "Save items left by a previous process, a partly written last line is skipped"
+        for path in (self._flushing_path, self._journal_path):
+            if not os.path.exists(path):
+                continue
+            items = []
+            with open(path) as journal:
+                for line in journal:
+                    try:
+                        items.extend(json.loads(line))
+                    except ValueError:
+                        logger.warning("Skipping broken line in tick journal {}".format(path))
+            if items:
+                counts = save_ticks(items, use_copy=True)
+                logger.info("Replayed {} items from tick journal {}: {}".format(len(items), path, counts))
+            os.remove(path)
+
+    def close(self):
+        self._stopped.set()
+        self._flusher.join()
+        self.flush()
+        with self._lock:
+            self._journal.close()
+
+    def _flush_periodically(self):
+        while not self._stopped.wait(self._flush_interval / 4):
+            if time.time() - self._last_flush_time >= self._flush_interval:
+                try:
+                    self.flush()
+                except Exception:
+                    pass # already logged, items stay in the journal
+        connection.close()
@@ -0,0 +1,61 @@
+from unittest import mock, skipUnless
+
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from apps.common.utilities import db_router
+from apps.common.utilities.db_router import use_replica
+from apps.indicator.models import Price
+
+from settings import REST_API_SECRET_KEY
+
+
+
+@skipUnless('replica' in settings.DATABASES, "needs a 'replica' database, see local_settings_template.py")
+@override_settings(REPLICA_DATABASES=['replica'], REPLICA_MAX_LAG_SECONDS=30)
+class TestReplicaRouter(TransactionTestCase): # TestCase would keep everything in a transaction on the primary
+
+    def setUp(self):
+        db_router._replica_lags.clear()
+
+    def test_reads_in_marked_blocks_go_to_replica(self):
+        self.assertEqual(Price.objects.all().db, 'default')
+        with use_replica():
+            self.assertEqual(Price.objects.all().db, 'replica')
+            self.assertEqual(router.db_for_write(Price), 'default')
+            Price.objects.count() # replica is a working database
+        self.assertEqual(Price.objects.all().db, 'default')
+
+    def test_decorator(self):
+        @use_replica()
+        def read_prices():
+            return Price.objects.all().db
+        self.assertEqual(read_prices(), 'replica')
+
+    def test_primary_in_transactions(self):
+        with use_replica(), transaction.atomic():
+            self.assertEqual(Price.objects.all().db, 'default')
+
+    def test_lagging_replica_is_skipped(self):
+        with mock.patch.object(db_router, '_query_replica_lag', return_value=120.0), use_replica():
+            self.assertEqual(Price.objects.all().db, 'default')
+
+        # lag is cached until the next check
+        with mock.patch.object(db_router, '_query_replica_lag', return_value=0.0), use_replica():
+            self.assertEqual(Price.objects.all().db, 'default')
+        db_router._replica_lags.clear()
+        with mock.patch.object(db_router, '_query_replica_lag', return_value=0.0), use_replica():
+            self.assertEqual(Price.objects.all().db, 'replica')
+
+    def test_unknown_lag_is_stale(self):
+        with mock.patch.object(db_router, '_query_replica_lag', side_effect=Exception("connection refused")), use_replica():
+            self.assertEqual(Price.objects.all().db, 'default')
+
+    def test_api_reads_from_replica(self):
+        with CaptureQueriesContext(connections['replica']) as replica_queries:
+            response = APIClient().get('/api/v2/prices/', HTTP_API_KEY=REST_API_SECRET_KEY)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(replica_queries.captured_queries)
@@ -0,0 +1,92 @@
+"""
+Columnar history files: one .npy file per column, partitioned by table, source, pair and month.
+
+    {root}/{table}/{source}/{transaction_currency}_{counter_currency}/{YYYY-MM}/{column}.npy
+
+Files are plain numpy arrays, so the reader memory-maps them and never touches the database.
+Only numpy and pandas are needed here, analysts can use this module without Django settings.
+Timestamps are float epoch seconds, nullable integers are float64 with NaN.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+
+def partition_path(root, table, source, transaction_currency, counter_currency, month):
+    return os.path.join(root, table, source, '{}_{}'.format(transaction_currency, counter_currency), month)
+
+
+def append_partition(path, columns):
+    """
+    Append columns ({name: array}, with an 'id' column) to the partition in path.
+    Rows already in the partition (by id) are skipped, so an interrupted export can be repeated.
+    Every column file is replaced atomically. Return number of appended rows.
+    """
+    os.makedirs(path, exist_ok=True)
+    existing = load_partition(path)
+    new_rows = np.ones(len(columns['id']), dtype=bool)
+    if existing:
+        new_rows = columns['id'] > existing['id'].max()
+    appended = int(new_rows.sum())
+    if not appended:
+        return 0
+
+    for name, values in columns.items():
+        values = values[new_rows]
+        if name in existing:
+            old_values = existing[name]
+            if old_values.dtype.kind == 'U' and values.dtype.kind == 'U':
+                # strings are fixed width, widen to the longest one
+                width = max(old_values.dtype.itemsize, values.dtype.itemsize) // 4
+                old_values, values = old_values.astype('U{}'.format(width)), values.astype('U{}'.format(width))
+            values = np.concatenate([old_values, values])
+        tmp_file = os.path.join(path, name + '.npy.tmp')
+        with open(tmp_file, 'wb') as column_file:
+            np.save(column_file, values)
+        os.replace(tmp_file, os.path.join(path, name + '.npy'))
+    return appended
+
+
+def load_partition(path, columns=None):
+    "Return {column: memory-mapped array} of one partition, {} if there is no such partition"
+    if not os.path.isdir(path):
+        return {}
+    names = columns or [file_name[:-len('.npy')] for file_name in os.listdir(path) if file_name.endswith('.npy')]
+    return {name: np.load(os.path.join(path, name + '.npy'), mmap_mode='r') for name in names}
+
+
+def read_history(root, table, source, transaction_currency, counter_currency, start=None, end=None, columns=None):
+    """
+    History of one pair as a DataFrame indexed by timestamp (datetime), sorted by time.
+    :param source: exchange name, e.g. 'poloniex'
+    :param counter_currency: currency name, e.g. 'BTC'
+    :param start, end: datetimes, inclusive, None for all history
+    :param columns: list of columns to load, all by default
+    """
+    pair_path = os.path.dirname(partition_path(root, table, source, transaction_currency, counter_currency, 'month'))
+    if not os.path.isdir(pair_path):
+        return pd.DataFrame()
+    months = sorted(month for month in os.listdir(pair_path)
+                    if (start is None or month >= start.strftime('%Y-%m')) and (end is None or month <= end.strftime('%Y-%m')))
+
+    frames = []
+    for month in months:
+        partition = load_partition(os.path.join(pair_path, month), columns and list(set(columns) | {'timestamp'}))
+        timestamps = partition['timestamp']
+        mask = np.ones(len(timestamps), dtype=bool)
+        if start is not None:
+            mask &= timestamps >= _epoch(start)
+        if end is not None:
+            mask &= timestamps <= _epoch(end)
+        frames.append(pd.DataFrame({name: values[mask] for name, values in partition.items()}))
+
+    if not frames:
+        return pd.DataFrame()
+    history_df = pd.concat(frames, ignore_index=True)
+    history_df.index = pd.to_datetime(history_df.pop('timestamp'), unit='s')
+    return history_df.sort_index()
+
+
+def _epoch(value):
+    return (pd.Timestamp(value) - pd.Timestamp(0)).total_seconds()
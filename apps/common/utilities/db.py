@@ -1,7 +1,164 @@
+import csv
+import io
+import itertools
+import logging
 import typing
+from datetime import datetime
 from typing import List, Tuple
 from enum import Enum
 
+import numpy as np
+import pandas as pd
+from django.db import connections, transaction
+from django.db.models import AutoField
+from django.db.models.sql import InsertQuery
+
+
+logger = logging.getLogger(__name__)
+
 
 def enum_to_choices(enum: Enum) -> List[Tuple[int, str]]:
     return [(i.value, i.name) for i in enum]
+
+
+def bulk_insert_ignore(model, objs, using='default', batch_size=1000):
+    """
+    Bulk insert objs and skip rows which violate a unique constraint.
+    Django 1.11 has no bulk_create(ignore_conflicts=True), so we patch the INSERT generated by the ORM.
+    Return number of inserted rows.
+    """
+    if not objs:
+        return 0
+
+    connection = connections[using]
+    fields = [field for field in model._meta.concrete_fields if not isinstance(field, AutoField)]
+    inserted = 0
+    with connection.cursor() as cursor:
+        for start in range(0, len(objs), batch_size):
+            query = InsertQuery(model)
+            query.insert_values(fields, objs[start:start + batch_size])
+            for statement, params in query.get_compiler(using=using).as_sql():
+                cursor.execute(_ignore_conflicts(statement, connection.vendor), params)
+                inserted += cursor.rowcount
+    return inserted
+
+
+def _ignore_conflicts(statement, vendor):
+    if vendor == 'postgresql':
+        return statement + ' ON CONFLICT DO NOTHING'
+    elif vendor == 'mysql':
+        return statement.replace('INSERT INTO', 'INSERT IGNORE INTO', 1)
+    elif vendor == 'sqlite':
+        return statement.replace('INSERT INTO', 'INSERT OR IGNORE INTO', 1)
+    raise NotImplementedError("Conflict-ignoring insert is not supported for {}".format(vendor))
+
+
+_copy_table_counter = itertools.count()
+
+def copy_insert_ignore(model, objs, using='default'):
+    """
+    Same as bulk_insert_ignore, but loads rows with postgres COPY: objs are streamed as CSV
+    into a temporary table and moved into the model table with one INSERT ... SELECT.
+    Other databases fall back to bulk_insert_ignore.
+    Return number of inserted rows.
+    """
+    if not objs:
+        return 0
+
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        return bulk_insert_ignore(model, objs, using=using)
+
+    fields = [field for field in model._meta.concrete_fields if not isinstance(field, AutoField)]
+    quote_name = connection.ops.quote_name
+    table = quote_name(model._meta.db_table)
+    temp_table = quote_name('copy_{}_{}'.format(model._meta.db_table, next(_copy_table_counter)))
+    columns = ', '.join(quote_name(field.column) for field in fields)
+
+    csv_buffer = io.StringIO()
+    writer = csv.writer(csv_buffer)
+    for obj in objs:
+        writer.writerow([field.get_db_prep_save(field.pre_save(obj, True), connection) for field in fields])
+    csv_buffer.seek(0)
+
+    with transaction.atomic(using=using), connection.cursor() as cursor:
+        cursor.execute('CREATE TEMPORARY TABLE {} ON COMMIT DROP AS SELECT {} FROM {} WITH NO DATA'.format(
+            temp_table, columns, table))
+        # empty unquoted CSV value is NULL
+        cursor.copy_expert('COPY {} ({}) FROM STDIN WITH CSV'.format(temp_table, columns), csv_buffer)
+        cursor.execute('INSERT INTO {table} ({columns}) SELECT {columns} FROM {temp_table} ON CONFLICT DO NOTHING'.format(
+            table=table, columns=columns, temp_table=temp_table))
+        inserted = cursor.rowcount
+        cursor.execute('DROP TABLE {}'.format(temp_table))
+    return inserted
+
+
+def delete_duplicates(model, key_fields, time_field='timestamp', chunk_seconds=60*60, delete_batch_size=1000):
+    """
+    Delete rows with the same key_fields values and keep the one with the smallest id.
+    The table is scanned in short time chunks, every chunk in its own transaction,
+    so we never lock the whole table. time_field must be one of key_fields.
+    Return number of deleted rows.
+    """
+    first_last = model.objects.order_by(time_field).values_list(time_field, flat=True)
+    if not first_last.exists():
+        return 0
+    start_time = to_epoch(first_last.first())
+    end_time = to_epoch(first_last.last())
+
+    deleted = 0
+    chunk_start = start_time
+    while chunk_start <= end_time:
+        chunk_end = chunk_start + chunk_seconds
+        rows = model.objects.filter(**{
+            time_field + '__gte': chunk_start,
+            time_field + '__lt': chunk_end,
+        }).order_by('id').values_list('id', *key_fields)
+
+        seen = set()
+        duplicate_ids = []
+        for row in rows.iterator():
+            key = row[1:]
+            if key in seen:
+                duplicate_ids.append(row[0])
+            else:
+                seen.add(key)
+
+        for start in range(0, len(duplicate_ids), delete_batch_size):
+            with transaction.atomic():
+                deleted += model.objects.filter(id__in=duplicate_ids[start:start + delete_batch_size]).delete()[0]
+
+        if duplicate_ids:
+            logger.info("{}: deleted {} duplicates before {}".format(model.__name__, len(duplicate_ids), chunk_end))
+        chunk_start = chunk_end
+    return deleted
+
+
+def load_timeseries_df(queryset, columns, n=None, time_field='timestamp'):
+    """
+    Read numeric columns of queryset into a DataFrame indexed by time_field (naive UTC), oldest row first.
+    With n only the n most recent rows are read (ORDER BY time_field DESC LIMIT n).
+    Rows are fetched with a raw cursor straight into a float numpy array, the index is converted
+    from unix timestamps in one vectorized call instead of one datetime per row. NULL becomes NaN.
+    """
+    queryset = queryset.order_by('-' + time_field if n else time_field).values_list(time_field, *columns)
+    if n:
+        queryset = queryset[:n]
+    sql, params = queryset.query.get_compiler(using=queryset.db).as_sql()
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+
+    values = np.array(rows, dtype=np.float64).reshape(len(rows), len(columns) + 1)
+    if n:
+        values = values[::-1]
+    # microseconds, same rounding as the datetimes of UnixTimeStampField
+    index = pd.to_datetime(np.round(values[:, 0] * 10 ** 6).astype(np.int64), unit='us')
+    return pd.DataFrame(values[:, 1:], index=index, columns=list(columns))
+
+
+def to_epoch(value):
+    "UnixTimeStampField returns naive UTC datetime, convert it back to a unix timestamp"
+    if isinstance(value, datetime):
+        return (value - datetime(1970, 1, 1)).total_seconds()
+    return float(value)
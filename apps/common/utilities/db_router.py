@@ -0,0 +1,113 @@
+"""
+Read replica routing.
+
+Read-only work is marked with use_replica() (a context manager and a decorator),
+GET requests to REPLICA_URL_PREFIXES are marked by ReplicaMiddleware.
+Reads in a marked block go to a random replica from REPLICA_DATABASES, everything else goes to the primary.
+A replica more than REPLICA_MAX_LAG_SECONDS behind the primary, or one which can't report its lag,
+is skipped until the next lag check, with no healthy replicas we read from the primary.
+"""
+import logging
+import random
+import threading
+import time
+from contextlib import ContextDecorator
+
+from django.conf import settings
+from django.db import connections, DEFAULT_DB_ALIAS
+
+
+logger = logging.getLogger(__name__)
+
+LAG_CHECK_INTERVAL = 10 # seconds
+
+_state = threading.local()
+_replica_lags = {} # alias: (checked at, lag in seconds)
+_replica_lags_lock = threading.Lock()
+
+
+class use_replica(ContextDecorator):
+    "Send reads inside to a read replica, if there is a healthy one"
+
+    def __enter__(self):
+        _state.depth = getattr(_state, 'depth', 0) + 1
+        return self
+
+    def __exit__(self, *exc):
+        _state.depth -= 1
+        return False
+
+def replica_requested():
+    return getattr(_state, 'depth', 0) > 0
+
+
+def get_replica_lag(alias):
+    "Replication lag of alias in seconds, cached for LAG_CHECK_INTERVAL. inf if it's unknown"
+    now = time.time()
+    with _replica_lags_lock:
+        checked_at, lag = _replica_lags.get(alias, (0, None))
+    if now - checked_at < LAG_CHECK_INTERVAL:
+        return lag
+
+    try:
+        lag = _query_replica_lag(alias)
+    except Exception as e:
+        logger.warning("Can't get replication lag of {}: {}".format(alias, e))
+        lag = float('inf')
+    with _replica_lags_lock:
+        _replica_lags[alias] = (now, lag)
+    return lag
+
+def _query_replica_lag(alias):
+    connection = connections[alias]
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(
+                "SELECT CASE WHEN pg_is_in_recovery() "
+                "THEN COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) ELSE 0 END")
+            return float(cursor.fetchone()[0])
+        if connection.vendor == 'mysql':
+            cursor.execute("SHOW SLAVE STATUS")
+            row = cursor.fetchone()
+            if row is None:
+                return 0.0 # not a replica
+            seconds_behind_master = dict(zip([column[0] for column in cursor.description], row))['Seconds_Behind_Master']
+            return float('inf') if seconds_behind_master is None else float(seconds_behind_master) # None: replication stopped
+    return 0.0
+
+def get_healthy_replicas():
+    return [alias for alias in settings.REPLICA_DATABASES if get_replica_lag(alias) <= settings.REPLICA_MAX_LAG_SECONDS]
+
+
+class ReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        # reads in a transaction on the primary must see its writes
+        if not replica_requested() or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return None
+        replicas = get_healthy_replicas()
+        if replicas:
+            return random.choice(replicas)
+        return None
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True # same data everywhere
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in settings.REPLICA_DATABASES # replicas get the schema from the primary
+
+
+class ReplicaMiddleware:
+    "Read from replicas while handling GET requests to REPLICA_URL_PREFIXES"
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if request.method in ('GET', 'HEAD') and request.path.startswith(tuple(settings.REPLICA_URL_PREFIXES)):
+            with use_replica():
+                return self.get_response(request)
+        return self.get_response(request)
@@ -0,0 +1,188 @@
+"""
+Weekly range partitions of tick tables by timestamp (PostgreSQL 11+).
+
+A table is converted once: the old table becomes the first partition holding all history
+before the conversion week, new weeks get their own partitions, created ahead of time.
+Old weeks are detached or dropped instead of DELETEd.
+
+MySQL can't partition on a DOUBLE column (UnixTimeStampField), there retention falls back
+to deleting old rows in small chunks.
+"""
+import logging
+import re
+import time
+from datetime import datetime
+
+from django.db import connections, transaction
+
+
+logger = logging.getLogger(__name__)
+
+WEEK = 7 * 24 * 60 * 60
+FIRST_MONDAY = 4 * 24 * 60 * 60 # 1970-01-05, weeks start on Monday
+MIN_POSTGRES_VERSION = 110000 # unique constraints and ON CONFLICT on partitioned tables
+
+
+def week_start(timestamp):
+    return (timestamp - FIRST_MONDAY) // WEEK * WEEK + FIRST_MONDAY
+
+def partition_name(table, start):
+    return '{}_p{}'.format(table, datetime.utcfromtimestamp(start).strftime('%Y%m%d'))
+
+def legacy_partition_name(table):
+    return table + '_legacy'
+
+
+def partitioning_supported(using='default'):
+    connection = connections[using]
+    return connection.vendor == 'postgresql' and connection.pg_version >= MIN_POSTGRES_VERSION
+
+def is_partitioned(table, using='default'):
+    with connections[using].cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_partitioned_table WHERE partrelid = %s::regclass", [table])
+        return cursor.fetchone() is not None
+
+
+def convert_to_partitioned(table, weeks_ahead=4, using='default'):
+    """
+    Turn table into a table partitioned by timestamp range.
+    All existing rows stay in one partition (table_legacy) for timestamps before the next week,
+    its indexes are reused by the partitioned table.
+    Run it outside of a transaction: the history is checked against the partition bound first,
+    while the table is still readable and writable, then it is converted in one transaction.
+    """
+    connection = connections[using]
+    quote_name = connection.ops.quote_name
+    legacy_table = legacy_partition_name(table)
+    bound_check = legacy_table + '_timestamp_check'
+    first_week = week_start(time.time()) + WEEK
+
+    # ATTACH PARTITION skips its scan of the history when a validated CHECK constraint implies the bound,
+    # VALIDATE CONSTRAINT scans without blocking writes (NOT VALID only locks the table for a moment)
+    with connection.cursor() as cursor:
+        cursor.execute('ALTER TABLE {} ADD CONSTRAINT {} CHECK ("timestamp" < %s) NOT VALID'.format(
+            quote_name(table), quote_name(bound_check)), [first_week])
+    with connection.cursor() as cursor:
+        cursor.execute('ALTER TABLE {} VALIDATE CONSTRAINT {}'.format(quote_name(table), quote_name(bound_check)))
+
+    with transaction.atomic(using=using), connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint WHERE conrelid = %s::regclass AND contype = 'u'",
+            [table])
+        unique_constraints = cursor.fetchall()
+        cursor.execute(
+            "SELECT indexname, indexdef FROM pg_indexes WHERE tablename = %s AND indexname NOT IN "
+            "(SELECT conname FROM pg_constraint WHERE conrelid = %s::regclass)",
+            [table, table])
+        indexes = cursor.fetchall()
+
+        # keep Django index and constraint names on the partitioned table, so later migrations find them
+        cursor.execute('ALTER TABLE {} RENAME TO {}'.format(quote_name(table), quote_name(legacy_table)))
+        for name, _ in unique_constraints + indexes:
+            cursor.execute('ALTER INDEX {} RENAME TO {}'.format(quote_name(name), quote_name(name[:55] + '_legacy')))
+
+        # the primary key can't be kept: it would have to include timestamp
+        cursor.execute('CREATE TABLE {} (LIKE {} INCLUDING DEFAULTS) PARTITION BY RANGE ("timestamp")'.format(
+            quote_name(table), quote_name(legacy_table)))
+        # id sequence must not be dropped together with the legacy partition
+        cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", [legacy_table])
+        cursor.execute('ALTER SEQUENCE {} OWNED BY {}.id'.format(cursor.fetchone()[0], quote_name(table)))
+        for name, definition in unique_constraints:
+            cursor.execute('ALTER TABLE {} ADD CONSTRAINT {} {}'.format(quote_name(table), quote_name(name), definition))
+        for _, definition in indexes:
+            cursor.execute(definition)
+
+        cursor.execute('ALTER TABLE {} ATTACH PARTITION {} FOR VALUES FROM (MINVALUE) TO (%s)'.format(
+            quote_name(table), quote_name(legacy_table)), [first_week])
+        # the partition bound enforces the same from now on
+        cursor.execute('ALTER TABLE {} DROP CONSTRAINT {}'.format(quote_name(legacy_table), quote_name(bound_check)))
+
+    create_partitions(table, weeks_ahead=weeks_ahead, using=using)
+    logger.info("{} is partitioned by week, history before {} is in {}".format(
+        table, datetime.utcfromtimestamp(first_week), legacy_table))
+
+
+def create_partitions(table, weeks_ahead=4, using='default'):
+    "Create missing weekly partitions from the current week up to weeks_ahead. Return names of created partitions"
+    connection = connections[using]
+    quote_name = connection.ops.quote_name
+    existing = {name for name, _, _ in get_partitions(table, using=using)}
+    legacy_upper_bound = next((upper for name, _, upper in get_partitions(table, using=using)
+                               if name == legacy_partition_name(table)), None)
+
+    created = []
+    start = week_start(time.time())
+    with connection.cursor() as cursor:
+        for week in range(weeks_ahead + 1):
+            partition_start = start + week * WEEK
+            name = partition_name(table, partition_start)
+            if name in existing or (legacy_upper_bound is not None and partition_start < legacy_upper_bound):
+                continue
+            cursor.execute('CREATE TABLE {} PARTITION OF {} FOR VALUES FROM (%s) TO (%s)'.format(
+                quote_name(name), quote_name(table)), [partition_start, partition_start + WEEK])
+            created.append(name)
+    return created
+
+
+def get_partitions(table, using='default'):
+    "Return [(partition name, lower bound, upper bound), ...], MINVALUE/MAXVALUE bounds are -inf/inf"
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            "SELECT child.relname, pg_get_expr(child.relpartbound, child.oid) FROM pg_inherits "
+            "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "WHERE pg_inherits.inhparent = %s::regclass", [table])
+        return sorted((name,) + _parse_bounds(bounds) for name, bounds in cursor.fetchall())
+
+def _parse_bounds(bounds):
+    # FOR VALUES FROM (MINVALUE) TO ('1523232000')
+    lower, upper = re.match(r"FOR VALUES FROM \((.+)\) TO \((.+)\)", bounds).groups()
+    return _parse_bound(lower), _parse_bound(upper)
+
+def _parse_bound(bound):
+    bound = bound.strip("'")
+    if bound == 'MINVALUE':
+        return float('-inf')
+    if bound == 'MAXVALUE':
+        return float('inf')
+    return float(bound)
+
+
+def apply_retention(model, retention_days, detach_only=False, using='default', delete_batch_size=10000):
+    """
+    Remove ticks older than retention_days.
+    Partitioned tables lose whole partitions (detached only, if detach_only),
+    other tables are cleaned with small DELETE batches. Return names of removed partitions or a number of deleted rows.
+    """
+    cutoff = time.time() - retention_days * 24 * 60 * 60
+    table = model._meta.db_table
+
+    if not (partitioning_supported(using) and is_partitioned(table, using=using)):
+        return _delete_old_rows(model, cutoff, using, delete_batch_size)
+
+    quote_name = connections[using].ops.quote_name
+    removed = []
+    with connections[using].cursor() as cursor:
+        for name, _, upper_bound in get_partitions(table, using=using):
+            if upper_bound > cutoff:
+                if name == legacy_partition_name(table):
+                    # history from before the conversion is in one big partition, prune it row by row until it expires
+                    _delete_old_rows(model, cutoff, using, delete_batch_size)
+                continue
+            cursor.execute('ALTER TABLE {} DETACH PARTITION {}'.format(quote_name(table), quote_name(name)))
+            if not detach_only:
+                cursor.execute('DROP TABLE {}'.format(quote_name(name)))
+            removed.append(name)
+    return removed
+
+
+def _delete_old_rows(model, cutoff, using, delete_batch_size):
+    deleted = 0
+    while True:
+        with transaction.atomic(using=using):
+            # the timestamp filter keeps the id lookup in partitions with old rows
+            old_rows = model.objects.using(using).filter(timestamp__lt=cutoff)
+            old_ids = list(old_rows.values_list('id', flat=True)[:delete_batch_size])
+            if not old_ids:
+                break
+            deleted += old_rows.filter(id__in=old_ids).delete()[0]
+    return deleted
@@ -0,0 +1,33 @@
+import logging
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.indicator.models.price_resampl import backfill_bars
+from taskapp.helpers import get_exchanges
+
+from settings import PERIODS_LIST, BARS_BACKFILL_DAYS
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    '''
+    Find PriceResampl bars missing in the last --days and compute them from raw ticks.
+    Scheduled indicator runs do the same for BARS_BACKFILL_DAYS before resampling, run this after long outages.
+    Safe to rerun: existing bars are kept.
+    '''
+    help = "Fill gaps in resampled prices"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=float, default=BARS_BACKFILL_DAYS, help="How far back to look for missing bars")
+        parser.add_argument('--periods', type=int, nargs='+', default=PERIODS_LIST, help="Resample periods in minutes")
+        parser.add_argument('--sources', type=int, nargs='+', help="Source codes, all exchanges by default")
+
+    def handle(self, *args, **options):
+        end_time = time.time()
+        start_time = end_time - options['days'] * 24 * 60 * 60
+        for source in options['sources'] or get_exchanges():
+            for resample_period in options['periods']:
+                saved = backfill_bars(source, resample_period, start_time, end_time)
+                logger.info("Source {}, period {}: {} bars backfilled".format(source, resample_period, saved))
@@ -0,0 +1,44 @@
+import logging
+
+from django.core.management.base import BaseCommand
+
+from apps.channel.ingestion import build_unified_ticks
+from apps.common.utilities.db import bulk_insert_ignore, to_epoch
+from apps.indicator.models import Price, Volume, Tick
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    '''
+    Copy history from Price and Volume into the unified Tick table.
+    Run it once during the dual-write period, then set TICKS_READ_UNIFIED=true.
+    Safe to rerun: ticks which are already there are skipped.
+    '''
+    help = "Backfill Tick table from Price and Volume in chunks"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-hours', type=float, default=1, help="Size of one chunk in hours")
+
+    def handle(self, *args, **options):
+        chunk_seconds = options['chunk_hours'] * 60 * 60
+
+        timestamps = Price.objects.order_by('timestamp').values_list('timestamp', flat=True)
+        if not timestamps.exists():
+            logger.info("No prices, nothing to backfill")
+            return
+        chunk_start = to_epoch(timestamps.first())
+        end_time = to_epoch(timestamps.last())
+
+        inserted = 0
+        while chunk_start <= end_time:
+            chunk_filter = {'timestamp__gte': chunk_start, 'timestamp__lt': chunk_start + chunk_seconds}
+            ticks = build_unified_ticks(
+                Price.objects.filter(**chunk_filter),
+                Volume.objects.filter(**chunk_filter)
+            )
+            inserted += bulk_insert_ignore(Tick, ticks)
+            logger.info("  ... {} ticks inserted".format(inserted))
+            chunk_start += chunk_seconds
+
+        logger.info("Done. {} ticks inserted".format(inserted))
@@ -0,0 +1,135 @@
+import logging
+import time
+from datetime import timedelta, datetime
+
+import pandas as pd
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from apps.ai.models.nn_model import AnnModel
+from apps.indicator.models import Price, Volume, PriceResampl, SmaWide, AnnPriceClassification
+from apps.indicator.models.ann_future_price_classification import get_n_last_ann_classif_df
+from apps.indicator.models.price import get_n_last_prices_ts
+from apps.indicator.models.price_resampl import get_n_last_resampl_df
+from apps.indicator.models.rsi import RSI_BARS
+from apps.indicator.models.sma import SMA_LIST, get_n_last_smas_df, sma_field_name
+from apps.indicator.models.volume import get_n_last_volumes_ts
+
+from settings import POLONIEX, BTC, SHORT
+
+logger = logging.getLogger(__name__)
+
+SEED_PAIR = {'source': POLONIEX, 'transaction_currency': 'BENCH', 'counter_currency': BTC}
+
+
+class Command(BaseCommand):
+    '''
+    Time the get_n_last_* loaders against the way they used to read the same data:
+    .values() dicts turned into Series with list comprehensions, windows sized in minutes.
+    With --seed synthetic rows are added for a BENCH pair and rolled back afterwards.
+    '''
+    help = "Micro-benchmark of DataFrame loaders"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--source', type=int, default=POLONIEX)
+        parser.add_argument('--transaction-currency', default='ETH')
+        parser.add_argument('--counter-currency', type=int, default=BTC)
+        parser.add_argument('--resample-period', type=int, default=SHORT)
+        parser.add_argument('--repeat', type=int, default=20, help="Runs of every loader, the best one is reported")
+        parser.add_argument('--seed', type=int, default=0, help="Benchmark on that many synthetic bars (and minutes of ticks)")
+
+    def handle(self, *args, **options):
+        if not options['seed']:
+            pair = {'source': options['source'], 'transaction_currency': options['transaction_currency'],
+                    'counter_currency': options['counter_currency']}
+            return self.report(pair, options['resample_period'], options['repeat'])
+
+        with transaction.atomic():
+            seed(options['seed'], options['resample_period'])
+            self.report(SEED_PAIR, options['resample_period'], options['repeat'])
+            transaction.set_rollback(True)
+
+    def report(self, pair, resample_period, repeat):
+        bars = dict(pair, resample_period=resample_period)
+        sma_columns = [sma_field_name(sma_period, 'close') for sma_period in (50, 200)]
+        loaders = [
+            # name, legacy loader, new loader
+            ('resampl (sma)',
+             lambda: _values_df(PriceResampl, bars, ['low_price', 'high_price', 'close_price', 'midpoint_price'],
+                                resample_period * (resample_period * max(SMA_LIST) + 5)),
+             lambda: get_n_last_resampl_df(max(SMA_LIST) + 5, **bars)),
+            ('resampl (rsi)',
+             lambda: _values_df(PriceResampl, bars, ['close_price'], resample_period * 20 * resample_period),
+             lambda: get_n_last_resampl_df(RSI_BARS, **bars)),
+            ('smas',
+             lambda: _values_df(SmaWide, bars, sma_columns, resample_period * 200 * 35),
+             lambda: get_n_last_smas_df(35, [50, 200], price_types=['close'], **bars)),
+            ('ann_classif',
+             lambda: _values_df(AnnPriceClassification, bars, ['probability_same', 'probability_up', 'probability_down'], resample_period * 4),
+             lambda: get_n_last_ann_classif_df(4, **bars)),
+            ('prices',
+             lambda: _values_df(Price, pair, ['price'], 24 * 60),
+             lambda: get_n_last_prices_ts(24 * 60, **pair)),
+            ('volumes',
+             lambda: _values_df(Volume, pair, ['volume'], 24 * 60),
+             lambda: get_n_last_volumes_ts(24 * 60, **pair)),
+        ]
+
+        self.stdout.write("{:<16}{:>12}{:>12}{:>12}{:>10}".format('loader', 'rows', 'legacy ms', 'new ms', 'speedup'))
+        for name, legacy_loader, new_loader in loaders:
+            legacy_time, legacy_result = _best_time(legacy_loader, repeat)
+            new_time, new_result = _best_time(new_loader, repeat)
+            self.stdout.write("{:<16}{:>12}{:>12.2f}{:>12.2f}{:>9.1f}x".format(
+                name, '{}/{}'.format(len(new_result) if new_result is not None else 0, len(legacy_result)),
+                legacy_time * 1000, new_time * 1000, legacy_time / new_time if new_time else 0))
+
+
+def _best_time(loader, repeat):
+    best, result = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = loader()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def _values_df(model, filters, columns, minutes):
+    "Loaders before load_timeseries_df: a window in minutes, one dict per row, one Series per column"
+    records = list(model.objects.filter(
+        timestamp__gte=datetime.now() - timedelta(minutes=minutes), **filters
+    ).values('timestamp', *columns).order_by('-timestamp'))
+
+    df = pd.DataFrame()
+    if records:
+        ts = [rec['timestamp'] for rec in records]
+        for column in columns:
+            df[column] = pd.Series(data=[rec[column] for rec in records], index=ts)
+        df = df.iloc[::-1]
+    return df
+
+
+def seed(bars, resample_period):
+    "bars records of resampled prices, SMAs, ANN classifications and minutes of ticks for SEED_PAIR up to now"
+    now = time.time() // 60 * 60
+    period_seconds = resample_period * 60
+    bar_timestamps = [now // period_seconds * period_seconds - bar * period_seconds for bar in range(bars)]
+    bar_params = dict(SEED_PAIR, resample_period=resample_period)
+
+    PriceResampl.objects.bulk_create([
+        PriceResampl(timestamp=timestamp, low_price=7000000 + bar, high_price=7100000 + bar, close_price=7050000 + bar,
+                     midpoint_price=7050000 + bar, **bar_params)
+        for bar, timestamp in enumerate(bar_timestamps)])
+    SmaWide.objects.bulk_create([
+        SmaWide(timestamp=timestamp, sma50_close_price=7000000 + bar, sma200_close_price=7100000 + bar, **bar_params)
+        for bar, timestamp in enumerate(bar_timestamps)])
+    ann_model = AnnModel.objects.create(source=POLONIEX, model_name='benchmark', s3_model_file='none', period=10,
+                                        slide_win_size=200, predicted_win_size=2, delta_tolerance=0.01)
+    AnnPriceClassification.objects.bulk_create([
+        AnnPriceClassification(timestamp=timestamp, ann_model=ann_model, probability_same=0.2, probability_up=0.5,
+                               probability_down=0.3, **bar_params)
+        for timestamp in bar_timestamps])
+    Price.objects.bulk_create([Price(timestamp=now - minute * 60, price=7000000 + minute, **SEED_PAIR)
+                               for minute in range(bars)])
+    Volume.objects.bulk_create([Volume(timestamp=now - minute * 60, volume=100.0 + minute, **SEED_PAIR)
+                                for minute in range(bars)])
@@ -0,0 +1,116 @@
+import logging
+from datetime import timedelta
+
+import pandas as pd
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from apps.common.utilities.db import bulk_insert_ignore
+from apps.indicator.models import Price, Volume, Tick, TickBar
+from apps.indicator.models.tick_bar import BAR_PERIOD, get_compacted_before
+
+from settings import TICKS_COMPACT_AFTER_DAYS, TICKS_READ_UNIFIED, BARS_BACKFILL_DAYS, LONG
+
+logger = logging.getLogger(__name__)
+
+KEY = ['source', 'transaction_currency', 'counter_currency', 'timestamp']
+# bars are aggregated from raw ticks that far back: backfill_bars and LONG bars without all SHORT bars
+MIN_COMPACT_AFTER_DAYS = max(BARS_BACKFILL_DAYS, LONG / (24 * 60))
+
+
+class Command(BaseCommand):
+    '''
+    Compact raw ticks older than --older-than-days into 10 minute TickBar rows and remove the raw rows.
+    Runs daily from celery beat too, see compact_ticks task.
+    '''
+    help = "Replace old raw ticks with 10 minute bars"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than-days', type=int, default=TICKS_COMPACT_AFTER_DAYS, help="Compact ticks older than that, 0 to do nothing")
+        parser.add_argument('--window-hours', type=int, default=24, help="Ticks compacted in one transaction")
+
+    def handle(self, *args, **options):
+        try:
+            compact_ticks(options['older_than_days'], options['window_hours'])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+
+def compact_ticks(older_than_days=TICKS_COMPACT_AFTER_DAYS, window_hours=24):
+    "Return number of saved bars"
+    if older_than_days and older_than_days <= MIN_COMPACT_AFTER_DAYS:
+        raise ValueError("Ticks newer than {} days are needed to backfill bars, compact ticks older than that".format(MIN_COMPACT_AFTER_DAYS))
+    compacted_before = get_compacted_before(older_than_days)
+    if compacted_before is None:
+        return 0
+    # bars are built from the tables readers use, raw rows are removed from all of them
+    source_models = (Tick,) if TICKS_READ_UNIFIED else (Price, Volume)
+
+    oldest = [model.objects.filter(timestamp__lt=compacted_before).order_by('timestamp').values_list('timestamp', flat=True).first()
+              for model in source_models]
+    oldest = [timestamp for timestamp in oldest if timestamp is not None]
+    if not oldest:
+        return 0
+    window_start = min(oldest)
+    window_start -= timedelta(minutes=window_start.minute % BAR_PERIOD, seconds=window_start.second,
+                              microseconds=window_start.microsecond)
+
+    saved = 0
+    while window_start < compacted_before:
+        window_end = min(window_start + timedelta(hours=window_hours), compacted_before)
+        with transaction.atomic():
+            bars = build_bars(*_load_ticks(source_models, window_start, window_end))
+            saved += bulk_insert_ignore(TickBar, bars)
+            for model in (Price, Volume, Tick):
+                model.objects.filter(timestamp__gte=window_start, timestamp__lt=window_end).delete()
+        logger.info("  ... ticks before {} compacted, {} bars saved".format(window_end, len(bars)))
+        window_start = window_end
+    return saved
+
+
+def _load_ticks(source_models, window_start, window_end):
+    "Return price and volume records in the window as lists of (source, transaction_currency, counter_currency, timestamp, value)"
+    records = {}
+    for model in source_models:
+        for column in ('price', 'volume'):
+            if column not in [field.name for field in model._meta.fields]:
+                continue
+            records[column] = list(model.objects.filter(
+                timestamp__gte=window_start, timestamp__lt=window_end, **{column + '__isnull': False}
+            ).values_list(*KEY + [column]))
+    return records.get('price', []), records.get('volume', [])
+
+
+def build_bars(price_records, volume_records):
+    "Aggregate (source, transaction_currency, counter_currency, timestamp, value) records into unsaved TickBars"
+    aggregates = [_aggregate(records, column) for records, column in ((price_records, 'price'), (volume_records, 'volume'))
+                  if records]
+    if not aggregates:
+        return []
+    bars_df = aggregates[0]
+    for aggregate in aggregates[1:]:
+        bars_df = bars_df.join(aggregate, how='outer')
+
+    bars = []
+    for (source, transaction_currency, counter_currency, timestamp), bar in bars_df.iterrows():
+        bar = bar.astype(object).where(pd.notnull(bar), None)
+        bars.append(TickBar(
+            source=source,
+            transaction_currency=transaction_currency,
+            counter_currency=counter_currency,
+            timestamp=timestamp.to_pydatetime(),
+            price=None if bar.get('price') is None else int(round(bar['price'])),
+            price_variance=bar.get('price_variance'),
+            price_count=int(bar.get('price_count') or 0),
+            volume=bar.get('volume'),
+            volume_variance=bar.get('volume_variance'),
+            volume_count=int(bar.get('volume_count') or 0),
+        ))
+    return bars
+
+def _aggregate(records, column):
+    ticks_df = pd.DataFrame.from_records(records, columns=KEY + [column])
+    ticks_df['timestamp'] = ticks_df['timestamp'].dt.floor('{}min'.format(BAR_PERIOD))
+    bars_df = ticks_df.groupby(KEY)[column].agg(['mean', 'var', 'count'])
+    bars_df.columns = [column, column + '_variance', column + '_count']
+    return bars_df
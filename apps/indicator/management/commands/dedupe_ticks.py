@@ -0,0 +1,31 @@
+import logging
+
+from django.core.management.base import BaseCommand
+
+from apps.common.utilities.db import delete_duplicates
+from apps.indicator.models import Price, Volume, PriceResampl
+
+logger = logging.getLogger(__name__)
+
+TICK_KEY = ('source', 'transaction_currency', 'counter_currency', 'timestamp')
+BAR_KEY = ('source', 'resample_period', 'transaction_currency', 'counter_currency', 'timestamp')
+
+
+class Command(BaseCommand):
+    '''
+    Delete duplicated Price and Volume ticks (same source, pair and timestamp) created by SQS redeliveries,
+    and duplicated PriceResampl bars saved concurrently by resampling and the bar stream.
+    Tables are processed in short time chunks, so ingestion is not blocked.
+    Run it before migrating to the unique tick and bar constraints.
+    '''
+    help = "Delete duplicated Price, Volume and PriceResampl records in chunks"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-hours', type=float, default=1, help="Size of one chunk in hours")
+
+    def handle(self, *args, **options):
+        chunk_seconds = options['chunk_hours'] * 60 * 60
+        for model, key in ((Price, TICK_KEY), (Volume, TICK_KEY), (PriceResampl, BAR_KEY)):
+            logger.info("Deleting duplicated {} records...".format(model.__name__))
+            deleted = delete_duplicates(model, key, chunk_seconds=chunk_seconds)
+            logger.info("{}: {} duplicates deleted".format(model.__name__, deleted))
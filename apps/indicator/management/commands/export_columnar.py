@@ -0,0 +1,114 @@
+import json
+import logging
+import os
+import time
+
+import numpy as np
+import pandas as pd
+from django.core.management.base import BaseCommand, CommandError
+from django.db import models
+from unixtimestampfield.fields import UnixTimeStampField
+
+from apps.common.utilities.columnar import partition_path, append_partition
+from apps.common.utilities.db_router import use_replica
+from apps.indicator.models import Price, Volume, Tick, TickBar, PriceResampl, Sma, SmaWide, Rsi, EventsElementary, EventsElementaryBits, EventsLogical, AnnPriceClassification
+from apps.signal.models import Signal
+
+from settings import SOURCE_CHOICES, COUNTER_CURRENCY_CHOICES
+
+logger = logging.getLogger(__name__)
+
+EXPORTED_MODELS = (Price, Volume, Tick, TickBar, PriceResampl, Sma, SmaWide, Rsi, EventsElementary, EventsElementaryBits, EventsLogical, AnnPriceClassification, Signal)
+PARTITION_KEY = ['source', 'transaction_currency', 'counter_currency', 'month']
+
+
+class Command(BaseCommand):
+    '''
+    Export history tables to columnar .npy files, see apps.common.utilities.columnar.
+    Only rows added since the previous export (by id) are exported, run it from cron as often as needed.
+    Read the files with apps.common.utilities.columnar.read_history().
+    '''
+    help = "Incremental export of ticks, indicators and signals to memory-mappable columnar files"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Root directory of the columnar files")
+        parser.add_argument('--tables', nargs='+', help="Tables to export, all by default: {}".format(
+            ', '.join(model._meta.db_table for model in EXPORTED_MODELS)))
+        parser.add_argument('--chunk-size', type=int, default=100000, help="Rows read from DB at once")
+
+    def handle(self, *args, **options):
+        models_by_table = {model._meta.db_table: model for model in EXPORTED_MODELS}
+        tables = options['tables'] or list(models_by_table)
+        unknown = set(tables) - set(models_by_table)
+        if unknown:
+            raise CommandError("Unknown tables: {}".format(', '.join(sorted(unknown))))
+
+        for table in tables:
+            start = time.time()
+            with use_replica():
+                exported = export_model(models_by_table[table], options['path'], options['chunk_size'])
+            logger.info("{}: {} rows exported in {:.1f}s".format(table, exported, time.time() - start))
+
+
+def export_model(model, root, chunk_size=100000):
+    """
+    Append rows with id above the last exported one to the columnar files of model.
+    Rows committed later with a lower id (long concurrent transactions) are not picked up.
+    Return number of exported rows.
+    """
+    table = model._meta.db_table
+    state_file = os.path.join(root, table, '_state.json')
+    last_id = 0
+    if os.path.exists(state_file):
+        with open(state_file) as state:
+            last_id = json.load(state)['last_id']
+
+    fields = model._meta.concrete_fields
+    exported = 0
+    while True:
+        rows = list(model.objects.filter(id__gt=last_id).order_by('id')
+                    .values_list(*[field.attname for field in fields])[:chunk_size])
+        if not rows:
+            break
+        rows_df = pd.DataFrame.from_records(rows, columns=[field.attname for field in fields])
+        columns = {field.attname: _to_array(field, rows_df[field.attname]) for field in fields}
+        exported += _write_partitions(root, table, columns)
+
+        last_id = rows[-1][0]
+        os.makedirs(os.path.dirname(state_file), exist_ok=True)
+        with open(state_file + '.tmp', 'w') as state:
+            json.dump({'last_id': last_id}, state)
+        os.replace(state_file + '.tmp', state_file)
+    return exported
+
+
+def _to_array(field, values):
+    if isinstance(field, UnixTimeStampField):
+        return (pd.to_datetime(values) - pd.Timestamp(0)).dt.total_seconds().values
+    if isinstance(field, models.DateTimeField):
+        return pd.to_datetime(values).values
+    if isinstance(field, (models.CharField, models.TextField)):
+        return values.fillna('').values.astype(str)
+    if isinstance(field, models.BooleanField):
+        return values.fillna(False).values.astype(bool)
+    if field.null or isinstance(field, models.FloatField):
+        return pd.to_numeric(values).values.astype(np.float64)
+    return values.values.astype(np.int64)
+
+
+def _write_partitions(root, table, columns):
+    source_names = dict(SOURCE_CHOICES)
+    counter_currency_names = dict(COUNTER_CURRENCY_CHOICES)
+    key_df = pd.DataFrame({
+        'source': columns['source'],
+        'transaction_currency': columns['transaction_currency'],
+        'counter_currency': columns['counter_currency'],
+        'month': pd.to_datetime(columns['timestamp'], unit='s').strftime('%Y-%m'),
+    })
+
+    appended = 0
+    for (source, transaction_currency, counter_currency, month), rows_index in key_df.groupby(PARTITION_KEY).indices.items():
+        path = partition_path(root, table, source_names.get(source, str(source)), transaction_currency,
+                              counter_currency_names.get(counter_currency, str(counter_currency)), month)
+        appended += append_partition(path, {name: values[rows_index] for name, values in columns.items()})
+    return appended
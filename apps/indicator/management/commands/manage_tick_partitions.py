@@ -0,0 +1,37 @@
+import logging
+
+from django.core.management.base import BaseCommand
+
+from apps.common.utilities.partitions import partitioning_supported, is_partitioned, create_partitions, apply_retention
+from apps.indicator.models import Price, Volume, Tick
+
+from settings import TICKS_RETENTION_DAYS
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    '''
+    Create upcoming weekly partitions of Price, Volume and Tick tables and apply the retention policy.
+    Runs daily from celery beat too, see maintain_tick_partitions task.
+    '''
+    help = "Pre-create tick partitions and drop expired ones"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--weeks-ahead', type=int, default=4, help="Partitions to create ahead of time")
+        parser.add_argument('--retention-days', type=int, default=TICKS_RETENTION_DAYS, help="Keep ticks that long, 0 to keep forever")
+        parser.add_argument('--detach-only', action='store_true', help="Detach expired partitions instead of dropping them")
+
+    def handle(self, *args, **options):
+        maintain_tick_partitions(options['weeks_ahead'], options['retention_days'], options['detach_only'])
+
+
+def maintain_tick_partitions(weeks_ahead=4, retention_days=TICKS_RETENTION_DAYS, detach_only=False):
+    for model in (Price, Volume, Tick):
+        table = model._meta.db_table
+        if partitioning_supported() and is_partitioned(table):
+            created = create_partitions(table, weeks_ahead=weeks_ahead)
+            logger.info("{}: partitions created: {}".format(table, created or "none"))
+        if retention_days:
+            removed = apply_retention(model, retention_days, detach_only=detach_only)
+            logger.info("{}: ticks older than {} days removed: {}".format(table, retention_days, removed))
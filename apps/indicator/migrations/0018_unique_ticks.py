@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11 on 2026-10-18 17:47
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+from apps.common.utilities.db import delete_duplicates
+
+TICK_KEY = ('source', 'transaction_currency', 'counter_currency', 'timestamp')
+
+
+def delete_duplicate_ticks(apps, schema_editor):
+    # unique index can't be created while duplicates exist
+    # run "manage.py dedupe_ticks" before the deploy to make this step fast
+    for model_name in ('Price', 'Volume'):
+        delete_duplicates(apps.get_model('indicator', model_name), TICK_KEY)
+
+
+class Migration(migrations.Migration):
+
+    # deduplicate in short transactions, not in one long transaction over the whole table
+    atomic = False
+
+    dependencies = [
+        ('indicator', '0017_add_indexes_to_price_sma_priceresampl'),
+    ]
+
+    operations = [
+        migrations.RunPython(delete_duplicate_ticks, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='price',
+            unique_together=set([('source', 'transaction_currency', 'counter_currency', 'timestamp')]),
+        ),
+        migrations.AlterUniqueTogether(
+            name='volume',
+            unique_together=set([('source', 'transaction_currency', 'counter_currency', 'timestamp')]),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11 on 2026-10-18 17:51
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import unixtimestampfield.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('indicator', '0018_unique_ticks'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tick',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.SmallIntegerField(choices=[(0, 'poloniex'), (1, 'bittrex'), (2, 'binance'), (3, 'bitfinex'), (4, 'kucoin'), (5, 'gdax'), (6, 'hitbtc')])),
+                ('transaction_currency', models.CharField(max_length=6)),
+                ('counter_currency', models.SmallIntegerField(choices=[(0, 'BTC'), (1, 'ETH'), (2, 'USDT'), (3, 'XMR')], default=0)),
+                ('price', models.BigIntegerField(null=True)),
+                ('volume', models.FloatField(null=True)),
+                ('timestamp', unixtimestampfield.fields.UnixTimeStampField()),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='tick',
+            unique_together=set([('source', 'transaction_currency', 'counter_currency', 'timestamp')]),
+        ),
+    ]
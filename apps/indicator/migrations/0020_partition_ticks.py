@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+from apps.common.utilities.partitions import partitioning_supported, is_partitioned, convert_to_partitioned
+
+
+def partition_tick_tables(apps, schema_editor):
+    # only PostgreSQL 11+ can partition these tables, other databases rely on chunked retention deletes
+    if not partitioning_supported(schema_editor.connection.alias):
+        return
+    for model_name in ('Price', 'Volume', 'Tick'):
+        table = apps.get_model('indicator', model_name)._meta.db_table
+        if not is_partitioned(table, using=schema_editor.connection.alias):
+            convert_to_partitioned(table, using=schema_editor.connection.alias)
+
+
+class Migration(migrations.Migration):
+    # convert_to_partitioned validates the history before it locks a table, in its own transactions
+    atomic = False
+
+    dependencies = [
+        ('indicator', '0019_tick'),
+    ]
+
+    operations = [
+        # not reversible in place, the legacy partitions keep all history from before the migration
+        migrations.RunPython(partition_tick_tables, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11 on 2026-10-18 17:58
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('indicator', '0020_partition_ticks'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='annpriceclassification',
+            index=models.Index(fields=['source', 'resample_period', 'counter_currency', 'transaction_currency', 'timestamp'], name='indicator_a_source_29c78f_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='eventselementary',
+            index=models.Index(fields=['source', 'resample_period', 'counter_currency', 'transaction_currency', 'timestamp'], name='indicator_e_source_d32831_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='price',
+            index=models.Index(fields=['transaction_currency', 'counter_currency', 'timestamp'], name='indicator_p_transac_8ec8f0_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='priceresampl',
+            index=models.Index(fields=['source', 'resample_period', 'counter_currency', 'transaction_currency', 'timestamp'], name='indicator_p_source_2ae74b_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='rsi',
+            index=models.Index(fields=['source', 'resample_period', 'counter_currency', 'transaction_currency', 'timestamp'], name='indicator_r_source_8d3b82_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sma',
+            index=models.Index(fields=['source', 'resample_period', 'counter_currency', 'transaction_currency', 'sma_period', 'timestamp'], name='indicator_s_source_989ebb_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='volume',
+            index=models.Index(fields=['transaction_currency', 'counter_currency', 'timestamp'], name='indicator_v_transac_b7a3a6_idx'),
+        ),
+        # drop the old indexes only when their replacements exist
+        migrations.RemoveIndex(
+            model_name='priceresampl',
+            name='indicator_p_source_61ed12_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='sma',
+            name='indicator_s_source_b04535_idx',
+        ),
+    ]
@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11 on 2026-10-18 18:04
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import unixtimestampfield.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('indicator', '0022_priceresampl_price_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TickBar',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.SmallIntegerField(choices=[(0, 'poloniex'), (1, 'bittrex'), (2, 'binance'), (3, 'bitfinex'), (4, 'kucoin'), (5, 'gdax'), (6, 'hitbtc')])),
+                ('transaction_currency', models.CharField(max_length=6)),
+                ('counter_currency', models.SmallIntegerField(choices=[(0, 'BTC'), (1, 'ETH'), (2, 'USDT'), (3, 'XMR')], default=0)),
+                ('timestamp', unixtimestampfield.fields.UnixTimeStampField()),
+                ('price', models.BigIntegerField(null=True)),
+                ('price_variance', models.FloatField(null=True)),
+                ('price_count', models.IntegerField(default=0)),
+                ('volume', models.FloatField(null=True)),
+                ('volume_variance', models.FloatField(null=True)),
+                ('volume_count', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='tickbar',
+            unique_together=set([('source', 'transaction_currency', 'counter_currency', 'timestamp')]),
+        ),
+    ]
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11 on 2026-10-18 18:13
+from __future__ import unicode_literals
+
+import itertools
+
+from django.db import migrations, models
+import unixtimestampfield.fields
+
+
+KEY = ('source', 'transaction_currency', 'counter_currency', 'resample_period', 'timestamp')
+PRICE_TYPES = ('close', 'high', 'midpoint')
+
+
+def copy_sma_rows(apps, schema_editor):
+    "Pivot Sma rows (one per period) into one SmaWide row per bar"
+    Sma = apps.get_model('indicator', 'Sma')
+    SmaWide = apps.get_model('indicator', 'SmaWide')
+    using = schema_editor.connection.alias
+
+    sma_rows = Sma.objects.using(using).order_by(*KEY).values_list(
+        *KEY + ('sma_period', 'sma_close_price', 'sma_high_price', 'sma_midpoint_price')).iterator()
+    batch = []
+    for key, rows in itertools.groupby(sma_rows, key=lambda row: row[:len(KEY)]):
+        sma_wide = SmaWide(**dict(zip(KEY, key)))
+        for row in rows:
+            sma_period, prices = row[len(KEY)], row[len(KEY) + 1:]
+            for price_type, price in zip(PRICE_TYPES, prices):
+                field_name = 'sma{}_{}_price'.format(sma_period, price_type)
+                if hasattr(sma_wide, field_name): # periods which are not in SMA_LIST anymore are dropped
+                    setattr(sma_wide, field_name, price)
+        batch.append(sma_wide)
+        if len(batch) >= 5000:
+            SmaWide.objects.using(using).bulk_create(batch)
+            batch = []
+    SmaWide.objects.using(using).bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('indicator', '0023_tickbar'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SmaWide',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.SmallIntegerField(choices=[(0, 'poloniex'), (1, 'bittrex'), (2, 'binance'), (3, 'bitfinex'), (4, 'kucoin'), (5, 'gdax'), (6, 'hitbtc')])),
+                ('counter_currency', models.SmallIntegerField(choices=[(0, 'BTC'), (1, 'ETH'), (2, 'USDT'), (3, 'XMR')], default=0)),
+                ('transaction_currency', models.CharField(max_length=6)),
+                ('timestamp', unixtimestampfield.fields.UnixTimeStampField()),
+                ('resample_period', models.PositiveSmallIntegerField(default=60)),
+                ('sma9_close_price', models.BigIntegerField(null=True)),
+                ('sma9_high_price', models.BigIntegerField(null=True)),
+                ('sma9_midpoint_price', models.BigIntegerField(null=True)),
+                ('sma20_close_price', models.BigIntegerField(null=True)),
+                ('sma20_high_price', models.BigIntegerField(null=True)),
+                ('sma20_midpoint_price', models.BigIntegerField(null=True)),
+                ('sma26_close_price', models.BigIntegerField(null=True)),
+                ('sma26_high_price', models.BigIntegerField(null=True)),
+                ('sma26_midpoint_price', models.BigIntegerField(null=True)),
+                ('sma30_close_price', models.BigIntegerField(null=True)),
+                ('sma30_high_price', models.BigIntegerField(null=True)),
+                ('sma30_midpoint_price', models.BigIntegerField(null=True)),
+                ('sma50_close_price', models.BigIntegerField(null=True)),
+                ('sma50_high_price', models.BigIntegerField(null=True)),
+                ('sma50_midpoint_price', models.BigIntegerField(null=True)),
+                ('sma52_close_price', models.BigIntegerField(null=True)),
+                ('sma52_high_price', models.BigIntegerField(null=True)),
+                ('sma52_midpoint_price', models.BigIntegerField(null=True)),
+                ('sma60_close_price', models.BigIntegerField(null=True)),
+                ('sma60_high_price', models.BigIntegerField(null=True)),
+                ('sma60_midpoint_price', models.BigIntegerField(null=True)),
+                ('sma120_close_price', models.BigIntegerField(null=True)),
+                ('sma120_high_price', models.BigIntegerField(null=True)),
+                ('sma120_midpoint_price', models.BigIntegerField(null=True)),
+                ('sma200_close_price', models.BigIntegerField(null=True)),
+                ('sma200_high_price', models.BigIntegerField(null=True)),
+                ('sma200_midpoint_price', models.BigIntegerField(null=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='smawide',
+            index=models.Index(fields=['source', 'resample_period', 'counter_currency', 'transaction_currency', 'timestamp'], name='indicator_s_source_f7f34d_idx'),
+        ),
+        # Sma table is kept as it is, drop it when history in SmaWide is verified
+        migrations.RunPython(copy_sma_rows, migrations.RunPython.noop),
+    ]
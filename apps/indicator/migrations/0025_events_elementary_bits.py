@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11 on 2026-10-18 18:15
+from __future__ import unicode_literals
+
+import itertools
+
+from django.db import migrations, models
+import unixtimestampfield.fields
+
+
+KEY = ('source', 'transaction_currency', 'counter_currency', 'resample_period', 'timestamp')
+
+
+def copy_events_rows(apps, schema_editor):
+    "Pivot EventsElementary rows (one per event) into one EventsElementaryBits row per bar"
+    from apps.indicator.models.events_elementary import BITSET_ELEMENTARY_EVENTS, VALUED_ELEMENTARY_EVENTS
+    EventsElementary = apps.get_model('indicator', 'EventsElementary')
+    EventsElementaryBits = apps.get_model('indicator', 'EventsElementaryBits')
+    using = schema_editor.connection.alias
+
+    events_rows = EventsElementary.objects.using(using).order_by(*KEY).values_list(
+        *KEY + ('event_name', 'event_value', 'event_second_value')).iterator()
+    batch = []
+    for key, rows in itertools.groupby(events_rows, key=lambda row: row[:len(KEY)]):
+        events_bits = EventsElementaryBits(**dict(zip(KEY, key)))
+        for event_name, event_value, event_second_value in (row[len(KEY):] for row in rows):
+            if event_name in BITSET_ELEMENTARY_EVENTS:
+                events_bits.events_mask |= 1 << BITSET_ELEMENTARY_EVENTS.index(event_name)
+            elif event_name in VALUED_ELEMENTARY_EVENTS:
+                setattr(events_bits, event_name, event_value)
+                if event_name == 'rsi_bracket':
+                    events_bits.rsi_value = event_second_value
+        batch.append(events_bits)
+        if len(batch) >= 5000:
+            EventsElementaryBits.objects.using(using).bulk_create(batch)
+            batch = []
+    EventsElementaryBits.objects.using(using).bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('indicator', '0024_smawide'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventsElementaryBits',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.SmallIntegerField(choices=[(0, 'poloniex'), (1, 'bittrex'), (2, 'binance'), (3, 'bitfinex'), (4, 'kucoin'), (5, 'gdax'), (6, 'hitbtc')])),
+                ('counter_currency', models.SmallIntegerField(choices=[(0, 'BTC'), (1, 'ETH'), (2, 'USDT'), (3, 'XMR')], default=0)),
+                ('transaction_currency', models.CharField(max_length=6)),
+                ('timestamp', unixtimestampfield.fields.UnixTimeStampField()),
+                ('resample_period', models.PositiveSmallIntegerField(default=60)),
+                ('events_mask', models.BigIntegerField(default=0)),
+                ('rsi_bracket', models.SmallIntegerField(null=True)),
+                ('rsi_value', models.FloatField(null=True)),
+                ('ann_price_2class_simple', models.SmallIntegerField(null=True)),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='eventselementarybits',
+            unique_together=set([('source', 'resample_period', 'counter_currency', 'transaction_currency', 'timestamp')]),
+        ),
+        # EventsElementary table is kept as it is, drop it when history in EventsElementaryBits is verified
+        migrations.RunPython(copy_events_rows, migrations.RunPython.noop),
+    ]
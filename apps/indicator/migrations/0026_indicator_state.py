@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11 on 2026-10-18 18:34
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import unixtimestampfield.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('indicator', '0025_events_elementary_bits'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IndicatorState',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.SmallIntegerField(choices=[(0, 'poloniex'), (1, 'bittrex'), (2, 'binance'), (3, 'bitfinex'), (4, 'kucoin'), (5, 'gdax'), (6, 'hitbtc')])),
+                ('counter_currency', models.SmallIntegerField(choices=[(0, 'BTC'), (1, 'ETH'), (2, 'USDT'), (3, 'XMR')], default=0)),
+                ('transaction_currency', models.CharField(max_length=6)),
+                ('timestamp', unixtimestampfield.fields.UnixTimeStampField()),
+                ('resample_period', models.PositiveSmallIntegerField(default=60)),
+                ('version', models.PositiveSmallIntegerField(default=1)),
+                ('state', models.TextField(default='')),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='indicatorstate',
+            unique_together=set([('source', 'resample_period', 'counter_currency', 'transaction_currency')]),
+        ),
+    ]
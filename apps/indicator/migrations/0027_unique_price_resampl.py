@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11 on 2026-10-18 19:02
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+from apps.common.utilities.db import delete_duplicates
+
+BAR_KEY = ('source', 'resample_period', 'transaction_currency', 'counter_currency', 'timestamp')
+
+
+def delete_duplicate_bars(apps, schema_editor):
+    # unique index can't be created while duplicates exist
+    # run "manage.py dedupe_ticks" before the deploy to make this step fast
+    delete_duplicates(apps.get_model('indicator', 'PriceResampl'), BAR_KEY)
+
+
+class Migration(migrations.Migration):
+
+    # deduplicate in short transactions, not in one long transaction over the whole table
+    atomic = False
+
+    dependencies = [
+        ('indicator', '0026_indicator_state'),
+    ]
+
+    operations = [
+        migrations.RunPython(delete_duplicate_bars, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='priceresampl',
+            unique_together=set([('source', 'resample_period', 'transaction_currency', 'counter_currency', 'timestamp')]),
+        ),
+    ]
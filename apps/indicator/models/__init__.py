@@ -1,20 +1,28 @@
 from apps.indicator.models.price import Price
 from apps.indicator.models.volume import Volume
-from apps.indicator.models.sma import Sma
+from apps.indicator.models.tick import Tick
+from apps.indicator.models.tick_bar import TickBar
+from apps.indicator.models.sma import Sma, SmaWide
 from apps.indicator.models.rsi import Rsi
-from apps.indicator.models.events_elementary import EventsElementary
+from apps.indicator.models.events_elementary import EventsElementary, EventsElementaryBits
 from apps.indicator.models.events_logical import EventsLogical
 from apps.indicator.models.price_resampl import PriceResampl
 from apps.indicator.models.ann_future_price_classification import AnnPriceClassification
+from apps.indicator.models.indicator_state import IndicatorState
 
 __all__ = [
     Price,
     Volume,
+    Tick,
+    TickBar,
     PriceResampl,
     Sma,
+    SmaWide,
     Rsi,
     AnnPriceClassification,
     EventsElementary,
+    EventsElementaryBits,
     EventsLogical,
+    IndicatorState,
 
 ]
@@ -6,19 +6,25 @@ NOTE: before using AI prediction a AI model must be manually added as follows
 
 '''
 import time
-from datetime import timedelta, datetime
 import pandas as pd
 import numpy as np
 
 from django.db import models
+from apps.common.utilities.db import load_timeseries_df
 from apps.indicator.models.abstract_indicator import AbstractIndicator
+from apps.indicator.series_cache import cached_df, get_series_cache, series_key
 from apps.ai.models.nn_model import AnnModel
 from apps.indicator.models.price import get_n_last_prices_ts
 from apps.indicator.models.volume import get_n_last_volumes_ts
+from apps.indicator.models.tick import get_n_last_ticks_df
+
+from settings import TICKS_READ_UNIFIED
 
 import logging
 logger = logging.getLogger(__name__)
 
+ANN_CLASSIF_COLUMNS = ['probability_same', 'probability_up', 'probability_down', 'predicted_ahead_for']
+
 
 class AnnPriceClassification(AbstractIndicator):
     '''
@@ -32,6 +38,11 @@ class AnnPriceClassification(AbstractIndicator):
     probability_up = models.FloatField(null=True)
     probability_down = models.FloatField(null=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['source', 'resample_period', 'counter_currency', 'transaction_currency', 'timestamp']),
+        ]
+
     @property
     def get_max_prob_same_up_down(self):
         return np.argmax([self.probability_same, self.probability_up, self.probability_down])
@@ -61,6 +72,10 @@ class AnnPriceClassification(AbstractIndicator):
                 probability_down = trend_predicted[2]
             )
             new_instance.save()
+            cache = get_series_cache()
+            if cache is not None:
+                cache.append(series_key('ann_classif', **kwargs), kwargs['timestamp'],
+                             {column: getattr(new_instance, column) for column in ANN_CLASSIF_COLUMNS})
             logger.info("   ...LSTM prediction has been calculated and saved.")
         else:
             logger.info(" ... No predicted probabilities have been returned")
@@ -77,10 +92,15 @@ def _compute_lstm_classification(ann_model, **kwargs):
     needed_records = ann_model.slide_win_size * 11  # because of 10min
 
     # get raw prices from Price table to form a feature vector to feed up to ANN (to predict price)
-    raw_price_ts = get_n_last_prices_ts(needed_records, kwargs['source'], kwargs['transaction_currency'], kwargs['counter_currency'])
-    raw_volume_ts = get_n_last_volumes_ts(needed_records, kwargs['source'], kwargs['transaction_currency'], kwargs['counter_currency'])
+    if TICKS_READ_UNIFIED:
+        # price and volume are already in one row, no merge needed
+        raw_data_frame = get_n_last_ticks_df(needed_records, kwargs['source'], kwargs['transaction_currency'], kwargs['counter_currency'])
+        raw_data_frame = raw_data_frame[raw_data_frame['price'].notnull()]
+    else:
+        raw_price_ts = get_n_last_prices_ts(needed_records, kwargs['source'], kwargs['transaction_currency'], kwargs['counter_currency'])
+        raw_volume_ts = get_n_last_volumes_ts(needed_records, kwargs['source'], kwargs['transaction_currency'], kwargs['counter_currency'])
 
-    raw_data_frame = pd.merge(raw_price_ts.to_frame(name='price'), raw_volume_ts.to_frame(name='volume'), how='left', left_index=True, right_index=True)
+        raw_data_frame = pd.merge(raw_price_ts.to_frame(name='price'), raw_volume_ts.to_frame(name='volume'), how='left', left_index=True, right_index=True)
     raw_data_frame[pd.isnull(raw_data_frame)] = None
 
     # resample (might be different from our standart values 60/240/1440
@@ -140,31 +160,10 @@ def _compute_lstm_classification(ann_model, **kwargs):
 
 
 def get_n_last_ann_classif_df(n, **kwargs):
-
-    last_records = list(AnnPriceClassification.objects.filter(
+    "n most recent classifications, oldest first"
+    return cached_df('ann_classif', n, lambda rows: load_timeseries_df(AnnPriceClassification.objects.filter(
         source=kwargs['source'],
         resample_period=kwargs['resample_period'],
         transaction_currency=kwargs['transaction_currency'],
         counter_currency=kwargs['counter_currency'],
-        timestamp__gte = datetime.now() - timedelta(minutes=kwargs['resample_period'] * n)
-    ).values('timestamp', 'probability_same', 'probability_up', 'probability_down','predicted_ahead_for').order_by('timestamp'))
-
-    df = pd.DataFrame()
-    if last_records:
-        # todo - reverse order or make sure I get values in the same order!
-        ts = [rec['timestamp'] for rec in last_records]
-        probability_same = pd.Series(data=[rec['probability_same'] for rec in last_records], index=ts)
-        probability_up = pd.Series(data=[rec['probability_up'] for rec in last_records], index=ts)
-        probability_down = pd.Series(data=[rec['probability_down'] for rec in last_records], index=ts)
-        predicted_ahead_for = pd.Series(data=[rec['predicted_ahead_for'] for rec in last_records], index=ts)
-
-        df['probability_same'] = probability_same
-        df['probability_up'] = probability_up
-        df['probability_down'] = probability_down
-        df['predicted_ahead_for'] = predicted_ahead_for
-
-        # TODO: make sure the last data is at the bottom pf the dataset!
-
-    return df
-
-
+    ), ANN_CLASSIF_COLUMNS, n=rows), **kwargs)
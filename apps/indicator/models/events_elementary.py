@@ -4,12 +4,14 @@ import pandas as pd
 import numpy as np
 
 from django.db import models
+from django.db.models import F
 from apps.indicator.models.abstract_indicator import AbstractIndicator
 from apps.indicator.models.price_resampl import get_n_last_resampl_df
-from apps.indicator.models.sma import get_n_last_sma_df
+from apps.indicator.models.sma import get_n_last_smas_df, sma_field_name
 from apps.indicator.models.rsi import Rsi
 from apps.signal.models.signal import Signal
 from apps.indicator.models.ann_future_price_classification import AnnPriceClassification, get_n_last_ann_classif_df
+from apps.indicator.series_cache import get_series_cache, series_key
 
 from apps.user.models.user import get_horizon_value_from_string
 from settings import HORIZONS_TIME2NAMES, EMIT_RSI, EMIT_SMA, RUN_ANN
@@ -47,6 +49,33 @@ ICHI_ELEMENTARY_EVENTS = [
 # list of all events to return by get_last_elementory_events_df
 ALL_POSSIBLE_ELEMENTARY_EVENTS = SMA_ELEMENTARY_EVENTS + ICHI_ELEMENTARY_EVENTS
 
+# events with a value, they have own columns in EventsElementaryBits
+VALUED_ELEMENTARY_EVENTS = ['rsi_bracket', 'ann_price_2class_simple']
+# yes/no events, bit N of EventsElementaryBits.events_mask is BITSET_ELEMENTARY_EVENTS[N]
+# NOTE: a fixed list, not built from the lists above: only append new events to the end, bits of saved rows must not move
+BITSET_ELEMENTARY_EVENTS = [
+    'sma50_cross_price_down',           # bit 0
+    'sma200_cross_price_down',
+    'sma50_cross_sma200_down',
+    'sma50_cross_price_up',
+    'sma200_cross_price_up',
+    'sma50_cross_sma200_up',            # bit 5
+    'sma50_above_sma200',
+    'sma50_below_sma200',
+    'close_cloud_breakout_up',
+    'close_cloud_breakout_down',
+    'close_cloud_breakout_up_ext',      # bit 10
+    'close_cloud_breakout_down_ext',
+    'lagging_above_cloud',
+    'lagging_below_cloud',
+    'lagging_above_highest',
+    'lagging_below_lowest',             # bit 15
+    'conversion_above_base',
+    'conversion_below_base',
+    'close_above_cloud',
+    'close_below_cloud',
+]
+
 # dictionary to convert name of sma event to one-number trend
 _col2trend = {
     'sma50_cross_price_down': -1,
@@ -63,7 +92,7 @@ ichi_param_2_26 = 60
 ichi_param_3_52 = 120
 ichi_displacement = 30
 
-def _process_ai_simple(horizon, **kwargs):
+def _process_ai_simple(horizon, events_row, **kwargs):
     '''
     very simple strategy: emit signal anytime it changes state from up to down
     '''
@@ -84,12 +113,8 @@ def _process_ai_simple(horizon, **kwargs):
         # emit signal
         try:
             # TODO: change to emitting two signals UP and DOWN according to how others events are generated (for ML)
-            new_instance = EventsElementary.objects.create(
-                **kwargs,
-                event_name="ann_price_2class_simple",
-                event_value=int(df.iloc[-1]['class_change']),
-            )
-            logger.debug("   >>> ANN event detected and saved")
+            events_row.set_event("ann_price_2class_simple", int(df.iloc[-1]['class_change']))
+            logger.debug("   >>> ANN event detected")
 
             signal_ai = Signal(
                 **kwargs,
@@ -110,21 +135,18 @@ def _process_ai_simple(horizon, **kwargs):
 
 
 
-def _process_rsi(horizon, **kwargs):
-    rs_obj = Rsi.objects.filter(**kwargs).last()
+def _process_rsi(horizon, events_row, **kwargs):
+    load = lambda: Rsi.objects.filter(**kwargs).last()
+    cache = get_series_cache()
+    rs_obj = cache.get_object(series_key('rsi', **kwargs) + (kwargs['timestamp'],), load) if cache is not None else load()
 
     if (rs_obj is not None):
         rsi_bracket = rs_obj.get_rsi_bracket_value() # get current rsi object
         if rsi_bracket != 0:
             # save the event
             try:
-                new_instance = EventsElementary.objects.create(
-                    **kwargs,
-                    event_name = "rsi_bracket",
-                    event_value = rsi_bracket,
-                    event_second_value = rs_obj.rsi,
-                )
-                logger.debug("   >>> RSI bracket event detected and saved")
+                events_row.set_event("rsi_bracket", rsi_bracket, rs_obj.rsi)
+                logger.debug("   >>> RSI bracket event detected")
                 if EMIT_RSI:
                     signal_rsi = Signal(
                         **kwargs,
@@ -147,7 +169,7 @@ def _process_rsi(horizon, **kwargs):
         return False
 
 
-def _process_sma_crossovers(horizon, prices_df, **kwargs):
+def _process_sma_crossovers(horizon, prices_df, events_row, **kwargs):
 
     # NOTE - correct df names if change sma_low!
     time_current = pd.to_datetime(time.time(), unit='s')
@@ -174,15 +196,7 @@ def _process_sma_crossovers(horizon, prices_df, **kwargs):
         if event_value:    # if one of SMA events is TRUE, save and emit
 
             # save all elem events
-            try:
-                sma_event = EventsElementary.objects.create(
-                    **kwargs,
-                    event_name=event_name,
-                    event_value=int(1),
-                )
-                sma_event.save()
-            except Exception as e:
-                logger.error(" #Error saving SMA signal ")
+            events_row.set_event(event_name)
 
             # Fire all sinals, except two which we dont need and imitting is allowed
             if EMIT_SMA & (event_name not in ['sma50_above_sma200', 'sma50_below_sma200']):
@@ -206,13 +220,48 @@ def _process_sma_crossovers(horizon, prices_df, **kwargs):
 
 
 class EventsElementary(AbstractIndicator):
+    # one row per fired event, not written anymore, see EventsElementaryBits
     event_name = models.CharField(max_length=32, null=False, blank=False, default="none")
     event_value = models.IntegerField(null=True)
     event_second_value = models.FloatField(null=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['source', 'resample_period', 'counter_currency', 'transaction_currency', 'timestamp']),
+        ]
+
+
+class EventsElementaryBits(AbstractIndicator):
+    """
+    All elementary events of one bar in one row.
+    Yes/no events are bits of events_mask (see BITSET_ELEMENTARY_EVENTS), valued events have own columns.
+    """
+    events_mask = models.BigIntegerField(null=False, default=0)
+    rsi_bracket = models.SmallIntegerField(null=True)
+    rsi_value = models.FloatField(null=True)
+    ann_price_2class_simple = models.SmallIntegerField(null=True)
+
+    class Meta:
+        unique_together = ('source', 'resample_period', 'counter_currency', 'transaction_currency', 'timestamp')
+
+    def set_event(self, event_name, event_value=1, event_second_value=None):
+        if event_name == 'rsi_bracket':
+            self.rsi_value = event_second_value
+        if event_name in VALUED_ELEMENTARY_EVENTS:
+            setattr(self, event_name, event_value)
+        else:
+            self.events_mask |= 1 << BITSET_ELEMENTARY_EVENTS.index(event_name)
+
+    def get_events(self):
+        "Fired events as {event_name: event_value}"
+        events = {name: 1 for bit, name in enumerate(BITSET_ELEMENTARY_EVENTS) if self.events_mask & (1 << bit)}
+        events.update({name: getattr(self, name) for name in VALUED_ELEMENTARY_EVENTS if getattr(self, name)})
+        return events
+
     @staticmethod
     def check_events(cls, **kwargs):
         horizon = get_horizon_value_from_string(display_string=HORIZONS_TIME2NAMES[kwargs['resample_period']])
+        events_row = cls(**kwargs) # fired events are collected here and saved once
 
         # create a param dict to pass inside get_n_last_resampl_df
         no_time_params = {
@@ -232,27 +281,26 @@ class EventsElementary(AbstractIndicator):
 
         ###### check for rsi events, save and emit signal
         logger.info("   ... Check RSI Events: ")
-        _process_rsi(horizon, **kwargs)
+        _process_rsi(horizon, events_row, **kwargs)
 
 
         ############## check SMA cross over events
         logger.info("   ... Check SMA Events: ")
         SMA_LOW, SMA_HIGH = [50,200]
 
-        sma_low_df = get_n_last_sma_df(last_records, SMA_LOW, **no_time_params).tail(10)
-        sma_high_df = get_n_last_sma_df(last_records, SMA_HIGH, **no_time_params).tail(10)
+        sma_df = get_n_last_smas_df(last_records, [SMA_LOW, SMA_HIGH], price_types=['close'], **no_time_params).tail(10)
         small_prices_df = prices_df.tail(10).copy()
 
         # form a small price dataframe and add SMA to price dataframe
-        small_prices_df.loc[:,'low_sma'] = sma_low_df['sma_close_price']
-        small_prices_df.loc[:,'high_sma'] = sma_high_df['sma_close_price']
+        small_prices_df.loc[:,'low_sma'] = sma_df[sma_field_name(SMA_LOW)]
+        small_prices_df.loc[:,'high_sma'] = sma_df[sma_field_name(SMA_HIGH)]
 
         # todo: that is not right fron statistical view point!!! remove later when anough values
         small_prices_df = small_prices_df.fillna(value=0)
 
 
         # todo - add return value, and say if any crossovers have happend
-        _process_sma_crossovers(horizon, small_prices_df, **kwargs)
+        _process_sma_crossovers(horizon, small_prices_df, events_row, **kwargs)
 
 
         ############## calculate and save ICHIMOKU elementary events
@@ -361,90 +409,83 @@ class EventsElementary(AbstractIndicator):
             event_value = last_events[event_name]
             if event_value:
                 logger.debug('   >>> Ichi elem event was FIRED : ' + str(event_name))
-                try:
-                    ichi_event = cls.objects.create(
-                        **kwargs,
-                        event_name=event_name,
-                        event_value=int(1),
-                    )
-                    ichi_event.save()
-                except Exception as e:
-                    logger.error(" Error saving  " + event_name + " elementary event ")
+                events_row.set_event(event_name)
 
 
 
         ############## calculate and save ANN Events   #################
         if RUN_ANN:
             logger.info("   ... Check AI Elementary Events: ")
-            _process_ai_simple(horizon, **kwargs)
+            _process_ai_simple(horizon, events_row, **kwargs)
+
+        if events_row.get_events():
+            try:
+                events_row.save()
+                logger.debug("   >>> Elementary events saved: " + str(events_row.get_events()))
+            except Exception as e:
+                logger.error(" Error saving elementary events " + str(e))
 
 
 
 
 
 ###################
+def decode_elementory_events_df(records):
+    """
+    Expand (timestamp, events_mask, rsi_bracket, ann_price_2class_simple) records of EventsElementaryBits
+    into a DataFrame with a column per event, 0 for events which have not fired
+    """
+    if not records:
+        return pd.DataFrame()
+    timestamps, masks, rsi_brackets, ann_events = zip(*records)
+    masks = np.array(masks, dtype=np.int64)
+    bits = (masks[:, np.newaxis] >> np.arange(len(BITSET_ELEMENTARY_EVENTS))) & 1
+
+    df = pd.DataFrame(bits, columns=BITSET_ELEMENTARY_EVENTS, index=pd.Series(timestamps))
+    df['rsi_bracket'] = pd.Series(rsi_brackets, index=df.index).fillna(0).astype(np.int64)
+    if any(ann_events):
+        df['ann_price_2class_simple'] = pd.Series(ann_events, index=df.index).fillna(0).astype(np.int64)
+    return df[[name for name in ALL_POSSIBLE_ELEMENTARY_EVENTS + ['ann_price_2class_simple'] if name in df.columns]]
+
+_DECODED_FIELDS = ('timestamp', 'events_mask', 'rsi_bracket', 'ann_price_2class_simple')
+
+
 def get_current_elementory_events_df(timestamp, source, transaction_currency, counter_currency, resample_period):
     '''
-    get all elementary events happened in the one timestamp
-    NOTE - DB request returns several records for one timestamp!
+    get all elementary events happened in the one timestamp as one line of dataFrame
     '''
-    last_events = list(EventsElementary.objects.filter(
+    last_events = list(EventsElementaryBits.objects.filter(
         timestamp = timestamp,
-        #timestamp__gte=timestamp - timedelta(minutes=(resample_period)).seconds, # for local debug
         source=source,
         transaction_currency=transaction_currency,
         counter_currency=counter_currency,
         resample_period=resample_period,
-    ).order_by('-timestamp').values('timestamp','event_name','event_value'))
-
-    # convert several records into one line of dataFrame
-    df = pd.DataFrame()
-    if last_events:
-        # assert all timestamps are the same
-        ts = [rec['timestamp'] for rec in last_events]
-        event_names = [rec['event_name'] for rec in last_events]
-        event_values = [rec['event_value'] for rec in last_events]
+    ).values_list(*_DECODED_FIELDS))
 
-        df = pd.DataFrame(columns = ALL_POSSIBLE_ELEMENTARY_EVENTS, index=pd.Series(ts[0])) # DF has only one line
-        df[event_names] = event_values
-        df = df.fillna(value=0)
-
-    return df
+    return decode_elementory_events_df(last_events)
 
 
 # the different with the previous one is that it returns the last row in a pile even if it was entered a month ago
 def get_last_ever_entered_elementory_events_df(timestamp, source, transaction_currency, counter_currency, resample_period):
 
-    # get the most recent time
-    last_time = EventsElementary.objects.filter(
+    last_events = EventsElementaryBits.objects.filter(
         source=source,
         transaction_currency=transaction_currency,
         counter_currency=counter_currency,
         resample_period=resample_period,
-    ).order_by('-timestamp').values('timestamp').first()
-
-    # convert several records into one line of dataFrame
-    df = pd.DataFrame()
+    ).order_by('-timestamp').values_list(*_DECODED_FIELDS).first()
 
     # if there is at least one record and this record is not too far away (not later then 50 hours ago)
-    if bool(last_time): # if there is any record
-        if (abs(timestamp - last_time['timestamp'].timestamp()) < (3600000 * 50)):
-            # get all records for this time
-            last_events = list(EventsElementary.objects.filter(
-                timestamp=last_time['timestamp'],
-                source=source,
-                transaction_currency=transaction_currency,
-                counter_currency=counter_currency,
-                resample_period=resample_period,
-            ).order_by('-timestamp').values('timestamp', 'event_name', 'event_value'))
-
-            # assert all timestamps are the same
-            ts = [rec['timestamp'] for rec in last_events]
-            event_names = [rec['event_name'] for rec in last_events]
-            event_values = [rec['event_value'] for rec in last_events]
-
-            df = pd.DataFrame(columns = ALL_POSSIBLE_ELEMENTARY_EVENTS, index=pd.Series(ts[0])) # DF has only one line
-            df[event_names] = event_values
-            df = df.fillna(value=0)
-
-    return df
\ No newline at end of file
+    if last_events and (abs(timestamp - last_events[0].timestamp()) < (3600000 * 50)):
+        return decode_elementory_events_df([last_events])
+    return pd.DataFrame()
+
+
+def filter_by_elementory_event(queryset, event_name):
+    "EventsElementaryBits rows where event_name has fired"
+    if event_name in VALUED_ELEMENTARY_EVENTS:
+        return queryset.filter(**{event_name + '__isnull': False}).exclude(**{event_name: 0})
+    if event_name in BITSET_ELEMENTARY_EVENTS:
+        bit = 1 << BITSET_ELEMENTARY_EVENTS.index(event_name)
+        return queryset.annotate(event_bit=F('events_mask').bitand(bit)).filter(event_bit__gt=0)
+    return queryset.none()
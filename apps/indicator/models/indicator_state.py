@@ -0,0 +1,263 @@
+"""
+Incremental state of SmaWide and Rsi for a (source, pair, resample period).
+
+The state keeps what the indicators need from the last bars: a ring buffer and running sums for every
+SMA window, and the weighted sums behind the ewm averages of Rsi.compute_rs. A new bar updates them in
+constant time, results are the same as last_smas() and the pandas ewm over the same bars.
+The state is rebuilt from the bar history (full recomputation) when it is missing, when more bars than
+its buffers hold have arrived since, or when bars are saved behind it, see invalidate_indicator_states().
+"""
+import json
+import logging
+import operator
+from collections import deque
+from functools import reduce
+
+import numpy as np
+from django.db import models
+from django.db.models import Q
+
+from apps.common.utilities.db import to_epoch
+from apps.indicator.models import price_resampl
+from apps.indicator.models.abstract_indicator import AbstractIndicator
+from apps.indicator.models.rsi import RSI_BARS
+from apps.indicator.models.sma import SMA_LIST, SMA_PRICE_TYPES, sma_window
+from apps.indicator.series_cache import get_series_cache, series_key
+
+logger = logging.getLogger(__name__)
+
+STATE_VERSION = 1 # bump when the stored format or the indicator parameters change, old states are rebuilt
+RSI_COM = 14
+SMA_COLUMNS = [price_type + '_price' for price_type in SMA_PRICE_TYPES]
+STATE_BARS = max([sma_window(sma_period)[0] for sma_period in SMA_LIST] + [RSI_BARS])
+
+
+class RollingSmas:
+    "SMAs of the last bar for all sma_periods and price columns, same as last_smas() over the same bars"
+
+    def __init__(self, sma_periods=SMA_LIST, columns=len(SMA_PRICE_TYPES)):
+        self._windows, min_periods = zip(*[sma_window(sma_period) for sma_period in sma_periods])
+        self._required = np.array([window if min_period is None else max(min_period, 1)
+                                   for window, min_period in zip(self._windows, min_periods)])[:, np.newaxis]
+        self._bars = deque(maxlen=max(self._windows))
+        self._sums = np.zeros((len(self._windows), columns))
+        self._counts = np.zeros((len(self._windows), columns))
+
+    def add(self, prices):
+        "prices of a new bar, one per column, None or NaN if missing"
+        prices = np.array(prices, dtype=np.float64)
+        self._sums += np.nan_to_num(prices)
+        self._counts += ~np.isnan(prices)
+        for index, window in enumerate(self._windows):
+            if len(self._bars) >= window: # the bar leaving this window
+                leaving = self._bars[-window]
+                self._sums[index] -= np.nan_to_num(leaving)
+                self._counts[index] -= ~np.isnan(leaving)
+        self._bars.append(prices)
+
+    def values(self):
+        "array [period index, column index], NaN where there are less than min_periods prices"
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(self._counts >= self._required, self._sums / self._counts, np.nan)
+
+    def to_dict(self):
+        return {'bars': [prices.tolist() for prices in self._bars],
+                'sums': self._sums.tolist(), 'counts': self._counts.tolist()}
+
+    @classmethod
+    def from_dict(cls, data):
+        smas = cls()
+        smas._bars.extend(np.array(prices, dtype=np.float64) for prices in data['bars'])
+        smas._sums = np.array(data['sums'], dtype=np.float64)
+        smas._counts = np.array(data['counts'], dtype=np.float64)
+        return smas
+
+
+class EwmRelativeStrength:
+    """
+    Relative strength of the last bar, same as ewm(com=RSI_COM, min_periods=3) of up and down moves
+    in Rsi.compute_rs over the last RSI_BARS close prices.
+    An adjusted ewm mean is sum(decay**age * x) / sum(decay**age) over the deltas of the window,
+    a new delta multiplies the sums by decay and the delta leaving the window is subtracted.
+    """
+
+    def __init__(self, com=RSI_COM, bars=RSI_BARS):
+        self._decay = 1.0 - 1.0 / (1.0 + com)
+        self._bars = bars
+        self._deltas = deque(maxlen=bars - 1)
+        self._leaving_weight = self._decay ** self._deltas.maxlen
+        self._last_close = None
+        self._closes = 0 # close prices in the window, the delta window is one shorter
+        self._updates = 0 # since sums were computed from the window
+        self._resum()
+
+    def add(self, close_price):
+        close_price = np.nan if close_price is None else float(close_price)
+        if self._closes:
+            self._add_delta(close_price - self._last_close)
+        self._last_close = close_price
+        self._closes = min(self._closes + 1, self._bars)
+
+    def _add_delta(self, delta):
+        leaving = self._deltas[0] if len(self._deltas) == self._deltas.maxlen else np.nan
+        self._deltas.append(delta)
+
+        self._up_sum *= self._decay
+        self._down_sum *= self._decay
+        self._weight_sum *= self._decay
+        self._count(delta, 1.0, 1)
+        self._count(leaving, -self._leaving_weight, -1)
+
+        self._updates += 1
+        if self._updates >= self._deltas.maxlen:
+            self._resum() # once per window, rounding errors of the subtractions don't pile up
+        # a window without ups (downs) gives exactly 0 as in pandas, not a rounding residue
+        if self._ups == 0:
+            self._up_sum = 0.0
+        if self._downs == 0:
+            self._down_sum = 0.0
+        if self._observations == 0:
+            self._weight_sum = 0.0
+
+    def _count(self, delta, weight, sign):
+        if np.isnan(delta):
+            return
+        self._weight_sum += weight
+        self._observations += sign
+        if delta > 0:
+            self._up_sum += weight * delta
+            self._ups += sign
+        elif delta < 0:
+            self._down_sum += weight * delta
+            self._downs += sign
+
+    def _resum(self):
+        "Sums from the deltas of the window"
+        deltas = np.nan_to_num(np.array(self._deltas, dtype=np.float64))
+        valid = ~np.isnan(np.array(self._deltas, dtype=np.float64))
+        weights = self._decay ** np.arange(len(deltas) - 1, -1, -1.0)
+        ups, downs = valid & (deltas > 0), valid & (deltas < 0)
+        self._up_sum = float(np.sum(weights[ups] * deltas[ups]))
+        self._down_sum = float(np.sum(weights[downs] * deltas[downs]))
+        self._weight_sum = float(np.sum(weights[valid]))
+        self._observations, self._ups, self._downs = int(np.sum(valid)), int(np.sum(ups)), int(np.sum(downs))
+        self._updates = 0
+
+    def value(self):
+        "Relative strength, None if there are not enough close prices, NaN if there are less than 3 deltas"
+        if self._closes <= 12:
+            return None
+        if self._observations < 3:
+            return np.nan
+        with np.errstate(invalid='ignore', divide='ignore'):
+            roll_up = np.float64(self._up_sum) / self._weight_sum
+            roll_down = np.abs(np.float64(self._down_sum) / self._weight_sum)
+            return float(roll_up / roll_down)
+
+    def to_dict(self):
+        return {'deltas': list(self._deltas), 'last_close': self._last_close, 'closes': self._closes,
+                'updates': self._updates, 'sums': [self._up_sum, self._down_sum, self._weight_sum],
+                'counts': [self._observations, self._ups, self._downs]}
+
+    @classmethod
+    def from_dict(cls, data):
+        rs = cls()
+        rs._deltas.extend(data['deltas'])
+        rs._last_close, rs._closes, rs._updates = data['last_close'], data['closes'], data['updates']
+        rs._up_sum, rs._down_sum, rs._weight_sum = data['sums']
+        rs._observations, rs._ups, rs._downs = data['counts']
+        return rs
+
+
+class IndicatorState(AbstractIndicator):
+    """
+    RollingSmas and EwmRelativeStrength of a pair after the bar at timestamp, see get_indicator_state().
+    One row per (source, pair, resample period), updated in place.
+    """
+    version = models.PositiveSmallIntegerField(default=STATE_VERSION)
+    state = models.TextField(default="") # json of both indicators
+
+    class Meta:
+        unique_together = ('source', 'resample_period', 'counter_currency', 'transaction_currency')
+
+    def reset(self):
+        self.version = STATE_VERSION
+        self.smas, self.rs = RollingSmas(), EwmRelativeStrength()
+
+    def load(self):
+        data = json.loads(self.state)
+        self.smas = RollingSmas.from_dict(data['smas'])
+        self.rs = EwmRelativeStrength.from_dict(data['rs'])
+
+    def dump(self):
+        self.state = json.dumps({'smas': self.smas.to_dict(), 'rs': self.rs.to_dict()},
+                                separators=(',', ':'))
+
+    def add_bar(self, timestamp, close_price, high_price, midpoint_price):
+        "Update indicators with a bar newer than all added before"
+        self.smas.add([close_price, high_price, midpoint_price])
+        self.rs.add(close_price)
+        self.timestamp = timestamp
+
+
+def get_indicator_state(source, transaction_currency, counter_currency, resample_period):
+    """
+    IndicatorState with all bars of the pair added, None if there are no bars.
+    Bars saved since the last call are added one by one, the state is rebuilt from the last
+    STATE_BARS bars if it is missing, outdated or too far behind. The state is read once per series_cache() run.
+    """
+    pair = dict(source=source, transaction_currency=transaction_currency, counter_currency=counter_currency,
+                resample_period=resample_period)
+    cache = get_series_cache()
+    if cache is None:
+        return _update_indicator_state(pair)
+    state = cache.get_object(series_key('indicator_state', **pair), lambda: _update_indicator_state(pair))
+    cache.put_object(series_key('indicator_state', **pair), state)
+    return state
+
+
+def _update_indicator_state(pair):
+    state = IndicatorState.objects.filter(**pair).first()
+    if state is not None and state.version == STATE_VERSION:
+        new_bars = list(price_resampl.PriceResampl.objects.filter(
+            timestamp__gt=state.timestamp, **pair
+        ).order_by('timestamp').values_list('timestamp', *SMA_COLUMNS)[:STATE_BARS])
+        if len(new_bars) < STATE_BARS:
+            state.load()
+            if new_bars:
+                for bar in new_bars:
+                    state.add_bar(*bar)
+                state.dump()
+                state.save()
+            return state
+
+    # full recomputation
+    history_df = price_resampl.get_n_last_resampl_df(STATE_BARS, **pair)
+    if history_df.empty:
+        return None
+    state = state or IndicatorState(**pair)
+    state.reset()
+    for timestamp, prices in zip(history_df.index, history_df[SMA_COLUMNS].values):
+        state.add_bar(timestamp.to_pydatetime(), *prices)
+    state.dump()
+    state.save()
+    logger.debug("Indicator state of {} rebuilt from {} bars".format(pair, len(history_df)))
+    return state
+
+
+def invalidate_indicator_states(source, resample_period, bars):
+    "Delete states of pairs with PriceResampl bars saved at or before their last bar, they are rebuilt on the next use"
+    if not bars:
+        return 0
+    # earliest saved bar of every pair, other pairs of the same coins keep their states
+    first_bars = {}
+    for bar in bars:
+        pair = (bar.transaction_currency, bar.counter_currency)
+        first_bars[pair] = min(first_bars.get(pair, float('inf')), to_epoch(bar.timestamp))
+    deleted, _ = IndicatorState.objects.filter(
+        reduce(operator.or_, [Q(transaction_currency=transaction_currency, counter_currency=counter_currency, timestamp__gte=timestamp)
+                              for (transaction_currency, counter_currency), timestamp in first_bars.items()]),
+        source=source,
+        resample_period=resample_period,
+    ).delete()
+    return deleted
@@ -3,8 +3,11 @@ from django.db import models
 from unixtimestampfield.fields import UnixTimeStampField
 #from apps.channel.models.exchange_data import SOURCE_CHOICES
 from settings import SOURCE_CHOICES, COUNTER_CURRENCY_CHOICES, BTC
+from settings import TICKS_READ_UNIFIED
+from apps.common.utilities.db import load_timeseries_df
+from apps.indicator.models.tick import Tick, get_n_last_ticks_df
+from apps.indicator.models.tick_bar import add_compacted_history
 from datetime import timedelta, datetime
-import pandas as pd
 
 
 class Price(models.Model):
@@ -25,8 +28,12 @@ class Price(models.Model):
 
 
     class Meta:
+        # SQS delivers at least once, one tick per pair and timestamp
+        unique_together = ('source', 'transaction_currency', 'counter_currency', 'timestamp')
+        # the unique key serves source + pair + time range lookups
         indexes = [
-            models.Index(fields=['timestamp', 'source', 'transaction_currency', 'counter_currency']),
+            models.Index(fields=['timestamp', 'source', 'transaction_currency', 'counter_currency']), # recent pairs of a source
+            models.Index(fields=['transaction_currency', 'counter_currency', 'timestamp']), # pair from any source
         ]
 
 
@@ -46,21 +53,33 @@ class Price(models.Model):
             return float(current_price - fifteen_min_older_price.price)  / fifteen_min_older_price.price
 
 
+def price_ticks():
+    """
+    Raw price ticks for readers of Price: Tick rows with a price once TICKS_READ_UNIFIED is on, Price rows before.
+    Both have source, transaction_currency, counter_currency, price, timestamp and price_change.
+    """
+    if TICKS_READ_UNIFIED:
+        return Tick.objects.filter(price__isnull=False)
+    return Price.objects.all()
+
+
 # get n last price records
 
 def get_n_last_prices_ts(n, source, transaction_currency, counter_currency ):
-    back_in_time_records = list(Price.objects.filter(
+    if TICKS_READ_UNIFIED:
+        ticks_df = get_n_last_ticks_df(n, source, transaction_currency, counter_currency)
+        raw_ts = ticks_df['price'].dropna() if ticks_df is not None else None
+        return add_compacted_history(raw_ts, 'price', n, source, transaction_currency, counter_currency)
+
+    prices_df = load_timeseries_df(Price.objects.filter(
         source=source,
         transaction_currency=transaction_currency,
         counter_currency=counter_currency,
         timestamp__gte=datetime.now() - timedelta(minutes=n)
-    ).values('timestamp', 'price').order_by('timestamp'))
+    ), ['price'])
 
-    if back_in_time_records:
-        return pd.Series(
-            data= [rec['price'] for rec in back_in_time_records],
-            index = [rec['timestamp'] for rec in back_in_time_records]
-        )
+    raw_ts = prices_df['price'] if not prices_df.empty else None
+    return add_compacted_history(raw_ts, 'price', n, source, transaction_currency, counter_currency)
 
 
 def get_currency_value_from_string(currency_string):
@@ -1,13 +1,21 @@
 from datetime import timedelta, datetime
+from functools import reduce
+from itertools import groupby
+import operator
 import numpy as np
 import pandas as pd
-from django.db import models
+from django.db import models, connection, transaction
+from django.db.models import Q
+from apps.common.utilities.db import load_timeseries_df, bulk_insert_ignore
 from apps.indicator.models.abstract_indicator import AbstractIndicator
-from apps.indicator.models.price import Price
+from apps.indicator.series_cache import cached_df
+from apps.indicator.models.price import price_ticks
 import time
 
 import logging
 
+from settings import SHORT
+
 logger = logging.getLogger(__name__)
 
 class PriceResampl(AbstractIndicator):
@@ -21,11 +29,14 @@ class PriceResampl(AbstractIndicator):
 
     mean_price = models.BigIntegerField(null=True)  # use counter_currency (10^8) for units
     price_variance = models.FloatField(null=True)  # for future signal smoothing
+    price_count = models.IntegerField(null=True)  # number of ticks in the period
 
 
     class Meta:
+        # scheduled resampling, backfill and poll_queue --stream-bars can save the same bar concurrently
+        unique_together = ('source', 'resample_period', 'transaction_currency', 'counter_currency', 'timestamp')
         indexes = [
-            models.Index(fields=['source', 'resample_period', 'counter_currency', 'transaction_currency']),
+            models.Index(fields=['source', 'resample_period', 'counter_currency', 'transaction_currency', 'timestamp']),
         ]
 
 
@@ -55,7 +66,7 @@ class PriceResampl(AbstractIndicator):
 
         # get all prices for one resample period (15/60/360 min)
         transaction_currency_price_list = list(
-            Price.objects.filter(
+            price_ticks().filter(
                 source=self.source,
                 transaction_currency=self.transaction_currency,
                 counter_currency=self.counter_currency,
@@ -74,6 +85,7 @@ class PriceResampl(AbstractIndicator):
             self.midpoint_price = int((self.high_price + self.low_price) / 2)
             self.mean_price = int(prices.mean())
             self.price_variance = prices.var()
+            self.price_count = len(prices)
             return True
         else:
             #logger.debug(' ======= skipping, no price information')
@@ -83,32 +95,14 @@ class PriceResampl(AbstractIndicator):
 ############## get n last records from resampled table as a DataFrame
 # NOTE: no kwargs because we dont have timestamp here
 def get_n_last_resampl_df(n, source, transaction_currency, counter_currency, resample_period):
-
-    last_prices = list(PriceResampl.objects.filter(
+    "n most recent records, oldest first (sma rolling needs that order)"
+    return cached_df('resampl', n, lambda rows: load_timeseries_df(PriceResampl.objects.filter(
         source=source,
         resample_period=resample_period,
         transaction_currency=transaction_currency,
         counter_currency=counter_currency,
-        timestamp__gte = datetime.now() - timedelta(minutes=resample_period * n)
-    ).values('timestamp', 'low_price', 'high_price', 'close_price', 'midpoint_price').order_by('-timestamp'))
-
-    df = pd.DataFrame()
-    if last_prices:
-        # todo - reverse order or make sure I get values in the same order!
-        ts = [rec['timestamp'] for rec in last_prices]
-        low_prices = pd.Series(data=[rec['low_price'] for rec in last_prices], index=ts)
-        high_prices = pd.Series(data=[rec['high_price'] for rec in last_prices], index=ts)
-        close_prices = pd.Series(data=[rec['close_price'] for rec in last_prices], index=ts)
-        midpoint_prices = pd.Series([rec['midpoint_price'] for rec in last_prices], index=ts)
-
-        df['low_price'] = low_prices
-        df['high_price'] = high_prices
-        df['close_price'] = close_prices
-        df['midpoint_price'] = midpoint_prices
-        # we need df in a right order (from past to future) to make sma rolling work righ
-        df = df.iloc[::-1] # df.sort_index(inplace=True)  might works too
-
-    return df
+    ), ['low_price', 'high_price', 'close_price', 'midpoint_price'], n=rows),
+        source=source, transaction_currency=transaction_currency, counter_currency=counter_currency, resample_period=resample_period)
 
 # get the first element ever resampled
 def get_first_resampled_time(source, transaction_currency, counter_currency, resample_period):
@@ -122,4 +116,344 @@ def get_first_resampled_time(source, transaction_currency, counter_currency, res
     if first_time :
         return first_time['timestamp'].timestamp()
     else:
-        return time.time()
\ No newline at end of file
+        return time.time()
+
+############## resample all pairs of a source with one query
+
+# NOTE: open/close follow PriceResampl.compute, which orders ticks by -timestamp:
+# open_price is the most recent tick and close_price is the earliest one
+_BARS_SQL = {
+    'postgresql': """
+        SELECT transaction_currency, counter_currency, {bar} AS bar_timestamp,
+            (array_agg(price ORDER BY {ts} DESC))[1], (array_agg(price ORDER BY {ts}))[1],
+            MIN(price), MAX(price), AVG(price), VAR_POP(price), COUNT(*)
+        FROM {table}
+        WHERE source = %s AND {ts} > %s AND {ts} <= %s AND price IS NOT NULL {pairs}
+        GROUP BY transaction_currency, counter_currency, bar_timestamp
+    """,
+    # only the first value of GROUP_CONCAT is needed, so group_concat_max_len truncation is harmless
+    'mysql': """
+        SELECT transaction_currency, counter_currency, {bar} AS bar_timestamp,
+            SUBSTRING_INDEX(GROUP_CONCAT(price ORDER BY {ts} DESC), ',', 1),
+            SUBSTRING_INDEX(GROUP_CONCAT(price ORDER BY {ts}), ',', 1),
+            MIN(price), MAX(price), AVG(price), VAR_POP(price), COUNT(*)
+        FROM {table}
+        WHERE source = %s AND {ts} > %s AND {ts} <= %s AND price IS NOT NULL {pairs}
+        GROUP BY transaction_currency, counter_currency, bar_timestamp
+    """,
+}
+
+def resample_source(source, resample_period, end_time, start_time=None):
+    """
+    Compute and save resampled prices for all pairs of a source with one grouped query.
+    Without start_time: one record per pair at end_time for ticks in (end_time - period, end_time].
+    With start_time: one record per pair and period boundary between start_time and end_time.
+    Every record covers (timestamp - period, timestamp], like streamed bars (apps.channel.bar_stream),
+    the legacy compute() also counts a tick at exactly timestamp - period. Existing records are kept.
+    MEDIUM and LONG records are derived from SHORT records when all SHORT records of the bar are saved,
+    otherwise they are computed from raw ticks.
+    Return number of saved records.
+    """
+    period_seconds = resample_period * 60
+    aggregate = _aggregate_bars if resample_period == SHORT else _derived_or_aggregated_bars
+
+    if start_time is None:
+        bars = aggregate(source, period_seconds, end_time - period_seconds, end_time, bar_timestamp=end_time)
+    else:
+        # a record covers the period before its timestamp, so the first one starts a period before start_time
+        first_bar_time = -(-start_time // period_seconds) * period_seconds
+        last_bar_time = -(-end_time // period_seconds) * period_seconds
+        bars = aggregate(source, period_seconds, first_bar_time - period_seconds, last_bar_time)
+
+    return _save_new_bars(source, resample_period, bars)
+
+
+def _save_new_bars(source, resample_period, bars):
+    "Bulk insert bars from _aggregate_bars, existing records are kept. Return number of saved records"
+    existing = set(PriceResampl.objects.filter(
+        source=source,
+        resample_period=resample_period,
+        timestamp__gte=min([bar[2] for bar in bars] or [0]),
+        timestamp__lte=max([bar[2] for bar in bars] or [0]),
+    ).values_list('transaction_currency', 'counter_currency', 'timestamp'))
+
+    new_objects = []
+    for (transaction_currency, counter_currency, bar_timestamp, open_price, close_price,
+         low_price, high_price, mean_price, price_variance, price_count) in bars:
+        bar_datetime = datetime.utcfromtimestamp(bar_timestamp)
+        if (transaction_currency, counter_currency, bar_datetime) in existing:
+            continue
+        new_objects.append(PriceResampl(
+            source=source,
+            transaction_currency=transaction_currency,
+            counter_currency=counter_currency,
+            resample_period=resample_period,
+            timestamp=bar_datetime,
+            open_price=int(open_price),
+            close_price=int(close_price),
+            low_price=int(low_price),
+            high_price=int(high_price),
+            midpoint_price=int((int(high_price) + int(low_price)) / 2),
+            mean_price=int(mean_price),
+            price_variance=float(price_variance),
+            price_count=price_count,
+        ))
+    with transaction.atomic(): # longer bars are derived once all records of a period are there
+        # a bar saved since the check above, e.g. by the bar stream, is skipped by the unique key
+        saved = bulk_insert_ignore(PriceResampl, new_objects)
+        # backfilled bars change SMA and RSI of the later ones
+        from apps.indicator.models.indicator_state import invalidate_indicator_states # it imports this module
+        invalidate_indicator_states(source, resample_period, new_objects)
+    return saved
+
+
+############## derive longer bars from SHORT bars
+
+def _derived_or_aggregated_bars(source, period_seconds, start_time, end_time, bar_timestamp=None):
+    """
+    Same as _aggregate_bars, bars with complete SHORT records are derived from them, see _derive_bars,
+    other bars are aggregated from raw ticks: periods without any SHORT records for all pairs,
+    periods with missing SHORT records only for the pairs which miss them.
+    """
+    bars, missing_times, incomplete = _derive_bars(source, period_seconds, start_time, end_time, bar_timestamp)
+
+    def raw_bars(bar_times, pairs=None):
+        if bar_timestamp is not None:
+            return _aggregate_bars(source, period_seconds, start_time, end_time, bar_timestamp, pairs=pairs)
+        return _aggregate_bars(source, period_seconds, float(max(start_time, min(bar_times) - period_seconds)),
+                               float(max(bar_times)), pairs=pairs)
+
+    if missing_times:
+        bars += [bar for bar in raw_bars(missing_times) if bar[2] in missing_times]
+    if incomplete:
+        bars += [bar for bar in raw_bars({key[2] for key in incomplete}, {key[:2] for key in incomplete})
+                 if bar[:3] in incomplete]
+    return bars
+
+
+def _derive_bars(source, period_seconds, start_time, end_time, bar_timestamp=None):
+    """
+    Same as _aggregate_bars, but longer bars are combined from SHORT records in (start_time, end_time],
+    so raw ticks are read once, by the SHORT resampling.
+    Counts are summed, means weighted by counts and variances combined with the parallel variance formula:
+    M2 = sum(n_i * var_i + n_i * (mean_i - mean) ** 2), variance = M2 / n
+    A bar is derived only if its pair has a SHORT record with a price count for every SHORT period of the bar
+    (records saved before price_count was added have none), otherwise it would be partial.
+    SHORT resampling covers all pairs of a source at once, so a pair without any SHORT records in a period
+    with SHORT records of other pairs had no ticks.
+    Return (bars, set of bar timestamps without any SHORT records,
+            set of (transaction_currency, counter_currency, bar timestamp) with incomplete SHORT records).
+    """
+    short_seconds = SHORT * 60
+    if bar_timestamp is None:
+        bar_times = np.arange((start_time // period_seconds + 1) * period_seconds,
+                              -(-end_time // period_seconds) * period_seconds + 1, period_seconds)
+        window_starts, window_ends = np.maximum(start_time, bar_times - period_seconds), np.minimum(end_time, bar_times)
+    else:
+        bar_times, window_starts, window_ends = np.array([float(bar_timestamp)]), np.array([start_time]), np.array([end_time])
+    expected_counts = pd.Series(window_ends // short_seconds - window_starts // short_seconds, index=bar_times)
+
+    short_bars = pd.DataFrame.from_records(list(PriceResampl.objects.filter(
+        source=source,
+        resample_period=SHORT,
+        timestamp__gt=start_time,
+        timestamp__lte=end_time,
+    ).values_list('transaction_currency', 'counter_currency', 'timestamp', 'open_price', 'close_price',
+                  'low_price', 'high_price', 'mean_price', 'price_variance', 'price_count')),
+        columns=['transaction_currency', 'counter_currency', 'timestamp', 'open_price', 'close_price',
+                 'low_price', 'high_price', 'mean_price', 'price_variance', 'price_count'])
+    if short_bars.empty:
+        return [], set(bar_times), set()
+
+    short_bars['timestamp'] = (pd.to_datetime(short_bars['timestamp']) - pd.Timestamp(0)).dt.total_seconds()
+    if bar_timestamp is None:
+        short_bars['bar_timestamp'] = -(-short_bars['timestamp'] // period_seconds) * period_seconds
+    else:
+        short_bars['bar_timestamp'] = float(bar_timestamp)
+    keys = ['transaction_currency', 'counter_currency', 'bar_timestamp']
+
+    # drop pairs and bars with missing SHORT records or counts
+    short_bars['counted'] = short_bars['price_count'].fillna(0) > 0
+    groups = short_bars.groupby(keys)['counted'].agg(['sum', 'count'])
+    complete = (groups['sum'] == groups['count']) & \
+               (groups['count'].values == expected_counts.reindex(groups.index.get_level_values('bar_timestamp')).values)
+    missing_times = set(bar_times) - set(groups.index.get_level_values('bar_timestamp'))
+    incomplete = {(transaction_currency, int(counter_currency), float(bar_time))
+                  for transaction_currency, counter_currency, bar_time in groups.index[~complete]}
+    short_bars = short_bars[~short_bars.set_index(keys).index.isin(groups.index[~complete])]
+    if short_bars.empty:
+        return [], missing_times, incomplete
+
+    short_bars['price_variance'] = short_bars['price_variance'].fillna(0.0)
+    short_bars['weighted_mean'] = short_bars['mean_price'] * short_bars['price_count']
+    short_bars.sort_values('timestamp', inplace=True)
+
+    grouped = short_bars.groupby(keys)
+    bars = grouped.agg({
+        'open_price': 'last', # most recent tick, see the NOTE above _BARS_SQL
+        'close_price': 'first',
+        'low_price': 'min',
+        'high_price': 'max',
+        'weighted_mean': 'sum',
+        'price_count': 'sum',
+    })
+    bars['mean_price'] = bars['weighted_mean'] / bars['price_count']
+
+    short_bars = short_bars.join(bars['mean_price'].rename('bar_mean'), on=keys)
+    short_bars['m2'] = short_bars['price_count'] * (short_bars['price_variance'] + (short_bars['mean_price'] - short_bars['bar_mean']) ** 2)
+    bars['price_variance'] = short_bars.groupby(keys)['m2'].sum() / bars['price_count']
+
+    return [(transaction_currency, counter_currency, bar_time, row.open_price, row.close_price, row.low_price, row.high_price,
+             row.mean_price, row.price_variance, int(row.price_count))
+            for (transaction_currency, counter_currency, bar_time), row in bars.iterrows()], missing_times, incomplete
+
+
+############## fill gaps in resampled history
+
+def find_missing_bars(source, resample_period, start_time, end_time):
+    """
+    Return sorted period boundaries in [start_time, end_time] (numpy array of unix timestamps) with a missing bar:
+    either no pair of the source has a bar there (outage, first run) or a pair has ticks there but no bar,
+    between its first and last bar in the range.
+    One query for the existing bars and one for the periods with ticks of the pairs with holes,
+    both are compared with the grid in memory. Pairs which went quiet or were delisted have no holes,
+    so raw ticks are not read again for them on every run.
+    """
+    period_seconds = resample_period * 60
+    grid = np.arange(-(-start_time // period_seconds) * period_seconds, end_time // period_seconds * period_seconds + 1,
+                     period_seconds)
+    if not len(grid):
+        return grid
+
+    existing = pd.DataFrame.from_records(list(PriceResampl.objects.filter(
+        source=source,
+        resample_period=resample_period,
+        timestamp__gte=float(grid[0]),
+        timestamp__lte=float(grid[-1]),
+    ).values_list('transaction_currency', 'counter_currency', 'timestamp')),
+        columns=['transaction_currency', 'counter_currency', 'timestamp'])
+    if existing.empty:
+        return grid
+    existing['timestamp'] = (pd.to_datetime(existing['timestamp']) - pd.Timestamp(0)).dt.total_seconds()
+
+    missing_times = np.setdiff1d(grid, existing['timestamp'].values)
+    holes = {}
+    for (transaction_currency, counter_currency), pair_timestamps in existing.groupby(['transaction_currency', 'counter_currency'])['timestamp']:
+        pair_grid = grid[(grid >= pair_timestamps.min()) & (grid <= pair_timestamps.max())]
+        pair_holes = np.setdiff1d(np.setdiff1d(pair_grid, pair_timestamps.values), missing_times)
+        if len(pair_holes):
+            holes[(transaction_currency, int(counter_currency))] = pair_holes
+    if not holes:
+        return missing_times
+
+    all_holes = np.concatenate(list(holes.values()))
+    ticks = _tick_periods(source, period_seconds, float(all_holes.min()) - period_seconds, float(all_holes.max()), holes.keys())
+    return np.unique(np.concatenate([missing_times] + [np.intersect1d(pair_holes, ticks.get(pair, []))
+                                                       for pair, pair_holes in holes.items()]))
+
+
+_TICK_PERIODS_SQL = """
+    SELECT DISTINCT transaction_currency, counter_currency, CEIL({ts} / %s) * %s
+    FROM {table}
+    WHERE source = %s AND {ts} > %s AND {ts} <= %s AND price IS NOT NULL {pairs}
+"""
+
+def _tick_periods(source, period_seconds, start_time, end_time, pairs):
+    "Return {(transaction_currency, counter_currency): array of period boundaries with ticks in (start_time, end_time]}"
+    if connection.vendor in _BARS_SQL:
+        ts = connection.ops.quote_name('timestamp')
+        pairs_sql, pairs_params = _pairs_sql(pairs)
+        sql = _TICK_PERIODS_SQL.format(ts=ts, table=connection.ops.quote_name(price_ticks().model._meta.db_table), pairs=pairs_sql)
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [period_seconds, period_seconds, source, start_time, end_time] + pairs_params)
+            rows = [(transaction_currency, counter_currency, float(period)) for transaction_currency, counter_currency, period in cursor.fetchall()]
+    else:
+        rows = [(transaction_currency, counter_currency, -(-(timestamp - datetime(1970, 1, 1)).total_seconds() // period_seconds) * period_seconds)
+                for transaction_currency, counter_currency, timestamp in _pair_ticks(source, start_time, end_time, pairs).values_list(
+                    'transaction_currency', 'counter_currency', 'timestamp').iterator()]
+
+    periods = {}
+    for transaction_currency, counter_currency, period in rows:
+        periods.setdefault((transaction_currency, counter_currency), []).append(period)
+    return {pair: np.unique(pair_periods) for pair, pair_periods in periods.items()}
+
+
+def backfill_bars(source, resample_period, start_time, end_time):
+    """
+    Compute and save all missing bars of a source between start_time and end_time, see find_missing_bars.
+    Consecutive missing bars are aggregated with one grouped query, like resample_source with start_time.
+    Return number of saved records.
+    """
+    period_seconds = resample_period * 60
+    missing = find_missing_bars(source, resample_period, start_time, end_time)
+    if not len(missing):
+        return 0
+
+    # split missing boundaries into runs of consecutive periods
+    run_starts = np.flatnonzero(np.diff(missing) > period_seconds) + 1
+    saved = 0
+    for run in np.split(missing, run_starts):
+        bars = _aggregate_bars(source, period_seconds, float(run[0]) - period_seconds, float(run[-1]))
+        saved += _save_new_bars(source, resample_period, bars)
+    logger.info("Backfilled {} bars of period {} for source {} in {} gaps".format(saved, resample_period, source, len(run_starts) + 1))
+    return saved
+
+
+def _aggregate_bars(source, period_seconds, start_time, end_time, bar_timestamp=None, pairs=None):
+    """
+    Return [(transaction_currency, counter_currency, bar timestamp, open, close, low, high, mean, variance, count), ...]
+    Ticks in (start_time, end_time] are grouped by period, with bar_timestamp they all make one bar.
+    pairs: only ticks of these (transaction_currency, counter_currency), all pairs if None.
+    """
+    sql_template = _BARS_SQL.get(connection.vendor)
+    if sql_template is None:
+        return _aggregate_bars_in_python(source, period_seconds, start_time, end_time, bar_timestamp, pairs)
+
+    ts = connection.ops.quote_name('timestamp')
+    if bar_timestamp is None:
+        bar, bar_params = 'CEIL({} / %s) * %s'.format(ts), [period_seconds, period_seconds]
+    else:
+        bar, bar_params = '%s', [bar_timestamp]
+    # Tick rows once TICKS_READ_UNIFIED is on, see price_ticks
+    pairs_sql, pairs_params = _pairs_sql(pairs)
+    sql = sql_template.format(bar=bar, ts=ts, table=connection.ops.quote_name(price_ticks().model._meta.db_table), pairs=pairs_sql)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, bar_params + [source, start_time, end_time] + pairs_params)
+        return [row[:2] + (float(row[2]),) + row[3:] for row in cursor.fetchall()]
+
+
+def _aggregate_bars_in_python(source, period_seconds, start_time, end_time, bar_timestamp=None, pairs=None):
+    "Same as _aggregate_bars for databases without ordered aggregates (sqlite), still one query"
+    ticks = _pair_ticks(source, start_time, end_time, pairs)
+    ticks = ticks.order_by('transaction_currency', 'counter_currency', 'timestamp').values_list(
+        'transaction_currency', 'counter_currency', 'timestamp', 'price')
+
+    def bar_key(tick):
+        timestamp = (tick[2] - datetime(1970, 1, 1)).total_seconds()
+        bar = bar_timestamp if bar_timestamp is not None else -(-timestamp // period_seconds) * period_seconds
+        return tick[0], tick[1], bar
+
+    bars = []
+    for (transaction_currency, counter_currency, bar), bar_ticks in groupby(ticks.iterator(), key=bar_key):
+        prices = np.array([tick[3] for tick in bar_ticks])
+        bars.append((transaction_currency, counter_currency, bar, prices[-1], prices[0],
+                     prices.min(), prices.max(), prices.mean(), prices.var(), len(prices)))
+    return bars
+
+
+def _pairs_sql(pairs):
+    "SQL condition on (transaction_currency, counter_currency) pairs for _BARS_SQL and its params, no condition if pairs is None"
+    pairs = sorted(pairs or [])
+    if not pairs:
+        return '', []
+    return ('AND (transaction_currency, counter_currency) IN ({})'.format(', '.join(['(%s, %s)'] * len(pairs))),
+            [value for pair in pairs for value in pair])
+
+
+def _pair_ticks(source, start_time, end_time, pairs=None):
+    "Price ticks of a source in (start_time, end_time], only of these (transaction_currency, counter_currency) pairs if given"
+    ticks = price_ticks().filter(source=source, timestamp__gt=start_time, timestamp__lte=end_time)
+    if pairs:
+        ticks = ticks.filter(reduce(operator.or_, [Q(transaction_currency=transaction_currency, counter_currency=counter_currency)
+                                                   for transaction_currency, counter_currency in pairs]))
+    return ticks
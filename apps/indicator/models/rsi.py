@@ -4,12 +4,22 @@ from apps.indicator.models.abstract_indicator import AbstractIndicator
 import numpy as np
 
 from apps.indicator.models import price_resampl
+from apps.indicator.series_cache import get_series_cache, series_key
+from settings import INCREMENTAL_INDICATORS
 
 logger = logging.getLogger(__name__)
 
+RSI_BARS = 200 # ewm(com=14) weight of older bars is below 1e-6
+
 class Rsi(AbstractIndicator):
     relative_strength = models.FloatField(null=True)  # relative strength
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['source', 'resample_period', 'counter_currency', 'transaction_currency', 'timestamp']),
+        ]
+
+
     @property
     # rsi = 100 - 100 / (1 + rUp / rDown)
     def rsi(self):  # relative strength index
@@ -52,9 +62,17 @@ class Rsi(AbstractIndicator):
         (RSI is a momentum oscillator that measures the speed and change of price movements.)
         :return:
         '''
+        if INCREMENTAL_INDICATORS:
+            from apps.indicator.models.indicator_state import get_indicator_state # it imports this module
+            state = get_indicator_state(self.source, self.transaction_currency, self.counter_currency, self.resample_period)
+            self.relative_strength = state.rs.value() if state is not None else None
+            if self.relative_strength is None:
+                logger.debug(':RSI was not calculated:: Not enough closing prices')
+            return self.relative_strength
+
 
         resampl_price_df = price_resampl.get_n_last_resampl_df(
-            20 * self.resample_period,
+            RSI_BARS,
             self.source, self.transaction_currency, self.counter_currency, self.resample_period
         )
 
@@ -98,6 +116,9 @@ class Rsi(AbstractIndicator):
         rs = new_instance.compute_rs()
         if rs:
             new_instance.save()
+            cache = get_series_cache()
+            if cache is not None:
+                cache.put_object(series_key('rsi', **kwargs) + (kwargs['timestamp'],), new_instance)
             logger.info("   ...RS calculations are done and saved.")
 
 
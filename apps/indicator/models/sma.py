@@ -1,16 +1,56 @@
 from django.db import models
+from apps.common.utilities.db import load_timeseries_df
 from apps.indicator.models.abstract_indicator import AbstractIndicator
 from apps.indicator.models import price_resampl
-from settings import time_speed
+from apps.indicator.series_cache import cached_df, get_series_cache, series_key
+from settings import time_speed, INCREMENTAL_INDICATORS
 import numpy as np
-import pandas as pd
-from datetime import timedelta, datetime
 import logging
 
 logger = logging.getLogger(__name__)
 SMA_LIST = [9, 20, 26, 30, 50, 52, 60, 120, 200]
+SMA_PRICE_TYPES = ['close', 'high', 'midpoint']
+
+def sma_field_name(sma_period, price_type='close'):
+    "sma50_close_price"
+    return 'sma{}_{}_price'.format(sma_period, price_type)
+
+
+def sma_window(sma_period):
+    "Rolling window and min_periods of an SMA period"
+    # reduce sma window if we are in test mode
+    window = int(sma_period/time_speed)
+    # calculte sma if one third of the nessesary time points are present
+    min_periods = int(window/4) if window > 10 else None
+    return window, min_periods
+
+
+def last_smas(values, sma_periods):
+    """
+    SMAs of the last row of values (2d array, rows oldest first, one column per price type) for all sma_periods,
+    same as rolling(window, min_periods=...).mean() of every column and period, see sma_window().
+    One cumulative sum of values and of not-NaN counts gives the sum of any window ending at the last row.
+    Return array [period index, column index], NaN where there are less than min_periods prices.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    zeros = np.zeros((1, values.shape[1]))
+    value_sums = np.concatenate([zeros, np.cumsum(np.nan_to_num(values), axis=0)])
+    counts = np.concatenate([zeros, np.cumsum(~np.isnan(values), axis=0)])
+
+    windows, min_periods = zip(*[sma_window(sma_period) for sma_period in sma_periods])
+    # first row of every window, a window longer than the series starts at the first row
+    starts = len(values) - np.minimum(windows, len(values))
+    window_sums = value_sums[-1] - value_sums[starts]
+    window_counts = counts[-1] - counts[starts]
+
+    required = np.array([window if min_period is None else max(min_period, 1)
+                         for window, min_period in zip(windows, min_periods)])[:, np.newaxis]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(window_counts >= required, window_sums / window_counts, np.nan)
+
 
 class Sma(AbstractIndicator):
+    # one row per SMA period, not written anymore, kept for the history, see SmaWide
 
     sma_period = models.PositiveSmallIntegerField(null=False, default=50)
     sma_high_price = models.BigIntegerField(null=True)
@@ -20,90 +60,101 @@ class Sma(AbstractIndicator):
 
     class Meta:
         indexes = [
-            models.Index(fields=['source', 'resample_period', 'counter_currency', 'transaction_currency', 'sma_period']),
+            models.Index(fields=['source', 'resample_period', 'counter_currency', 'transaction_currency', 'sma_period', 'timestamp']),
+        ]
+
+
+
+class SmaWide(AbstractIndicator):
+    """
+    All SMA_LIST periods of one bar in one row, written once per bar.
+    Fields are named by sma_field_name(): sma9_close_price, sma9_high_price, sma9_midpoint_price, sma20_close_price...
+    """
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['source', 'resample_period', 'counter_currency', 'transaction_currency', 'timestamp']),
         ]
 
 
-    def _compute_sma(self):
-        # get neccesary records from price_resample
+    def get_sma(self, sma_period, price_type='close'):
+        return getattr(self, sma_field_name(sma_period, price_type))
+
+    def _compute_smas(self):
+        if INCREMENTAL_INDICATORS:
+            from apps.indicator.models.indicator_state import get_indicator_state # it imports this module
+            state = get_indicator_state(self.source, self.transaction_currency, self.counter_currency, self.resample_period)
+            if state is None:
+                logger.debug(' Not enough prices for SMA calculation, resample_period=' + str(self.resample_period))
+                return
+            self._set_smas(state.smas.values())
+            return
+
+        # one load of resampled prices for the longest period, shorter windows use its tail
         resampl_prices_df = price_resampl.get_n_last_resampl_df(
-            self.resample_period * self.sma_period + 5,
+            max(SMA_LIST) + 5,
             self.source,
             self.transaction_currency,
             self.counter_currency,
             self.resample_period
         )
-        resampl_close_price_ts = resampl_prices_df.close_price
-        resampl_high_price_ts = resampl_prices_df.high_price
-        resampl_midpoint_price_ts = resampl_prices_df.midpoint_price
-        time_max = np.max(resampl_prices_df.index)
+        if resampl_prices_df.empty:
+            logger.debug(' Not enough prices for SMA calculation, resample_period=' + str(self.resample_period))
+            return
 
-        # reduce sma window if we are in test mode
-        sma_window = int(self.sma_period/time_speed)
+        # all periods and price types of the last bar at once
+        self._set_smas(last_smas(resampl_prices_df[[price_type + '_price' for price_type in SMA_PRICE_TYPES]].values, SMA_LIST))
 
-        #calculte sma if one third of the nessesary time points are present
-        min_per = int(sma_window/4) if sma_window > 10 else None
-
-        if not resampl_close_price_ts.empty:
-            sma_close_ts = resampl_close_price_ts.rolling(window=sma_window, center=False, min_periods=min_per).mean()
-            if not np.isnan(sma_close_ts[time_max]):
-                self.sma_close_price = int(sma_close_ts[time_max])
-        else:
-            logger.debug(' Not enough CLOSE prices for SMA calculation, resample_period=' + str(self.resample_period) )
-
-        if not resampl_high_price_ts.empty:
-            # calculate SMA
-            sma_high_ts = resampl_high_price_ts.rolling(window=sma_window, center=False, min_periods=min_per).mean()
-            if not np.isnan(sma_high_ts[time_max]):
-                self.sma_high_price = int(sma_high_ts[time_max])
-        else:
-            logger.debug(' Not enough HIGH prices for SMA calculation, resample_period=' + str(self.resample_period) )
-
-
-        if not resampl_midpoint_price_ts.empty:
-            sma_midpoint_ts = resampl_midpoint_price_ts.rolling(window=sma_window, center=False, min_periods=min_per).mean()
-            if not np.isnan(sma_midpoint_ts[time_max]):
-                self.sma_midpoint_price = int(sma_midpoint_ts[time_max])
-        else:
-            logger.debug(' Not enough MIDPOINT prices for SMA calculation, resample_period=' + str(self.resample_period))
+    def _set_smas(self, smas):
+        "smas: array [SMA_LIST index, SMA_PRICE_TYPES index], NaN are not set"
+        for period_index, sma_period in enumerate(SMA_LIST):
+            for type_index, price_type in enumerate(SMA_PRICE_TYPES):
+                if not np.isnan(smas[period_index, type_index]):
+                    setattr(self, sma_field_name(sma_period, price_type), int(smas[period_index, type_index]))
 
 
     @staticmethod
-    def compute_all(cls,**kwargs):
-        # todo - avoid creation empty record if no sma was computed..it also mith be fine
-        for sma_period in SMA_LIST:
-            try:
-                sma_instance = cls.objects.create(**kwargs, sma_period = sma_period)
-                sma_instance._compute_sma()
-                sma_instance.save()
-            except Exception as e:
-                logger.error(" SMA " + str(sma_period) + " Compute Exception: " + str(e))
+    def compute_all(cls, **kwargs):
+        try:
+            sma_instance = cls(**kwargs)
+            sma_instance._compute_smas()
+            sma_instance.save()
+            cache = get_series_cache()
+            if cache is not None:
+                cache.append(series_key('smas', **kwargs), kwargs['timestamp'],
+                             {column: getattr(sma_instance, column) for column in SMA_WIDE_COLUMNS})
+        except Exception as e:
+            logger.error(" SMA Compute Exception: " + str(e))
         logger.info("   ...All SMA calculations have been done and saved.")
 
-
+SMA_WIDE_COLUMNS = [sma_field_name(sma_period, price_type) for sma_period in SMA_LIST for price_type in SMA_PRICE_TYPES]
+for _column in SMA_WIDE_COLUMNS:
+    SmaWide.add_to_class(_column, models.BigIntegerField(null=True))
 
 
 
 ####################### get n last sma records as a DataFrame
 # NOTE : dont use **kwarg because we dont use time parameter here, to avoid confusion
-def get_n_last_sma_df(n, sma_period, source, transaction_currency, counter_currency, resample_period):
-
-    last_prices = list(Sma.objects.filter(
-        timestamp__gte=datetime.now() - timedelta(minutes=(resample_period * sma_period * n)),
+def get_n_last_smas_df(n, sma_periods, source, transaction_currency, counter_currency, resample_period, price_types=('close', 'midpoint')):
+    """
+    n most recent rows of SMAs of several periods in one query, oldest first.
+    Columns are named by sma_field_name(), e.g. sma50_close_price.
+    """
+    columns = [sma_field_name(sma_period, price_type) for sma_period in sma_periods for price_type in price_types]
+    # the run cache keeps all columns, other readers of the run may need other periods
+    loaded_columns = SMA_WIDE_COLUMNS if get_series_cache() is not None else columns
+    smas_df = cached_df('smas', n, lambda rows: load_timeseries_df(SmaWide.objects.filter(
         source=source,
         transaction_currency=transaction_currency,
         counter_currency=counter_currency,
         resample_period=resample_period,
-        sma_period=sma_period,
-    ).order_by('-timestamp').values('timestamp','sma_close_price','sma_midpoint_price'))
+    ), loaded_columns, n=rows),
+        source=source, transaction_currency=transaction_currency, counter_currency=counter_currency, resample_period=resample_period)
+    return smas_df[columns]
 
-    df = pd.DataFrame()
-    if last_prices:
-        ts = [rec['timestamp'] for rec in last_prices]
-        sma_close_prices = pd.Series(data=[rec['sma_close_price'] for rec in last_prices], index=ts)
-        sma_midpoint_prices = pd.Series(data=[rec['sma_midpoint_price'] for rec in last_prices], index=ts)
 
-        df['sma_close_price'] = sma_close_prices
-        df['sma_midpoint_price'] = sma_midpoint_prices
-
-    return df.iloc[::-1]
+def get_n_last_sma_df(n, sma_period, source, transaction_currency, counter_currency, resample_period):
+    "sma_close_price and sma_midpoint_price of one period, as they were stored in Sma model"
+    smas_df = get_n_last_smas_df(n, [sma_period], source, transaction_currency, counter_currency, resample_period)
+    return smas_df.rename(columns={sma_field_name(sma_period, price_type): 'sma_{}_price'.format(price_type)
+                                   for price_type in ('close', 'midpoint')})
@@ -0,0 +1,56 @@
+from datetime import timedelta, datetime
+
+from django.db import models
+from unixtimestampfield.fields import UnixTimeStampField
+
+from apps.common.utilities.db import load_timeseries_df
+from settings import SOURCE_CHOICES, COUNTER_CURRENCY_CHOICES, BTC
+
+
+class Tick(models.Model):
+    """
+    Price and volume of one exchange ticker in one row.
+    Replaces the Price + Volume pair, see TICKS_WRITE_LEGACY and TICKS_READ_UNIFIED settings.
+    """
+    source = models.SmallIntegerField(choices=SOURCE_CHOICES, null=False)
+    transaction_currency = models.CharField(max_length=6, null=False, blank=False)
+    counter_currency = models.SmallIntegerField(choices=COUNTER_CURRENCY_CHOICES,
+                                                null=False, default=BTC)
+    price = models.BigIntegerField(null=True) # in satoshi, same as Price.price
+    volume = models.FloatField(null=True)
+
+    timestamp = UnixTimeStampField(null=False)
+
+
+    class Meta:
+        unique_together = ('source', 'transaction_currency', 'counter_currency', 'timestamp')
+
+
+    # MODEL PROPERTIES
+
+    @property
+    def price_change(self):
+        "Same as Price.price_change, for readers which get Tick rows from price_ticks()"
+        if self.price:
+            price_24h_older = Tick.objects.filter(
+                source=self.source,
+                transaction_currency=self.transaction_currency,
+                counter_currency=self.counter_currency,
+                price__isnull=False,
+                timestamp__lte=self.timestamp - timedelta(minutes=1440)
+            ).order_by('-timestamp').first()
+            if price_24h_older:
+                return float(self.price - price_24h_older.price) / price_24h_older.price
+
+
+def get_n_last_ticks_df(n, source, transaction_currency, counter_currency):
+    "Prices and volumes for the last n minutes as one DataFrame indexed by timestamp, None if there are no ticks"
+    ticks_df = load_timeseries_df(Tick.objects.filter(
+        source=source,
+        transaction_currency=transaction_currency,
+        counter_currency=counter_currency,
+        timestamp__gte=datetime.now() - timedelta(minutes=n)
+    ), ['price', 'volume'])
+
+    if not ticks_df.empty:
+        return ticks_df
@@ -0,0 +1,75 @@
+from datetime import timedelta, datetime
+
+from django.db import models
+from unixtimestampfield.fields import UnixTimeStampField
+import pandas as pd
+
+from settings import SOURCE_CHOICES, COUNTER_CURRENCY_CHOICES, BTC
+from settings import TICKS_COMPACT_AFTER_DAYS
+
+
+BAR_PERIOD = 10 # minutes, same as the ANN features period
+
+
+class TickBar(models.Model):
+    """
+    Ticks of one pair compacted into a 10 minute bar, see TICKS_COMPACT_AFTER_DAYS setting.
+    Raw Price/Volume/Tick rows of the bar are removed, readers use bars for the compacted part of history.
+    The bar covers [timestamp, timestamp + BAR_PERIOD), like pandas resample.
+    """
+    source = models.SmallIntegerField(choices=SOURCE_CHOICES, null=False)
+    transaction_currency = models.CharField(max_length=6, null=False, blank=False)
+    counter_currency = models.SmallIntegerField(choices=COUNTER_CURRENCY_CHOICES,
+                                                null=False, default=BTC)
+    timestamp = UnixTimeStampField(null=False)
+
+    price = models.BigIntegerField(null=True) # mean price in satoshi
+    price_variance = models.FloatField(null=True) # sample variance, same as pandas resample().var()
+    price_count = models.IntegerField(null=False, default=0)
+
+    volume = models.FloatField(null=True) # mean volume
+    volume_variance = models.FloatField(null=True)
+    volume_count = models.IntegerField(null=False, default=0)
+
+
+    class Meta:
+        unique_together = ('source', 'transaction_currency', 'counter_currency', 'timestamp')
+
+
+def get_compacted_before(days=None):
+    "Ticks before that time are (or will be on the next run) compacted into bars, None if compaction is off"
+    days = TICKS_COMPACT_AFTER_DAYS if days is None else days
+    if not days:
+        return None
+    cutoff = datetime.now() - timedelta(days=days)
+    return cutoff - timedelta(minutes=cutoff.minute % BAR_PERIOD, seconds=cutoff.second, microseconds=cutoff.microsecond)
+
+
+def add_compacted_history(raw_ts, column, n, source, transaction_currency, counter_currency):
+    """
+    Prepend bar values of column (price or volume) to raw_ts, a series of raw ticks for the last n minutes,
+    when the last n minutes reach into compacted history.
+    """
+    compacted_before = get_compacted_before()
+    start = datetime.now() - timedelta(minutes=n)
+    if compacted_before is None or start >= compacted_before:
+        return raw_ts
+
+    bars = TickBar.objects.filter(
+        source=source,
+        transaction_currency=transaction_currency,
+        counter_currency=counter_currency,
+        timestamp__gt=start - timedelta(minutes=BAR_PERIOD), # the bar with start inside too
+        **{column + '__isnull': False}
+    )
+    if raw_ts is not None and len(raw_ts):
+        bars = bars.filter(timestamp__lt=raw_ts.index[0]) # not compacted yet ticks take precedence
+    bar_records = list(bars.values_list('timestamp', column).order_by('timestamp'))
+
+    if not bar_records:
+        return raw_ts
+    bars_ts = pd.Series(
+        data=[value for _, value in bar_records],
+        index=[timestamp for timestamp, _ in bar_records]
+    )
+    return bars_ts if raw_ts is None else pd.concat([bars_ts, raw_ts])
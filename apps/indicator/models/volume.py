@@ -5,9 +5,12 @@ from unixtimestampfield.fields import UnixTimeStampField
 from apps.indicator.models.price import Price
 
 from settings import SOURCE_CHOICES, COUNTER_CURRENCY_CHOICES, BTC
+from settings import TICKS_READ_UNIFIED
+from apps.common.utilities.db import load_timeseries_df
+from apps.indicator.models.tick import Tick, get_n_last_ticks_df
+from apps.indicator.models.tick_bar import add_compacted_history
 
 from datetime import timedelta, datetime
-import pandas as pd
 
 class Volume(models.Model):
     source = models.SmallIntegerField(choices=SOURCE_CHOICES, null=False)
@@ -18,21 +21,37 @@ class Volume(models.Model):
     volume = models.FloatField(null=False)
     timestamp = UnixTimeStampField(null=False)
 
+    class Meta:
+        # SQS delivers at least once, one tick per pair and timestamp
+        unique_together = ('source', 'transaction_currency', 'counter_currency', 'timestamp')
+        indexes = [
+            models.Index(fields=['transaction_currency', 'counter_currency', 'timestamp']), # pair from any source
+        ]
+
 
     # MODEL PROPERTIES
 
     # MODEL FUNCTIONS
 
+def volume_ticks():
+    "Raw volume ticks for readers of Volume: Tick rows with a volume once TICKS_READ_UNIFIED is on, Volume rows before"
+    if TICKS_READ_UNIFIED:
+        return Tick.objects.filter(volume__isnull=False)
+    return Volume.objects.all()
+
+
 def get_n_last_volumes_ts(n, source, transaction_currency, counter_currency):
-    back_in_time_records = list(Volume.objects.filter(
+    if TICKS_READ_UNIFIED:
+        ticks_df = get_n_last_ticks_df(n, source, transaction_currency, counter_currency)
+        raw_ts = ticks_df['volume'].dropna() if ticks_df is not None else None
+        return add_compacted_history(raw_ts, 'volume', n, source, transaction_currency, counter_currency)
+
+    volumes_df = load_timeseries_df(Volume.objects.filter(
         source=source,
         transaction_currency=transaction_currency,
         counter_currency=counter_currency,
         timestamp__gte=datetime.now() - timedelta(minutes=n)
-    ).values('timestamp', 'volume').order_by('timestamp'))
+    ), ['volume'])
 
-    if back_in_time_records:
-        return pd.Series(
-            data = [rec['volume'] for rec in back_in_time_records],
-            index=[rec['timestamp'] for rec in back_in_time_records]
-        )
\ No newline at end of file
+    raw_ts = volumes_df['volume'] if not volumes_df.empty else None
+    return add_compacted_history(raw_ts, 'volume', n, source, transaction_currency, counter_currency)
\ No newline at end of file
@@ -0,0 +1,105 @@
+"""
+Run-scoped cache of time series read by indicators and event detectors.
+
+Inside series_cache() every get_n_last_* loader of a pair reads its history from DB once,
+with HISTORY_ROWS rows, and later calls of the run get the tail of the cached DataFrame.
+Indicators add the values they have just saved, so event detectors don't read them back.
+Outside series_cache() nothing is cached, loaders read from DB as before.
+"""
+import logging
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+import pandas as pd
+
+from apps.common.utilities.db import to_epoch
+
+
+
+logger = logging.getLogger(__name__)
+
+HISTORY_ROWS = 1000 # covers the longest reader, EventsElementaryBits.check_events (ichi_displacement ** 2 + 10)
+
+_state = threading.local()
+
+
+class SeriesCache:
+
+    def __init__(self, history_rows=HISTORY_ROWS):
+        self._history_rows = history_rows
+        self._frames = {} # key: (DataFrame, whole history loaded)
+        self._objects = {} # key: indicator object saved in this run
+        self.hits = 0
+        self.misses = 0
+
+    def get_df(self, key, n, load):
+        "n last rows of the series, load(rows) reads the series from DB on a miss"
+        cached = self._frames.get(key)
+        if cached is not None and (len(cached[0]) >= n or cached[1]):
+            self.hits += 1
+            return cached[0].tail(n).copy()
+
+        self.misses += 1
+        rows = max(n, self._history_rows)
+        df = load(rows)
+        self._frames[key] = (df, len(df) < rows)
+        return df.tail(n).copy()
+
+    def append(self, key, timestamp, values):
+        "Add a row saved in this run to a cached series, a series which is not cached yet will read it from DB"
+        cached = self._frames.get(key)
+        if cached is None:
+            return
+        df, complete = cached
+        index = pd.DatetimeIndex([datetime.utcfromtimestamp(round(to_epoch(timestamp), 6))])
+        if len(df) and index[0] <= df.index[-1]:
+            return # already read from DB
+        self._frames[key] = (pd.concat([df, pd.DataFrame(values, index=index, columns=df.columns, dtype=float)]), complete)
+
+    def put_object(self, key, obj):
+        self._objects[key] = obj
+
+    def get_object(self, key, load):
+        "Object saved in this run, load() reads it from DB on a miss"
+        if key in self._objects:
+            self.hits += 1
+            return self._objects[key]
+        self.misses += 1
+        return load()
+
+    def clear(self):
+        "Drop cached series and objects, counters are kept"
+        self._frames.clear()
+        self._objects.clear()
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses}
+
+
+@contextmanager
+def series_cache(history_rows=HISTORY_ROWS):
+    "Cache time series read inside, see SeriesCache"
+    outer = getattr(_state, 'cache', None)
+    _state.cache = cache = SeriesCache(history_rows)
+    try:
+        yield cache
+    finally:
+        _state.cache = outer
+        logger.info("Series cache stats: {}".format(cache.stats()))
+
+def get_series_cache():
+    "Active SeriesCache of this thread or None"
+    return getattr(_state, 'cache', None)
+
+
+def series_key(name, source, transaction_currency, counter_currency, resample_period, **kwargs):
+    return name, source, transaction_currency, counter_currency, resample_period
+
+
+def cached_df(name, n, load, **kwargs):
+    "load(rows) through the active cache, or load(n) without one. kwargs: source, pair and resample_period"
+    cache = get_series_cache()
+    if cache is None:
+        return load(n)
+    return cache.get_df(series_key(name, **kwargs), n, load)
@@ -0,0 +1,63 @@
+from django.test import TestCase
+
+from apps.common.utilities.db import to_epoch
+from apps.indicator.models import Price, PriceResampl
+from apps.indicator.models.price_resampl import find_missing_bars, backfill_bars, resample_source
+
+from settings import POLONIEX, BTC, SHORT
+
+START = 1522051200 # 2018-03-26 08:00 UTC
+
+
+
+class TestBackfillBars(TestCase):
+
+    def setUp(self):
+        Price.objects.bulk_create([
+            Price(source=POLONIEX, transaction_currency=transaction_currency, counter_currency=BTC,
+                  price=7000000 + minute * 100, timestamp=START + minute * 60 + 30)
+            for transaction_currency in ('ETH', 'XRP') for minute in range(10 * 60)])
+
+    def bar_timestamps(self, transaction_currency):
+        return [to_epoch(timestamp) for timestamp in PriceResampl.objects.filter(
+            transaction_currency=transaction_currency).order_by('timestamp').values_list('timestamp', flat=True)]
+
+    def test_first_run_fills_everything(self):
+        end_time = START + 10 * 3600
+        self.assertEqual(list(find_missing_bars(POLONIEX, SHORT, START, end_time)), [START + hour * 3600 for hour in range(11)])
+        self.assertEqual(backfill_bars(POLONIEX, SHORT, START, end_time), 20)
+        self.assertEqual(self.bar_timestamps('ETH'), [START + hour * 3600 for hour in range(1, 11)])
+        self.assertEqual(len(find_missing_bars(POLONIEX, SHORT, START + 3600, end_time)), 0)
+
+    def test_gaps_of_one_pair(self):
+        resample_source(POLONIEX, SHORT, START + 10 * 3600, start_time=START + 1)
+        expected = PriceResampl.objects.get(transaction_currency='ETH', timestamp=START + 5 * 3600)
+        PriceResampl.objects.filter(transaction_currency='ETH', timestamp__in=[START + 2 * 3600, START + 5 * 3600, START + 6 * 3600]).delete()
+
+        self.assertEqual(list(find_missing_bars(POLONIEX, SHORT, START + 3600, START + 10 * 3600)),
+                         [START + 2 * 3600, START + 5 * 3600, START + 6 * 3600])
+        self.assertEqual(backfill_bars(POLONIEX, SHORT, START + 3600, START + 10 * 3600), 3)
+        self.assertEqual(len(self.bar_timestamps('ETH')), 10)
+        self.assertEqual(len(self.bar_timestamps('XRP')), 10)
+
+        backfilled = PriceResampl.objects.get(transaction_currency='ETH', timestamp=START + 5 * 3600)
+        self.assertEqual((backfilled.close_price, backfilled.high_price, backfilled.price_count),
+                         (expected.close_price, expected.high_price, expected.price_count))
+
+    def test_holes_of_all_pairs_are_checked_at_once(self):
+        resample_source(POLONIEX, SHORT, START + 10 * 3600, start_time=START + 1)
+        PriceResampl.objects.filter(transaction_currency='ETH', timestamp__in=[START + 2 * 3600, START + 7 * 3600]).delete()
+        PriceResampl.objects.filter(transaction_currency='XRP', timestamp=START + 4 * 3600).delete()
+        Price.objects.filter(transaction_currency='ETH', timestamp__gt=START + 6 * 3600, timestamp__lte=START + 7 * 3600).delete()
+
+        with self.assertNumQueries(2): # bars, then periods with ticks of ETH and XRP
+            self.assertEqual(list(find_missing_bars(POLONIEX, SHORT, START + 3600, START + 10 * 3600)),
+                             [START + 2 * 3600, START + 4 * 3600])
+
+    def test_quiet_pairs_are_not_rescanned(self):
+        # XRP went quiet after 5 hours, ETH had no ticks in the 4th hour
+        Price.objects.filter(transaction_currency='XRP', timestamp__gt=START + 5 * 3600).delete()
+        Price.objects.filter(transaction_currency='ETH', timestamp__gt=START + 3 * 3600, timestamp__lte=START + 4 * 3600).delete()
+        self.assertEqual(backfill_bars(POLONIEX, SHORT, START, START + 10 * 3600), 14)
+
+        self.assertEqual(len(find_missing_bars(POLONIEX, SHORT, START + 3600, START + 10 * 3600)), 0)
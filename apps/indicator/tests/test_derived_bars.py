@@ -0,0 +1,69 @@
+from unittest import mock
+
+from django.test import TestCase
+
+from apps.indicator.models import Price, PriceResampl
+from apps.indicator.models.price_resampl import resample_source, _aggregate_bars, _derive_bars, _derived_or_aggregated_bars
+
+from settings import POLONIEX, BTC, SHORT, MEDIUM, LONG
+
+START = 1522022400 # 2018-03-26 00:00 UTC
+
+
+
+class TestDerivedBars(TestCase):
+
+    def setUp(self):
+        # irregular ticks, some hours without ticks
+        Price.objects.bulk_create([
+            Price(source=POLONIEX, transaction_currency=transaction_currency, counter_currency=BTC,
+                  price=7000000 + (minute * 7919 % 1000) * 1000 + offset, timestamp=START + minute * 60 + 17)
+            for transaction_currency, offset in (('ETH', 0), ('XRP', 123456))
+            for minute in range(0, 24 * 60, 3) if not 300 <= minute < 420])
+        resample_source(POLONIEX, SHORT, START + 24 * 3600, start_time=START + 1)
+
+    def assert_same_bars(self, derived, raw):
+        self.assertEqual(len(derived), len(raw))
+        for derived_bar, raw_bar in zip(sorted(derived), sorted(raw)):
+            self.assertEqual(derived_bar[:3], raw_bar[:3])
+            # open, close, low, high, count are exact, the mean is derived from integer means of SHORT bars
+            self.assertEqual([int(value) for value in derived_bar[3:7]] + [derived_bar[9]], [int(value) for value in raw_bar[3:7]] + [raw_bar[9]])
+            self.assertAlmostEqual(derived_bar[7], float(raw_bar[7]), delta=1)
+            self.assertAlmostEqual(derived_bar[8], float(raw_bar[8]), delta=1e-6 * float(raw_bar[8]))
+
+    def test_parity_with_raw_ticks(self):
+        for resample_period in (MEDIUM, LONG):
+            period_seconds = resample_period * 60
+            self.assert_same_bars(_derived_or_aggregated_bars(POLONIEX, period_seconds, START, START + 24 * 3600),
+                                  _aggregate_bars(POLONIEX, period_seconds, START, START + 24 * 3600))
+
+    def test_incomplete_short_bars_are_not_derived(self):
+        # a SHORT bar lost in an outage and one saved before price_count was added
+        PriceResampl.objects.filter(resample_period=SHORT, transaction_currency='ETH', timestamp=START + 10 * 3600).delete()
+        PriceResampl.objects.filter(resample_period=SHORT, transaction_currency='XRP', timestamp=START + 15 * 3600).update(price_count=None)
+
+        _, missing_times, incomplete = _derive_bars(POLONIEX, MEDIUM * 60, START, START + 24 * 3600)
+        self.assertEqual(missing_times, set())
+        # hours 5 and 6 have no ticks at all, other pairs are derived
+        self.assertEqual(incomplete, {('ETH', BTC, START + 8 * 3600), ('XRP', BTC, START + 8 * 3600),
+                                      ('ETH', BTC, START + 12 * 3600), ('XRP', BTC, START + 16 * 3600)})
+        self.assert_same_bars(_derived_or_aggregated_bars(POLONIEX, MEDIUM * 60, START, START + 24 * 3600),
+                              _aggregate_bars(POLONIEX, MEDIUM * 60, START, START + 24 * 3600))
+        self.assert_same_bars(_derived_or_aggregated_bars(POLONIEX, MEDIUM * 60, START + 8 * 3600, START + 12 * 3600, bar_timestamp=START + 12 * 3600),
+                              _aggregate_bars(POLONIEX, MEDIUM * 60, START + 8 * 3600, START + 12 * 3600, bar_timestamp=START + 12 * 3600))
+
+    def test_only_incomplete_pairs_are_aggregated(self):
+        PriceResampl.objects.filter(resample_period=SHORT, transaction_currency='ETH', timestamp=START + 22 * 3600).delete()
+        with mock.patch('apps.indicator.models.price_resampl._aggregate_bars', wraps=_aggregate_bars) as aggregate:
+            bars = _derived_or_aggregated_bars(POLONIEX, MEDIUM * 60, START + 20 * 3600, START + 24 * 3600, bar_timestamp=START + 24 * 3600)
+        self.assertEqual(aggregate.call_args[1]['pairs'], {('ETH', BTC)})
+        self.assert_same_bars(bars, _aggregate_bars(POLONIEX, MEDIUM * 60, START + 20 * 3600, START + 24 * 3600, bar_timestamp=START + 24 * 3600))
+
+    def test_resample_source_derives_when_short_bars_are_ready(self):
+        Price.objects.all().delete() # raw ticks are not needed any more
+        self.assertEqual(resample_source(POLONIEX, MEDIUM, START + 24 * 3600), 2)
+        bar = PriceResampl.objects.get(resample_period=MEDIUM, transaction_currency='ETH')
+        short_bars = PriceResampl.objects.filter(resample_period=SHORT, transaction_currency='ETH',
+                                                 timestamp__gt=START + 20 * 3600, timestamp__lte=START + 24 * 3600)
+        self.assertEqual(bar.price_count, sum(short_bar.price_count for short_bar in short_bars))
+        self.assertEqual(bar.high_price, max(short_bar.high_price for short_bar in short_bars))
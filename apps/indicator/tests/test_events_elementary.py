@@ -0,0 +1,70 @@
+import time
+from datetime import datetime
+
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from apps.indicator.models import EventsElementaryBits
+from apps.indicator.models.events_elementary import ALL_POSSIBLE_ELEMENTARY_EVENTS, filter_by_elementory_event,\
+    get_current_elementory_events_df, get_last_ever_entered_elementory_events_df, BITSET_ELEMENTARY_EVENTS, VALUED_ELEMENTARY_EVENTS
+
+from settings import POLONIEX, BTC, SHORT, REST_API_SECRET_KEY
+
+PARAMS = {'source': POLONIEX, 'transaction_currency': 'ETH', 'counter_currency': BTC, 'resample_period': SHORT}
+
+
+
+class TestEventsElementaryBits(TestCase):
+
+    def setUp(self):
+        self.timestamp = time.time() // 3600 * 3600
+        events_row = EventsElementaryBits(timestamp=self.timestamp, **PARAMS)
+        events_row.set_event('sma50_above_sma200')
+        events_row.set_event('close_below_cloud')
+        events_row.set_event('rsi_bracket', -2, 22.5)
+        events_row.save()
+        EventsElementaryBits.objects.create(timestamp=self.timestamp - 3600, events_mask=0, rsi_bracket=1, **PARAMS)
+
+    def test_bits_of_saved_rows_do_not_move(self):
+        # masks of saved rows decode with these positions, new events go after the last one
+        pinned = ['sma50_cross_price_down', 'sma200_cross_price_down', 'sma50_cross_sma200_down', 'sma50_cross_price_up',
+                  'sma200_cross_price_up', 'sma50_cross_sma200_up', 'sma50_above_sma200', 'sma50_below_sma200',
+                  'close_cloud_breakout_up', 'close_cloud_breakout_down', 'close_cloud_breakout_up_ext',
+                  'close_cloud_breakout_down_ext', 'lagging_above_cloud', 'lagging_below_cloud', 'lagging_above_highest',
+                  'lagging_below_lowest', 'conversion_above_base', 'conversion_below_base', 'close_above_cloud', 'close_below_cloud']
+        self.assertEqual(BITSET_ELEMENTARY_EVENTS[:len(pinned)], pinned)
+        self.assertEqual(EventsElementaryBits.objects.get(timestamp=self.timestamp).events_mask, (1 << 6) | (1 << 19))
+        # every yes/no event has a bit
+        self.assertEqual(set(ALL_POSSIBLE_ELEMENTARY_EVENTS) - set(VALUED_ELEMENTARY_EVENTS) - set(BITSET_ELEMENTARY_EVENTS), set())
+
+    def test_get_events(self):
+        events_row = EventsElementaryBits.objects.get(timestamp=self.timestamp)
+        self.assertEqual(events_row.get_events(), {'sma50_above_sma200': 1, 'close_below_cloud': 1, 'rsi_bracket': -2})
+        self.assertEqual(events_row.rsi_value, 22.5)
+
+    def test_decoded_dataframes(self):
+        current_df = get_current_elementory_events_df(self.timestamp, **PARAMS)
+        self.assertEqual(list(current_df.columns), ALL_POSSIBLE_ELEMENTARY_EVENTS)
+        self.assertEqual(list(current_df.index), [datetime.utcfromtimestamp(self.timestamp)])
+        fired = {name: value for name, value in current_df.iloc[0].iteritems() if value}
+        self.assertEqual(fired, {'sma50_above_sma200': 1, 'close_below_cloud': 1, 'rsi_bracket': -2})
+
+        self.assertTrue(get_current_elementory_events_df(self.timestamp - 60, **PARAMS).empty)
+
+        last_df = get_last_ever_entered_elementory_events_df(time.time(), **PARAMS)
+        self.assertEqual(int(last_df['sma50_above_sma200']), 1)
+        self.assertEqual(int(last_df['sma50_below_sma200']), 0)
+
+    def test_filter_by_event(self):
+        queryset = EventsElementaryBits.objects.all()
+        self.assertEqual(filter_by_elementory_event(queryset, 'close_below_cloud').count(), 1)
+        self.assertEqual(filter_by_elementory_event(queryset, 'rsi_bracket').count(), 2)
+        self.assertEqual(filter_by_elementory_event(queryset, 'lagging_above_cloud').count(), 0)
+        self.assertEqual(filter_by_elementory_event(queryset, 'no_such_event').count(), 0)
+
+    def test_api(self):
+        response = APIClient().get('/api/v2/events-elementary/ETH?event_name=sma50_above_sma200', HTTP_API_KEY=REST_API_SECRET_KEY)
+        self.assertEqual(response.status_code, 200)
+        item = response.data['results'][0]
+        self.assertEqual(item['events'], {'sma50_above_sma200': 1, 'close_below_cloud': 1, 'rsi_bracket': -2})
+        self.assertEqual(item['rsi_value'], 22.5)
@@ -0,0 +1,63 @@
+import shutil
+import tempfile
+from datetime import datetime
+
+import numpy as np
+from django.test import TestCase
+
+from apps.common.utilities.columnar import read_history, load_partition, partition_path
+from apps.indicator.management.commands.export_columnar import export_model
+from apps.indicator.models import Price, EventsElementary
+
+from settings import POLONIEX, BINANCE, BTC, USDT, SHORT
+
+
+
+class TestColumnarExport(TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.timestamps = [1519862340, 1519862400, 1519862460] # 2018-02-28 23:59, 2018-03-01 00:00, 00:01
+        for price, timestamp in zip([7000000, 7100000, 7200000], self.timestamps):
+            Price.objects.create(source=POLONIEX, transaction_currency='ETH', counter_currency=BTC, price=price, timestamp=timestamp)
+        Price.objects.create(source=BINANCE, transaction_currency='BTC', counter_currency=USDT, price=1, timestamp=self.timestamps[0])
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_export_and_read(self):
+        self.assertEqual(export_model(Price, self.root), 4)
+
+        march = load_partition(partition_path(self.root, 'indicator_price', 'poloniex', 'ETH', 'BTC', '2018-03'))
+        self.assertIsInstance(march['price'], np.memmap)
+        self.assertEqual(list(march['price']), [7100000, 7200000])
+
+        history_df = read_history(self.root, 'indicator_price', 'poloniex', 'ETH', 'BTC')
+        self.assertEqual(list(history_df['price']), [7000000, 7100000, 7200000])
+        self.assertEqual(history_df.index[0], datetime.utcfromtimestamp(self.timestamps[0]))
+
+        history_df = read_history(self.root, 'indicator_price', 'poloniex', 'ETH', 'BTC', columns=['price'],
+                                  start=datetime.utcfromtimestamp(self.timestamps[1]))
+        self.assertEqual(list(history_df.columns), ['price'])
+        self.assertEqual(list(history_df['price']), [7100000, 7200000])
+
+    def test_incremental_export(self):
+        export_model(Price, self.root)
+        self.assertEqual(export_model(Price, self.root), 0)
+
+        Price.objects.create(source=POLONIEX, transaction_currency='ETH', counter_currency=BTC, price=7300000, timestamp=1519862520)
+        self.assertEqual(export_model(Price, self.root), 1)
+        history_df = read_history(self.root, 'indicator_price', 'poloniex', 'ETH', 'BTC')
+        self.assertEqual(list(history_df['price']), [7000000, 7100000, 7200000, 7300000])
+
+    def test_export_strings_and_nulls(self):
+        EventsElementary.objects.create(source=POLONIEX, transaction_currency='ETH', counter_currency=BTC, resample_period=SHORT,
+                                        event_name='rsi_bracket', event_value=1, timestamp=self.timestamps[0])
+        EventsElementary.objects.create(source=POLONIEX, transaction_currency='ETH', counter_currency=BTC, resample_period=SHORT,
+                                        event_name='sma50_cross_price_up', timestamp=self.timestamps[1])
+        self.assertEqual(export_model(EventsElementary, self.root), 2)
+
+        history_df = read_history(self.root, 'indicator_eventselementary', 'poloniex', 'ETH', 'BTC')
+        self.assertEqual(list(history_df['event_name']), ['rsi_bracket', 'sma50_cross_price_up'])
+        self.assertEqual(history_df['event_value'][0], 1)
+        self.assertTrue(np.isnan(history_df['event_value'][1]))
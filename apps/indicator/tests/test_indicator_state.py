@@ -0,0 +1,139 @@
+import json
+import time
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+from django.db import connection
+from django.test import TestCase, SimpleTestCase
+from django.test.utils import CaptureQueriesContext
+
+from apps.common.utilities.db import to_epoch
+
+from apps.indicator.models import PriceResampl, SmaWide, Rsi, IndicatorState
+from apps.indicator.models.indicator_state import RollingSmas, EwmRelativeStrength, get_indicator_state
+from apps.indicator.models.price_resampl import _save_new_bars
+from apps.indicator.models.rsi import RSI_BARS
+from apps.indicator.models.sma import SMA_LIST, SMA_WIDE_COLUMNS, last_smas
+from apps.indicator.series_cache import series_cache
+
+from settings import POLONIEX, BTC, USDT, SHORT
+
+PARAMS = {'source': POLONIEX, 'transaction_currency': 'ETH', 'counter_currency': BTC, 'resample_period': SHORT}
+
+
+def pandas_rs(close_prices):
+    "Rsi.compute_rs over the last RSI_BARS close prices"
+    delta = pd.Series(close_prices[-RSI_BARS:]).diff()[1:]
+    up, down = delta.copy(), delta.copy()
+    up[up < 0] = 0
+    down[down > 0] = 0
+    return float((up.ewm(com=14, min_periods=3).mean() / np.abs(down.ewm(com=14, min_periods=3).mean())).tail(1))
+
+
+class TestIncrementalKernels(SimpleTestCase):
+
+    def setUp(self):
+        random = np.random.RandomState(7)
+        self.prices = (7000000 + np.cumsum(random.randint(-50000, 50000, size=(700, 3)), axis=0)).astype(np.float64)
+        self.prices[random.rand(*self.prices.shape) < 0.02] = np.nan
+
+    def test_same_as_full_recomputation(self):
+        smas, rs = RollingSmas(), EwmRelativeStrength()
+        for bar, prices in enumerate(self.prices):
+            smas.add(list(prices))
+            rs.add(prices[0])
+            if bar == 350: # stored and loaded state goes on the same way
+                smas = RollingSmas.from_dict(json.loads(json.dumps(smas.to_dict())))
+                rs = EwmRelativeStrength.from_dict(json.loads(json.dumps(rs.to_dict())))
+
+            np.testing.assert_array_equal(smas.values(), last_smas(self.prices[max(0, bar - 204):bar + 1], SMA_LIST))
+            if bar < 12:
+                self.assertIsNone(rs.value())
+            else:
+                np.testing.assert_allclose(rs.value(), pandas_rs(self.prices[:bar + 1, 0]), rtol=1e-9)
+
+    def test_one_sided_moves(self):
+        rs = EwmRelativeStrength()
+        close_prices = np.concatenate([7000000 - np.arange(100) * 1000.0, 6900000 + np.arange(300) * 1000.0])
+        for bar, close_price in enumerate(close_prices):
+            rs.add(close_price)
+            if bar >= 12:
+                # 0 and inf without a rounding residue
+                np.testing.assert_allclose(rs.value(), pandas_rs(close_prices[:bar + 1]), rtol=1e-9)
+
+
+class TestIndicatorState(TestCase):
+
+    def setUp(self):
+        self.timestamp = time.time() // 3600 * 3600
+        self.bars = 0
+        self.add_bars(250)
+
+    def add_bars(self, count):
+        PriceResampl.objects.bulk_create([
+            PriceResampl(timestamp=self.timestamp + bar * 3600, close_price=7000000 + (bar % 13) * 10000 - bar * 100,
+                         low_price=6900000, high_price=7200000 + bar % 7, midpoint_price=7050000, **PARAMS)
+            for bar in range(self.bars, self.bars + count)])
+        self.bars += count
+        return self.timestamp + (self.bars - 1) * 3600
+
+    def compute(self, timestamp, incremental):
+        with mock.patch('apps.indicator.models.sma.INCREMENTAL_INDICATORS', incremental), \
+             mock.patch('apps.indicator.models.rsi.INCREMENTAL_INDICATORS', incremental):
+            SmaWide.compute_all(SmaWide, **dict(PARAMS, timestamp=timestamp))
+            Rsi.compute_all(Rsi, **dict(PARAMS, timestamp=timestamp))
+        sma = SmaWide.objects.filter(timestamp=timestamp).order_by('-id').first()
+        rsi = Rsi.objects.filter(timestamp=timestamp).order_by('-id').first()
+        return [getattr(sma, column) for column in SMA_WIDE_COLUMNS], rsi.relative_strength
+
+    def assertSameAsFull(self, timestamp):
+        incremental_smas, incremental_rs = self.compute(timestamp, True)
+        full_smas, full_rs = self.compute(timestamp, False)
+        self.assertEqual(incremental_smas, full_smas)
+        self.assertAlmostEqual(incremental_rs, full_rs, places=9)
+
+    def test_new_bars_update_the_state(self):
+        self.assertSameAsFull(self.add_bars(0))
+        with mock.patch.object(IndicatorState, 'reset', autospec=True, side_effect=IndicatorState.reset) as rebuild:
+            for _ in range(3):
+                timestamp = self.add_bars(1)
+                self.assertSameAsFull(timestamp)
+                self.assertEqual(to_epoch(IndicatorState.objects.get(**PARAMS).timestamp), timestamp)
+            self.assertSameAsFull(self.add_bars(2)) # a missed run
+        self.assertFalse(rebuild.called)
+
+    def test_backfill_invalidates_the_state(self):
+        timestamp = self.add_bars(0)
+        get_indicator_state(**PARAMS)
+        # a bar saved behind the state, e.g. by backfill_bars
+        PriceResampl.objects.filter(timestamp=timestamp - 3600, **PARAMS).delete()
+        _save_new_bars(POLONIEX, SHORT, [('ETH', BTC, timestamp - 3600, 7100000, 6000000, 5900000, 7300000, 7000000, 0.0, 5)])
+        self.assertFalse(IndicatorState.objects.filter(**PARAMS).exists())
+        self.assertSameAsFull(timestamp)
+
+    def test_backfill_keeps_states_of_other_pairs(self):
+        timestamp = self.add_bars(0)
+        get_indicator_state(**PARAMS)
+        usdt_params = dict(PARAMS, counter_currency=USDT)
+        PriceResampl.objects.bulk_create([PriceResampl(**dict(usdt_params, timestamp=bar.timestamp, close_price=bar.close_price))
+                                          for bar in PriceResampl.objects.filter(**PARAMS)])
+        get_indicator_state(**usdt_params)
+
+        PriceResampl.objects.filter(timestamp=timestamp - 3600, **PARAMS).delete()
+        _save_new_bars(POLONIEX, SHORT, [('ETH', BTC, timestamp - 3600, 7100000, 6000000, 5900000, 7300000, 7000000, 0.0, 5)])
+        self.assertFalse(IndicatorState.objects.filter(**PARAMS).exists())
+        self.assertTrue(IndicatorState.objects.filter(**usdt_params).exists())
+
+    def test_one_state_read_per_run(self):
+        get_indicator_state(**PARAMS)
+        timestamp = self.add_bars(1)
+        with series_cache(), CaptureQueriesContext(connection) as context:
+            self.compute(timestamp, True)
+        selects = [query['sql'] for query in context.captured_queries if query['sql'].startswith('SELECT')]
+        self.assertEqual(len([sql for sql in selects if IndicatorState._meta.db_table in sql]), 1)
+        self.assertEqual(len([sql for sql in selects if PriceResampl._meta.db_table in sql]), 1) # the new bar
+
+    def test_no_bars(self):
+        self.assertIsNone(get_indicator_state(POLONIEX, 'XMR', BTC, SHORT))
+        self.assertIsNone(Rsi(timestamp=self.timestamp, **dict(PARAMS, transaction_currency='XMR')).compute_rs())
@@ -0,0 +1,53 @@
+import time
+from datetime import datetime
+from io import StringIO
+
+import numpy as np
+from django.core.management import call_command
+from django.test import TestCase
+
+from apps.common.utilities.db import load_timeseries_df
+from apps.indicator.models import Price, PriceResampl
+from apps.indicator.models.price import get_n_last_prices_ts
+from apps.indicator.models.price_resampl import get_n_last_resampl_df
+
+from settings import POLONIEX, BTC, SHORT
+
+PAIR = {'source': POLONIEX, 'transaction_currency': 'ETH', 'counter_currency': BTC}
+
+
+
+class TestLoaders(TestCase):
+
+    def setUp(self):
+        self.timestamp = time.time() // 3600 * 3600
+        PriceResampl.objects.bulk_create([
+            PriceResampl(timestamp=self.timestamp - bar * 3600, close_price=7000000 + bar, low_price=None, resample_period=SHORT, **PAIR)
+            for bar in range(300)])
+
+    def test_exact_number_of_most_recent_rows(self):
+        resampl_df = get_n_last_resampl_df(20, resample_period=SHORT, **PAIR)
+        self.assertEqual(len(resampl_df), 20)
+        self.assertEqual(list(resampl_df.columns), ['low_price', 'high_price', 'close_price', 'midpoint_price'])
+        # oldest first, index is naive UTC like the ORM gives
+        self.assertEqual(resampl_df.index[-1], datetime.utcfromtimestamp(self.timestamp))
+        self.assertEqual(resampl_df.index[0], datetime.utcfromtimestamp(self.timestamp - 19 * 3600))
+        self.assertEqual(list(resampl_df['close_price'].tail(2)), [7000001, 7000000])
+        self.assertTrue(np.isnan(resampl_df['low_price']).all())
+
+        self.assertTrue(get_n_last_resampl_df(20, resample_period=SHORT, **dict(PAIR, transaction_currency='XRP')).empty)
+
+    def test_time_window(self):
+        Price.objects.create(timestamp=time.time() - 30.5, price=7000000, **PAIR)
+        Price.objects.create(timestamp=time.time() - 7200, price=6000000, **PAIR)
+        prices = get_n_last_prices_ts(60, **PAIR)
+        self.assertEqual(list(prices), [7000000])
+        self.assertEqual(prices.index[0], Price.objects.order_by('-timestamp').first().timestamp)
+
+        self.assertEqual(len(load_timeseries_df(Price.objects.all(), ['price'])), 2)
+
+    def test_benchmark_command(self):
+        out = StringIO()
+        call_command('benchmark_loaders', seed=300, repeat=1, stdout=out)
+        self.assertIn('resampl (rsi)', out.getvalue())
+        self.assertEqual(PriceResampl.objects.filter(transaction_currency='BENCH').count(), 0)
@@ -0,0 +1,34 @@
+import time
+from datetime import datetime
+
+from django.test import TestCase, SimpleTestCase
+
+from apps.common.utilities.partitions import week_start, partition_name, _parse_bounds, apply_retention
+from apps.indicator.models import Price
+
+from settings import POLONIEX, BTC
+
+
+
+class TestPartitionHelpers(SimpleTestCase):
+
+    def test_week_start(self):
+        # Wednesday 2018-03-28 12:00 UTC
+        start = week_start(1522238400)
+        self.assertEqual(datetime.utcfromtimestamp(start), datetime(2018, 3, 26))
+        self.assertEqual(partition_name('indicator_price', start), 'indicator_price_p20180326')
+
+    def test_parse_bounds(self):
+        self.assertEqual(_parse_bounds("FOR VALUES FROM (MINVALUE) TO ('1522022400')"), (float('-inf'), 1522022400.0))
+        self.assertEqual(_parse_bounds("FOR VALUES FROM ('1522022400') TO ('1522627200')"), (1522022400.0, 1522627200.0))
+
+
+class TestRetention(TestCase):
+
+    def test_delete_fallback(self):
+        now = time.time()
+        for days_ago in (1, 10, 40):
+            Price.objects.create(source=POLONIEX, transaction_currency='ETH', counter_currency=BTC,
+                                 price=7000000, timestamp=now - days_ago * 24 * 60 * 60)
+        self.assertEqual(apply_retention(Price, retention_days=30, delete_batch_size=1), 1)
+        self.assertEqual(Price.objects.count(), 2)
@@ -0,0 +1,81 @@
+import time
+from datetime import timedelta, datetime
+from unittest import skipUnless
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from apps.indicator.models import Price, Volume
+from apps.indicator.models.price import get_n_last_prices_ts
+from apps.indicator.models.volume import get_n_last_volumes_ts
+from apps.indicator.models.price_resampl import get_n_last_resampl_df, get_first_resampled_time
+from apps.indicator.models.sma import get_n_last_sma_df
+from apps.indicator.models.ann_future_price_classification import get_n_last_ann_classif_df
+from apps.indicator.models.events_elementary import get_current_elementory_events_df, get_last_ever_entered_elementory_events_df
+from apps.signal.models import Signal
+from taskapp.helpers import get_currency_pairs
+
+from settings import POLONIEX, BTC, USDT, SHORT, REST_API_SECRET_KEY
+
+PAIR = {'source': POLONIEX, 'transaction_currency': 'ETH', 'counter_currency': BTC}
+
+
+@skipUnless(connection.vendor == 'postgresql', "query plans are checked on PostgreSQL only")
+class TestHotQueryPlans(TestCase):
+    """
+    Run the hot queries of the pipeline, the API and the info bot and check that none of them
+    has to scan a whole table. Sequential scans are disabled, so the planner uses an index whenever one fits.
+    """
+
+    def assertIndexScansOnly(self, run_queries):
+        with CaptureQueriesContext(connection) as context:
+            run_queries()
+        selects = [query['sql'] for query in context.captured_queries if query['sql'].startswith('SELECT')]
+        self.assertTrue(selects)
+
+        with connection.cursor() as cursor:
+            cursor.execute('SET enable_seqscan = off')
+            try:
+                for sql in selects:
+                    cursor.execute('EXPLAIN ' + sql)
+                    plan = '\n'.join(row[0] for row in cursor.fetchall())
+                    self.assertNotIn('Seq Scan', plan, msg="Sequential scan in:\n{}\n{}".format(sql, plan))
+            finally:
+                cursor.execute('SET enable_seqscan = on')
+
+    def test_pipeline_queries(self):
+        def run_queries():
+            get_currency_pairs(source=POLONIEX, period_in_seconds=SHORT * 60 * 2)
+            get_n_last_prices_ts(SHORT, **PAIR)
+            get_n_last_volumes_ts(SHORT, **PAIR)
+            get_n_last_resampl_df(200, resample_period=SHORT, **PAIR)
+            get_first_resampled_time(resample_period=SHORT, **PAIR)
+            get_n_last_sma_df(200, 50, resample_period=SHORT, **PAIR)
+            get_n_last_ann_classif_df(4, resample_period=SHORT, **PAIR)
+            get_current_elementory_events_df(time.time() // 3600 * 3600, resample_period=SHORT, **PAIR)
+            get_last_ever_entered_elementory_events_df(time.time(), resample_period=SHORT, **PAIR)
+        self.assertIndexScansOnly(run_queries)
+
+    def test_itt_view_queries(self):
+        # same queries as apps.info_bot.telegram.bot_commands.itt.itt_view
+        def run_queries():
+            Price.objects.filter(transaction_currency='BTC', counter_currency=USDT).order_by('-timestamp').first()
+            Price.objects.filter(source=POLONIEX, transaction_currency='BTC', counter_currency=USDT,
+                                 timestamp__lte=datetime.now() - timedelta(minutes=1440)).order_by('-timestamp').first()
+            Volume.objects.filter(source=POLONIEX, transaction_currency='BTC', counter_currency=USDT).order_by('-timestamp').first()
+            Signal.objects.filter(source=POLONIEX, transaction_currency='BTC', counter_currency=USDT,
+                                  signal='RSI').order_by('-timestamp').first()
+        self.assertIndexScansOnly(run_queries)
+
+    def test_api_queries(self):
+        client = APIClient()
+        startdate = datetime.utcfromtimestamp(time.time() - 24 * 60 * 60).strftime('%Y-%m-%dT%H:%M:%S')
+
+        def run_queries():
+            for endpoint in ('prices', 'volumes', 'resampled-prices', 'rsi', 'signals', 'events-elementary'):
+                response = client.get('/api/v2/{}/ETH?source={}&startdate={}'.format(endpoint, POLONIEX, startdate),
+                                      HTTP_API_KEY=REST_API_SECRET_KEY)
+                self.assertEqual(response.status_code, 200, endpoint)
+        self.assertIndexScansOnly(run_queries)
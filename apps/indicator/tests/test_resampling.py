@@ -0,0 +1,68 @@
+from datetime import datetime
+from unittest import mock
+
+from django.test import TestCase
+
+from apps.indicator.models import Price, PriceResampl, Tick
+from apps.indicator.models.price_resampl import resample_source
+
+from settings import POLONIEX, BINANCE, BTC, USDT, SHORT
+
+
+
+class TestResampleSource(TestCase):
+
+    def setUp(self):
+        self.end_time = 1522069200 # hour boundary
+        prices = [7000000, 7100000, 6900000, 7050000, 7200000]
+        for minute, price in enumerate(prices):
+            timestamp = self.end_time - 59 * 60 + minute * 10 * 60
+            Price.objects.create(source=POLONIEX, transaction_currency='ETH', counter_currency=BTC, price=price, timestamp=timestamp)
+            Price.objects.create(source=POLONIEX, transaction_currency='BTC', counter_currency=USDT, price=price * 1000, timestamp=timestamp)
+        # other source and ticks out of the period are ignored
+        Price.objects.create(source=BINANCE, transaction_currency='ETH', counter_currency=BTC, price=1, timestamp=self.end_time)
+        Price.objects.create(source=POLONIEX, transaction_currency='ETH', counter_currency=BTC, price=1, timestamp=self.end_time + 60)
+
+    def test_same_as_compute(self):
+        self.assertEqual(resample_source(POLONIEX, SHORT, self.end_time), 2)
+        # existing records are not duplicated
+        self.assertEqual(resample_source(POLONIEX, SHORT, self.end_time), 0)
+
+        fields = ('open_price', 'close_price', 'low_price', 'high_price', 'midpoint_price', 'mean_price', 'price_variance', 'price_count')
+        for transaction_currency, counter_currency in (('ETH', BTC), ('BTC', USDT)):
+            resampled = PriceResampl.objects.get(source=POLONIEX, transaction_currency=transaction_currency, counter_currency=counter_currency)
+            self.assertEqual(resampled.timestamp, datetime.utcfromtimestamp(self.end_time))
+
+            expected = PriceResampl(source=POLONIEX, transaction_currency=transaction_currency, counter_currency=counter_currency,
+                                    resample_period=SHORT, timestamp=datetime.utcfromtimestamp(self.end_time))
+            self.assertTrue(expected.compute())
+            for field in fields:
+                self.assertAlmostEqual(getattr(resampled, field), getattr(expected, field), msg=field)
+
+    def test_range(self):
+        self.assertEqual(resample_source(POLONIEX, SHORT, self.end_time + 60, start_time=self.end_time - 59 * 60), 3)
+        first_bar = PriceResampl.objects.get(transaction_currency='ETH', timestamp=datetime.utcfromtimestamp(self.end_time))
+        self.assertEqual(first_bar.price_count, 5)
+
+    def test_window_is_open_at_the_start(self):
+        # a tick at the end of the previous bar is not counted again, as in streamed bars
+        Price.objects.create(source=POLONIEX, transaction_currency='ETH', counter_currency=BTC, price=1, timestamp=self.end_time - 60 * 60)
+        resample_source(POLONIEX, SHORT, self.end_time)
+        resampled = PriceResampl.objects.get(source=POLONIEX, transaction_currency='ETH', counter_currency=BTC)
+        self.assertEqual((resampled.price_count, resampled.low_price), (5, 6900000))
+
+    def test_reads_ticks_when_unified(self):
+        resample_source(POLONIEX, SHORT, self.end_time)
+        expected = list(PriceResampl.objects.order_by('transaction_currency').values_list('close_price', 'low_price', 'price_count'))
+        PriceResampl.objects.all().delete()
+
+        for price in Price.objects.all():
+            Tick.objects.create(source=price.source, transaction_currency=price.transaction_currency,
+                                counter_currency=price.counter_currency, price=price.price, timestamp=price.timestamp)
+        Price.objects.all().delete()
+        # a volume without price is not a tick of the bar
+        Tick.objects.create(source=POLONIEX, transaction_currency='ETH', counter_currency=BTC, volume=1.0, timestamp=self.end_time - 30)
+
+        with mock.patch('apps.indicator.models.price.TICKS_READ_UNIFIED', True):
+            self.assertEqual(resample_source(POLONIEX, SHORT, self.end_time), 2)
+        self.assertEqual(list(PriceResampl.objects.order_by('transaction_currency').values_list('close_price', 'low_price', 'price_count')), expected)
@@ -0,0 +1,60 @@
+import time
+from unittest import mock
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from apps.indicator.models import PriceResampl, SmaWide, Rsi, EventsElementaryBits
+from apps.indicator.models.price_resampl import get_n_last_resampl_df
+from apps.indicator.models.sma import get_n_last_smas_df
+from apps.indicator.series_cache import series_cache, get_series_cache
+
+from settings import POLONIEX, BTC, SHORT
+
+PARAMS = {'source': POLONIEX, 'transaction_currency': 'ETH', 'counter_currency': BTC, 'resample_period': SHORT}
+
+
+@mock.patch.multiple('apps.indicator.models.events_elementary', EMIT_SMA=False, EMIT_RSI=False, RUN_ANN=False)
+@mock.patch('apps.indicator.models.sma.INCREMENTAL_INDICATORS', False) # indicators read bar history, see test_indicator_state
+@mock.patch('apps.indicator.models.rsi.INCREMENTAL_INDICATORS', False)
+class TestSeriesCache(TestCase):
+
+    def setUp(self):
+        # _process_sma_crossovers checks the last bar against the wall clock, keep it within the last minute
+        self.timestamp = time.time() // 60 * 60
+        PriceResampl.objects.bulk_create([
+            PriceResampl(timestamp=self.timestamp - bar * 3600, close_price=7000000 + (bar % 13) * 10000,
+                         low_price=6900000, high_price=7200000, midpoint_price=7050000, **PARAMS)
+            for bar in range(300)])
+
+    def selects_from(self, queries, model):
+        return [query['sql'] for query in queries if query['sql'].startswith('SELECT') and model._meta.db_table in query['sql']]
+
+    def test_one_history_read_per_pair(self):
+        kwargs = dict(PARAMS, timestamp=self.timestamp)
+        with series_cache() as cache, CaptureQueriesContext(connection) as context:
+            SmaWide.compute_all(SmaWide, **kwargs)
+            Rsi.compute_all(Rsi, **kwargs)
+            EventsElementaryBits.check_events(EventsElementaryBits, **kwargs)
+
+        self.assertEqual(len(self.selects_from(context.captured_queries, PriceResampl)), 1)
+        self.assertEqual(len(self.selects_from(context.captured_queries, SmaWide)), 1)
+        self.assertEqual(len(self.selects_from(context.captured_queries, Rsi)), 0)
+        self.assertEqual(cache.stats(), {'hits': 3, 'misses': 2})
+        self.assertIsNone(get_series_cache())
+
+    def test_fresh_rows_are_appended(self):
+        kwargs = dict(PARAMS, timestamp=self.timestamp)
+        SmaWide.compute_all(SmaWide, **dict(kwargs, timestamp=self.timestamp - 3600))
+        with series_cache():
+            self.assertEqual(len(get_n_last_smas_df(5, [50], **PARAMS)), 1)
+            SmaWide.compute_all(SmaWide, **kwargs)
+            with CaptureQueriesContext(connection) as context:
+                smas_df = get_n_last_smas_df(5, [50], price_types=['close'], **PARAMS)
+                self.assertEqual(len(get_n_last_resampl_df(250, **PARAMS)), 250) # read by SmaWide
+            self.assertEqual(len(self.selects_from(context.captured_queries, SmaWide)), 0)
+            self.assertEqual(len(self.selects_from(context.captured_queries, PriceResampl)), 0)
+
+        self.assertEqual(list(smas_df.index), list(get_n_last_smas_df(5, [50], price_types=['close'], **PARAMS).index))
+        self.assertEqual(smas_df['sma50_close_price'].iloc[-1], SmaWide.objects.get(timestamp=self.timestamp).sma50_close_price)
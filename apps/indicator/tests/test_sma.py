@@ -0,0 +1,72 @@
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from django.test import SimpleTestCase, TestCase
+
+from apps.indicator.models import PriceResampl, SmaWide
+from apps.indicator.models.sma import SMA_LIST, SMA_PRICE_TYPES, sma_field_name, sma_window, last_smas, get_n_last_sma_df, get_n_last_smas_df
+
+from settings import POLONIEX, BTC, SHORT
+
+PARAMS = {'source': POLONIEX, 'transaction_currency': 'ETH', 'counter_currency': BTC, 'resample_period': SHORT}
+
+
+
+class TestSmaWide(TestCase):
+
+    def setUp(self):
+        self.timestamp = time.time() // 3600 * 3600
+        self.prices = {price_type: [] for price_type in SMA_PRICE_TYPES}
+        for bar in range(60):
+            price = 7000000 + (bar % 7) * 10000 + bar * 1000
+            bar_prices = {'close': price, 'high': price + 5000, 'midpoint': price + 2500}
+            PriceResampl.objects.create(timestamp=self.timestamp - (59 - bar) * 3600, close_price=bar_prices['close'],
+                                        high_price=bar_prices['high'], midpoint_price=bar_prices['midpoint'], **PARAMS)
+            for price_type in SMA_PRICE_TYPES:
+                self.prices[price_type].append(bar_prices[price_type])
+
+    def test_same_as_rolling_mean_per_period(self):
+        SmaWide.compute_all(SmaWide, timestamp=self.timestamp, **PARAMS)
+        sma_wide = SmaWide.objects.get()
+
+        for sma_period in SMA_LIST:
+            window, min_periods = sma_window(sma_period)
+            for price_type in SMA_PRICE_TYPES:
+                expected = pd.Series(self.prices[price_type]).rolling(window=window, min_periods=min_periods).mean().iloc[-1]
+                self.assertEqual(sma_wide.get_sma(sma_period, price_type), None if np.isnan(expected) else int(expected),
+                                 msg=sma_field_name(sma_period, price_type))
+
+    def test_readers(self):
+        SmaWide.compute_all(SmaWide, timestamp=self.timestamp - 3600, **PARAMS)
+        SmaWide.compute_all(SmaWide, timestamp=self.timestamp, **PARAMS)
+        sma_wide = SmaWide.objects.get(timestamp=self.timestamp)
+
+        sma_df = get_n_last_sma_df(10, 20, **PARAMS)
+        self.assertEqual(list(sma_df.columns), ['sma_close_price', 'sma_midpoint_price'])
+        self.assertEqual(list(sma_df.index), [datetime.utcfromtimestamp(self.timestamp - 3600), datetime.utcfromtimestamp(self.timestamp)])
+        self.assertEqual(sma_df['sma_close_price'].iloc[-1], sma_wide.sma20_close_price)
+
+        smas_df = get_n_last_smas_df(10, [50, 200], price_types=['close'], **PARAMS)
+        self.assertEqual(list(smas_df.columns), ['sma50_close_price', 'sma200_close_price'])
+        self.assertEqual(smas_df['sma50_close_price'].iloc[-1], sma_wide.sma50_close_price)
+
+
+class TestLastSmas(SimpleTestCase):
+
+    def test_same_as_rolling_mean(self):
+        values = np.array([[7000000 + (bar * 7919 % 1000) * 100, 7100000 + bar, np.nan if bar % 5 == 0 else 7050000 + bar]
+                           for bar in range(230)], dtype=np.float64)
+        values[-3:, 1] = np.nan
+
+        for rows in (230, 60, 8, 1): # windows longer than the series too
+            smas = last_smas(values[:rows], SMA_LIST)
+            for period_index, sma_period in enumerate(SMA_LIST):
+                window, min_periods = sma_window(sma_period)
+                for column in range(values.shape[1]):
+                    expected = pd.Series(values[:rows, column]).rolling(window=window, min_periods=min_periods).mean().iloc[-1]
+                    if np.isnan(expected):
+                        self.assertTrue(np.isnan(smas[period_index, column]), msg=(rows, sma_period, column))
+                    else:
+                        self.assertEqual(int(smas[period_index, column]), int(expected), msg=(rows, sma_period, column))
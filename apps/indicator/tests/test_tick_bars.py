@@ -0,0 +1,69 @@
+import time
+from datetime import datetime
+from unittest import mock
+
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from apps.indicator.management.commands.compact_ticks import compact_ticks
+from apps.indicator.models import Price, Volume, TickBar
+from apps.indicator.models.price import get_n_last_prices_ts
+from apps.indicator.models.volume import get_n_last_volumes_ts
+
+from settings import POLONIEX, BTC, REST_API_SECRET_KEY, BARS_BACKFILL_DAYS
+
+PAIR = {'source': POLONIEX, 'transaction_currency': 'ETH', 'counter_currency': BTC}
+
+
+@mock.patch('apps.indicator.models.tick_bar.TICKS_COMPACT_AFTER_DAYS', 3)
+class TestTickCompaction(TestCase):
+
+    def setUp(self):
+        self.bar_start = (time.time() - 4 * 24 * 60 * 60) // 600 * 600
+        for minute, (price, volume) in enumerate([(7000000, 10.0), (7100000, 20.0), (7300000, 60.0)]):
+            Price.objects.create(price=price, timestamp=self.bar_start + minute * 60, **PAIR)
+            Volume.objects.create(volume=volume, timestamp=self.bar_start + minute * 60, **PAIR)
+        self.recent = time.time() - 60
+        Price.objects.create(price=7500000, timestamp=self.recent, **PAIR)
+        Volume.objects.create(volume=5.0, timestamp=self.recent, **PAIR)
+
+    def test_compact(self):
+        self.assertEqual(compact_ticks(older_than_days=3), 1)
+        self.assertEqual(compact_ticks(older_than_days=3), 0)
+
+        bar = TickBar.objects.get(**PAIR)
+        self.assertEqual(bar.timestamp, datetime.utcfromtimestamp(self.bar_start))
+        self.assertEqual((bar.price, bar.price_count, bar.volume, bar.volume_count), (7133333, 3, 30.0, 3))
+        self.assertAlmostEqual(bar.price_variance / 1e10, 2.3333333) # sample variance, like pandas
+        self.assertAlmostEqual(bar.volume_variance, 700.0)
+        # only recent raw ticks are left
+        self.assertEqual(Price.objects.count(), 1)
+        self.assertEqual(Volume.objects.count(), 1)
+
+    def test_ticks_needed_for_backfill_are_kept(self):
+        with self.assertRaises(ValueError):
+            compact_ticks(older_than_days=BARS_BACKFILL_DAYS)
+        self.assertEqual(Price.objects.count(), 4)
+
+    def test_readers_use_bars_for_compacted_history(self):
+        compact_ticks(older_than_days=3)
+        five_days = 5 * 24 * 60
+
+        prices = get_n_last_prices_ts(five_days, **PAIR)
+        self.assertEqual(list(prices.values), [7133333, 7500000])
+        self.assertEqual(list(get_n_last_volumes_ts(five_days, **PAIR).values), [30.0, 5.0])
+        # recent ranges don't touch bars
+        self.assertEqual(list(get_n_last_prices_ts(60, **PAIR).values), [7500000])
+
+    def test_api_pages_through_both_tiers(self):
+        compact_ticks(older_than_days=3)
+        client = APIClient()
+
+        response = client.get('/api/v2/prices/ETH?source={}'.format(POLONIEX), HTTP_API_KEY=REST_API_SECRET_KEY)
+        self.assertEqual([result['price'] for result in response.data['results']], [7500000])
+        response = client.get(response.data['next'], HTTP_API_KEY=REST_API_SECRET_KEY)
+        self.assertEqual([result['price'] for result in response.data['results']], [7133333])
+        self.assertIsNone(response.data['next'])
+
+        response = client.get('/api/v2/prices/?transaction_currency=ETH', HTTP_API_KEY=REST_API_SECRET_KEY)
+        self.assertEqual([result['price'] for result in response.data['results']], [7500000, 7133333])
@@ -7,7 +7,8 @@ from telegram import ParseMode
 
 from cache_memoize import cache_memoize
 
-from apps.indicator.models import Price, Volume
+from apps.indicator.models import Volume
+from apps.indicator.models.price import price_ticks
 from settings import COUNTER_CURRENCY_CHOICES, COUNTER_CURRENCIES, LOCAL
 
 #from apps.info_bot.telegram.bot_commands.itt import currency_info
@@ -51,9 +52,9 @@ def get_currency_pairs(source='all', period_in_seconds=2*60*60, counter_currency
     """
     get_from_time = time.time() - period_in_seconds
     if source == 'all':
-        price_objects = Price.objects.values('transaction_currency', 'counter_currency').filter(timestamp__gte=get_from_time).distinct()
+        price_objects = price_ticks().values('transaction_currency', 'counter_currency').filter(timestamp__gte=get_from_time).distinct()
     else:
-        price_objects = Price.objects.values('transaction_currency', 'counter_currency').filter(source=source).filter(timestamp__gte=get_from_time).distinct()
+        price_objects = price_ticks().values('transaction_currency', 'counter_currency').filter(source=source).filter(timestamp__gte=get_from_time).distinct()
     if counter_currency_format == "index":
         currency_pairs = [(item['transaction_currency'], item['counter_currency']) for item in price_objects]
     else:
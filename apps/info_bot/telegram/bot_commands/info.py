@@ -5,6 +5,7 @@ info - list of supported coins, trading pairs and exchanges
 
 from telegram import ParseMode
 
+from apps.common.utilities.db_router import use_replica
 from taskapp.helpers import get_exchanges, get_source_name
 from apps.info_bot.helpers import get_currency_pairs
 
@@ -12,6 +13,7 @@ from settings import LOCAL
 
 
 
+@use_replica()
 def info_view(update):
     view = f'Hello, hello, {update.message.from_user.first_name}!\n\n'
 
@@ -11,7 +11,9 @@ from telegram import ParseMode
 from settings import INFO_BOT_CRYPTOPANIC_API_TOKEN, INFO_BOT_CACHE_TELEGRAM_BOT_SECONDS
 from settings import COUNTER_CURRENCIES
 
-from apps.indicator.models import Price, Volume
+from apps.common.utilities.db_router import use_replica
+from apps.indicator.models.price import price_ticks
+from apps.indicator.models.volume import volume_ticks
 from apps.signal.models import Signal
 
 from apps.info_bot.helpers import format_currency, format_timestamp, parse_telegram_cryptocurrency_args
@@ -59,6 +61,7 @@ def sentiment_from_cryptopanic(currency):
 
 ## New helpers
 @cache_memoize(INFO_BOT_CACHE_TELEGRAM_BOT_SECONDS)
+@use_replica()
 def itt_view(trading_pair):
     view = ''
 
@@ -71,12 +74,12 @@ def itt_view(trading_pair):
     currency = trading_pair['transaction_currency']
 
     # Price section
-    price_new_object = Price.objects.filter(
+    price_new_object = price_ticks().filter(
         transaction_currency=currency, counter_currency=counter_currency
         ).order_by('-timestamp').first()
 
     source = price_new_object.source
-    price_24h_old_object = Price.objects.filter(
+    price_24h_old_object = price_ticks().filter(
         source=source, transaction_currency=currency, counter_currency=counter_currency,
         timestamp__lte=price_new_object.timestamp - timedelta(minutes=1440)
         ).order_by('-timestamp').first()
@@ -87,7 +90,7 @@ def itt_view(trading_pair):
     view += f" *{diff_symbol(percents_price_diff_24h)}*\n24hr Change: {'{:+.2f}%'.format(percents_price_diff_24h)}"
 
     # Volume section
-    volume_object = Volume.objects.filter(
+    volume_object = volume_ticks().filter(
         source=source, transaction_currency=currency, counter_currency=counter_currency,
         ).order_by('-timestamp').first()
     view += f"\nVolume: {format_currency(volume_object.volume, in_satoshi=False)} {trading_pair['counter_currency']}"
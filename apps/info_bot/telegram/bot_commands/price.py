@@ -11,7 +11,8 @@ from telegram import ParseMode
 
 from settings import COUNTER_CURRENCIES, LOCAL
 
-from apps.indicator.models import Price
+from apps.common.utilities.db_router import use_replica
+from apps.indicator.models.price import price_ticks
 from apps.signal.models import Signal
 
 from apps.info_bot.helpers import (default_counter_currency_for, format_currency, format_timestamp,
@@ -22,6 +23,7 @@ from taskapp.helpers import get_source_name, get_exchanges
 
 
 
+@use_replica()
 def price_view(trading_pair):
     view = ''
 
@@ -35,7 +37,7 @@ def price_view(trading_pair):
 
     exchanges = get_exchanges()
 
-    last_prices_object = Price.objects.filter(
+    last_prices_object = price_ticks().filter(
         source__in=exchanges,
         transaction_currency=currency, counter_currency=counter_currency
         ).order_by('-timestamp')[:len(exchanges)]
@@ -10,7 +10,7 @@ from datetime import datetime
 from django.db.models.signals import post_save, pre_save
 
 from apps.common.behaviors import Timestampable
-from apps.indicator.models import Price
+from apps.indicator.models.price import price_ticks
 from settings import QUEUE_NAME, AWS_OPTIONS, BETA_QUEUE_NAME, TEST_QUEUE_NAME, PERIODS_LIST
 from settings import SOURCE_CHOICES, POLONIEX, COUNTER_CURRENCY_CHOICES, BTC
 from settings import SNS_SIGNALS_TOPIC_ARN, EMIT_SIGNALS
@@ -67,6 +67,11 @@ class Signal(Timestampable, models.Model):
 
     sent_at = UnixTimeStampField(use_numeric=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['source', 'counter_currency', 'transaction_currency', 'timestamp']),
+        ]
+
     # MODEL PROPERTIES
 
 
@@ -76,7 +81,7 @@ class Signal(Timestampable, models.Model):
         if self.price and self.price_change:
             return self.price
 
-        price_object = Price.objects.filter(transaction_currency=self.transaction_currency,
+        price_object = price_ticks().filter(transaction_currency=self.transaction_currency,
                                             source=self.source,
                                             counter_currency = self.counter_currency,
                                             timestamp__lte=self.timestamp
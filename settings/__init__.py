@@ -115,6 +115,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.cache.FetchFromCacheMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'apps.common.utilities.db_router.ReplicaMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware', # for static files
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -126,6 +127,13 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = 'settings.urls'
 
+# Read replicas for API, info bot and exports, see apps.common.utilities.db_router
+# aliases of DATABASES, set in vendor_services_settings.py or local_settings.py
+REPLICA_DATABASES = []
+REPLICA_MAX_LAG_SECONDS = int(os.environ.get("REPLICA_MAX_LAG_SECONDS", 30)) # read from primary when replicas are behind
+REPLICA_URL_PREFIXES = ['/api/'] # GET requests read from replicas
+DATABASE_ROUTERS = ['apps.common.utilities.db_router.ReplicaRouter']
+
 TEMPLATES = [{
     'BACKEND': 'django.template.backends.django.DjangoTemplates',
     'DIRS': [os.path.join(SITE_ROOT, 'templates'), ],
@@ -271,6 +279,20 @@ EMIT_SMA = True
 EMIT_RSI = True
 RUN_ANN = True
 
+# unified Tick table migration: write Price/Volume too until all readers use Tick
+TICKS_WRITE_LEGACY = os.environ.get("TICKS_WRITE_LEGACY", "true").lower() == "true"
+TICKS_READ_UNIFIED = os.environ.get("TICKS_READ_UNIFIED", "false").lower() == "true"
+if not TICKS_WRITE_LEGACY and not TICKS_READ_UNIFIED:
+    raise Exception("TICKS_WRITE_LEGACY=false needs TICKS_READ_UNIFIED=true, otherwise resampling and all readers of Price and Volume get no new ticks.")
+# drop Price/Volume/Tick partitions older than that, 0 to keep all history
+TICKS_RETENTION_DAYS = int(os.environ.get("TICKS_RETENTION_DAYS", 0))
+# replace ticks older than that with 10 minute TickBar rows, 0 to keep raw ticks; more than BARS_BACKFILL_DAYS, bars are backfilled from raw ticks
+TICKS_COMPACT_AFTER_DAYS = int(os.environ.get("TICKS_COMPACT_AFTER_DAYS", 0))
+# scheduled indicator runs fill missing resampled bars that far back, see backfill_bars command
+BARS_BACKFILL_DAYS = int(os.environ.get("BARS_BACKFILL_DAYS", 2))
+# update SmaWide and Rsi from a stored state with each new bar instead of recomputing them from bar history
+INCREMENTAL_INDICATORS = os.environ.get("INCREMENTAL_INDICATORS", "true").lower() == "true"
+
 EMIT_SIGNALS = os.environ.get("EMIT_SIGNALS", "true").lower() == "true" # emit if no variable set or when it set to 'true', env variables are strings
 
 # @Alexander REST Framework settings
@@ -11,8 +11,19 @@ DATABASES = {
         'PASSWORD': '',
         'HOST':     'localhost',
         'PORT':     '5432',
-    }
+    },
+    # optional read replica, see REPLICA_DATABASES
+    # 'replica': {
+    #     'ENGINE':   'django.db.backends.postgresql_psycopg2',
+    #     'NAME':     '',
+    #     'USER':     '',
+    #     'PASSWORD': '',
+    #     'HOST':     'localhost',
+    #     'PORT':     '5433',
+    #     'TEST':     {'MIRROR': 'default'}, # tests write to default and read the same data through replica
+    # },
 }
+# REPLICA_DATABASES = ['replica']
 
 
 DEFAULT_FILE_STORAGE = 'storages.backends.s3boto.S3BotoStorage'
@@ -49,6 +49,13 @@ if not LOCAL:
         }
     }
 
+    # read replicas, comma separated RDS_REPLICA_HOSTNAMES, same credentials as the primary
+    REPLICA_DATABASES = []
+    for replica_number, replica_hostname in enumerate(filter(None, os.environ.get('RDS_REPLICA_HOSTNAMES', '').split(','))):
+        replica_alias = 'replica_{}'.format(replica_number)
+        DATABASES[replica_alias] = dict(DATABASES['default'], HOST=replica_hostname.strip())
+        REPLICA_DATABASES.append(replica_alias)
+
 # Memcached Cloud settings
 # https://devcenter.heroku.com/articles/memcachedcloud
 def get_cache():
@@ -7,6 +7,7 @@ from celery.schedules import crontab
 from celery.signals import worker_ready
 
 from settings import INFO_BOT_CACHE_TELEGRAM_BOT_SECONDS, SHORT, MEDIUM, LONG
+from settings import TICKS_COMPACT_AFTER_DAYS
 
 
 
@@ -69,6 +70,21 @@ def setup_periodic_tasks(sender, **kwargs):
         name='daily at midnight',
         )
 
+    # create upcoming tick partitions and apply retention daily, well before a new week starts
+    sender.add_periodic_task(
+        crontab(minute=30, hour=1),
+        tasks.maintain_tick_partitions.s(),
+        name='daily tick partitions maintenance',
+        )
+
+    # replace old raw ticks with 10 minute bars, before partitions maintenance
+    if TICKS_COMPACT_AFTER_DAYS:
+        sender.add_periodic_task(
+            crontab(minute=0, hour=1),
+            tasks.compact_ticks.s(),
+            name='daily tick compaction',
+            )
+
     # Precache info_bot every 4 hours
     #sender.add_periodic_task(INFO_BOT_CACHE_TELEGRAM_BOT_SECONDS, tasks.precache_info_bot.s(), name='every %is' % INFO_BOT_CACHE_TELEGRAM_BOT_SECONDS)
 
@@ -1,24 +1,23 @@
-import json
 import logging
 import time
 
 from requests import get, RequestException
 
+from apps.channel.ingestion import save_ticks
 from apps.channel.models import ExchangeData
-from apps.indicator.models import Price, Volume
-from apps.indicator.models.price import get_currency_value_from_string
-from apps.indicator.models.price_resampl import get_first_resampled_time
-
-from apps.indicator.models.price_resampl import PriceResampl
-from apps.indicator.models.sma import Sma
+from apps.common.utilities.db import to_epoch
+from apps.indicator.models.price import price_ticks
+from apps.indicator.models.price_resampl import resample_source, backfill_bars
+from apps.indicator.models.sma import SmaWide
 from apps.indicator.models.rsi import Rsi
 from apps.indicator.models.ann_future_price_classification import AnnPriceClassification
-from apps.indicator.models.events_elementary import EventsElementary
+from apps.indicator.models.events_elementary import EventsElementaryBits
 from apps.indicator.models.events_logical import EventsLogical
+from apps.indicator.series_cache import series_cache
 
 from apps.ai.models.nn_model import get_ann_model_object
 
-from settings import SHORT, MEDIUM, LONG, RUN_ANN
+from settings import SHORT, MEDIUM, LONG, RUN_ANN, BARS_BACKFILL_DAYS
 from settings import SOURCE_CHOICES, EXCHANGE_MARKETS
 
 
@@ -35,7 +34,7 @@ def get_currency_pairs(source, period_in_seconds):
     Return: [('BTC', 0), ('PINK', 0), ('ETH', 0),....]
     """
     get_from_time = time.time() - period_in_seconds
-    price_objects = Price.objects.values('transaction_currency', 'counter_currency').filter(source=source).filter(timestamp__gte=get_from_time).distinct()
+    price_objects = price_ticks().values('transaction_currency', 'counter_currency').filter(source=source).filter(timestamp__gte=get_from_time).distinct()
     return [(item['transaction_currency'], item['counter_currency']) for item in price_objects]
 
 def get_source_name(source_code):
@@ -49,42 +48,49 @@ def _pull_poloniex_data(source):
     data = req.json()
     timestamp = time.time()
 
-    poloniex_data_point = ExchangeData.objects.create(
-        source=source,
-        data=json.dumps(data),
-        timestamp=timestamp
-    )
+    poloniex_data_point = ExchangeData(source=source, timestamp=timestamp)
+    poloniex_data_point.set_payload(data) # keep raw ticker compressed
+    poloniex_data_point.save()
     logger.info("Saving Poloniex price, volume data...")
     _save_prices_and_volumes(data, timestamp, source)
 
 def _save_prices_and_volumes(data, timestamp, source):
-    for currency_pair in data:
-        try:
-            counter_currency_string = currency_pair.split('_')[0]
-            counter_currency = get_currency_value_from_string(counter_currency_string)
-            assert counter_currency >= 0
-            transaction_currency_string = currency_pair.split('_')[1]
-            assert len(transaction_currency_string) > 1 and len(transaction_currency_string) <= 6
-
-            Price.objects.create(
-                source=source,
-                transaction_currency=transaction_currency_string,
-                counter_currency=counter_currency,
-                price=int(float(data[currency_pair]['last']) * 10 ** 8),
-                timestamp=timestamp
-            )
-
-            Volume.objects.create(
-                source=source,
-                transaction_currency=transaction_currency_string,
-                counter_currency=counter_currency,
-                volume=float(data[currency_pair]['baseVolume']),
-                timestamp=timestamp
-            )
-        except Exception as e:
-            logger.debug(str(e))
-
-    logger.debug("Saved Poloniex price and volume data")
+    "Save a Poloniex ticker to Tick (and Price and Volume, see save_ticks) with one bulk insert per table"
+    saved = save_ticks(_ticker_items(data, timestamp, source))
+    logger.debug("Saved Poloniex price and volume data: {}".format(saved))
+    return saved
+
+def replay_exchange_data(source, start_time, end_time):
+    """
+    Reprocess archived raw tickers from ExchangeData between start_time and end_time (unix timestamps).
+    Ticks saved already are skipped, so a range can be replayed again.
+    Return counts of save_ticks summed over all tickers, and number of tickers: {'tickers': 60, 'prices': 1200, ...}
+    """
+    archived = ExchangeData.objects.filter(
+        source=source,
+        timestamp__gte=start_time,
+        timestamp__lte=end_time
+    ).order_by('timestamp')
+
+    counts = {'tickers': 0, 'ticks': 0, 'prices': 0, 'volumes': 0, 'duplicates': 0, 'rejected': 0}
+    for exchange_data in archived.iterator():
+        saved = save_ticks(_ticker_items(exchange_data.payload, to_epoch(exchange_data.timestamp), source))
+        for key, value in saved.items():
+            counts[key] += value
+        counts['tickers'] += 1
+    logger.info("Replayed archived tickers for {}: {}".format(get_source_name(source), counts))
+    return counts
+
+def _ticker_items(data, timestamp, source):
+    "Poloniex ticker {'BTC_ETH': {'last': '0.07', 'baseVolume': '1234.5'}, ...} as items in the standart format of poll_queue"
+    source_name = get_source_name(source)
+    items = []
+    for currency_pair, ticker in data.items():
+        counter_currency, _, transaction_currency = currency_pair.partition('_')
+        symbol = '{}/{}'.format(transaction_currency, counter_currency)
+        items.append({'source': source_name, 'category': 'price', 'symbol': symbol, 'value': ticker.get('last'), 'timestamp': timestamp})
+        items.append({'source': source_name, 'category': 'volume', 'symbol': symbol, 'value': ticker.get('baseVolume'), 'timestamp': timestamp})
+    return items
 
 # def get_exchanges():
 #     """
@@ -98,7 +104,11 @@ def _save_prices_and_volumes(data, timestamp, source):
 
 def _compute_and_save_indicators(source, resample_period):
 
-    timestamp = time.time() // (1 * 60) * (1 * 60)   # rounded to a minute
+    start_time = time.time()
+    # the last period boundary, so bars fall on the same grid as streamed and backfilled ones:
+    # a run queued at 01:02 saves the 01:00 bar covering (00:00, 01:00], not an overlapping 01:02 one
+    period_seconds = resample_period * 60
+    timestamp = start_time // period_seconds * period_seconds
 
     logger.info("################# Resampling with Period: " + str(resample_period) + ", Source:" + str(source) + " #######################")
 
@@ -119,97 +129,69 @@ def _compute_and_save_indicators(source, resample_period):
     pairs_to_iterate = get_currency_pairs(source=source, period_in_seconds=resample_period*60*2)
     #logger.debug("## Pairs to iterate: " + str(pairs_to_iterate))
 
-    for transaction_currency, counter_currency in pairs_to_iterate:
-        logger.info('   ======== EXCHANGE: ' + str(source) + '| period: ' + str(resample_period)+ '| checking COIN: ' + str(transaction_currency) + ' with BASE_COIN: ' + str(counter_currency))
-
-        # create a dictionary of parameters to improve readability
-        indicator_params_dict = {
-            'timestamp': timestamp,
-            'source': source,
-            'transaction_currency': transaction_currency,
-            'counter_currency': counter_currency,
-            'resample_period': resample_period
-        }
+    # fill bars missed during outages, the first run fills the whole BARS_BACKFILL_DAYS
+    try:
+        backfill_bars(source, resample_period, timestamp - BARS_BACKFILL_DAYS * 24 * 60 * 60, timestamp - 1)
+    except Exception as e:
+        logger.error(" -> Back RESAMPLE EXCEPTION: " + str(e))
+
+    # resample prices of all pairs with one query, bars already saved by poll_queue --stream-bars are kept
+    try:
+        resampled = resample_source(source, resample_period, timestamp)
+        logger.info("  ... Resampled {} pairs,  ELAPSED Time: {}".format(resampled, time.time() - start_time))
+    except Exception as e:
+        logger.error(" -> RESAMPLE EXCEPTION: " + str(e))
+
+    # every history is read once per pair, indicators and events share it
+    with series_cache() as cache:
+        for transaction_currency, counter_currency in pairs_to_iterate:
+            cache.clear() # keep memory flat, histories of the previous pair are not read again
+            logger.info('   ======== EXCHANGE: ' + str(source) + '| period: ' + str(resample_period)+ '| checking COIN: ' + str(transaction_currency) + ' with BASE_COIN: ' + str(counter_currency))
+
+            # create a dictionary of parameters to improve readability
+            indicator_params_dict = {
+                'timestamp': timestamp,
+                'source': source,
+                'transaction_currency': transaction_currency,
+                'counter_currency': counter_currency,
+                'resample_period': resample_period
+            }
+
+
+            # calculate and save simple indicators
+            indicators_list = [SmaWide, Rsi]
+            for ind in indicators_list:
+                try:
+                    ind.compute_all(ind, **indicator_params_dict)
+                    logger.debug("  ... Regular indicators completed,  ELAPSED Time: " + str(time.time() - start_time))
+                except Exception as e:
+                    logger.error(str(ind) + " Indicator Exception: " + str(e))
 
 
-        ################# BACK CALCULATION (need only once when run first time)
-        BACK_REC = 5   # how many records to calculate back in time
-        BACK_TIME = timestamp - BACK_REC * resample_period * 60  # same in sec
+            # calculate ANN indicator(s)
+            # TODO: now run only for a short period, since it is not really tuned for other periods
+            if (RUN_ANN) and (resample_period==SHORT):
+                # TODO: just form X_predicted here and then run prediction outside the loop !
+                try:
+                    if ann_model_object:
+                        AnnPriceClassification.compute_all(AnnPriceClassification, ann_model_object, **indicator_params_dict)
+                        logger.info("  ... ANN indicators completed,  ELAPSED Time: " + str(time.time() - start_time))
+                    else:
+                        logger.error(" No ANN model, calculation does not make sence")
+                except Exception as e:
+                    logger.error("ANN Indicator Exception (ANN has not been calculated): " + str(e))
 
-        last_time_computed = get_first_resampled_time(source, transaction_currency, counter_currency, resample_period)
-        records_to_compute = int((last_time_computed-BACK_TIME)/(resample_period * 60))
 
-        if records_to_compute >= 0:
-            logger.info("  ... calculate resampl back in time, needed records: " + str(records_to_compute))
-            for idx in range(1, records_to_compute):
-                time_point_back = last_time_computed - idx * (resample_period * 60)
-                # round down to the closest hour
-                indicator_params_dict['timestamp'] = time_point_back // (60 * 60) * (60 * 60)
 
+            ##############################
+            # check for events and save if any
+            events_list = [EventsElementaryBits, EventsLogical]
+            for event in events_list:
                 try:
-                    resample_object = PriceResampl.objects.create(**indicator_params_dict)
-                    status = resample_object.compute()
-                    if status or (idx == records_to_compute-1) : # leave the last empty record
-                        resample_object.save()
-                    else:
-                        resample_object.delete()  # delete record if no price was added
+                    event.check_events(event, **indicator_params_dict)
+                    logger.debug("  ... Events completed,  ELAPSED Time: " + str(time.time() - start_time))
                 except Exception as e:
-                    logger.error(" -> Back RESAMPLE EXCEPTION: " + str(e))
-
-            logger.debug("... resample back  - DONE.")
-        else:
-            logger.debug("   ... No back calculation needed")
-
-        # set time back to a current time
-        indicator_params_dict['timestamp'] = timestamp
-        ################# Can be commented after first time run
-
-
-        # calculate and save resampling price
-        # todo - prevent adding an empty record if no value was computed (static method below)
-        try:
-            resample_object = PriceResampl.objects.create(**indicator_params_dict)
-            resample_object.compute()
-            resample_object.save()
-            logger.debug("  ... Resampled completed,  ELAPSED Time: " + str(time.time() - timestamp))
-        except Exception as e:
-            logger.error(" -> RESAMPLE EXCEPTION: " + str(e))
-
-
-        # calculate and save simple indicators
-        indicators_list = [Sma, Rsi]
-        for ind in indicators_list:
-            try:
-                ind.compute_all(ind, **indicator_params_dict)
-                logger.debug("  ... Regular indicators completed,  ELAPSED Time: " + str(time.time() - timestamp))
-            except Exception as e:
-                logger.error(str(ind) + " Indicator Exception: " + str(e))
-
-
-        # calculate ANN indicator(s)
-        # TODO: now run only for a short period, since it is not really tuned for other periods
-        if (RUN_ANN) and (resample_period==SHORT):
-            # TODO: just form X_predicted here and then run prediction outside the loop !
-            try:
-                if ann_model_object:
-                    AnnPriceClassification.compute_all(AnnPriceClassification, ann_model_object, **indicator_params_dict)
-                    logger.info("  ... ANN indicators completed,  ELAPSED Time: " + str(time.time() - timestamp))
-                else:
-                    logger.error(" No ANN model, calculation does not make sence")
-            except Exception as e:
-                logger.error("ANN Indicator Exception (ANN has not been calculated): " + str(e))
-
-
-
-        ##############################
-        # check for events and save if any
-        events_list = [EventsElementary, EventsLogical]
-        for event in events_list:
-            try:
-                event.check_events(event, **indicator_params_dict)
-                logger.debug("  ... Events completed,  ELAPSED Time: " + str(time.time() - timestamp))
-            except Exception as e:
-                logger.error(" Event Exception: " + str(e))
+                    logger.error(" Event Exception: " + str(e))
 
     if RUN_ANN:
         # clean session to prevent memory leak
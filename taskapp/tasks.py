@@ -22,6 +22,18 @@ def compute_and_save_indicators(source, resample_period):
     _compute_and_save_indicators(source=source, resample_period=resample_period)
 
 
+@celery_app.task(retry=False)
+def maintain_tick_partitions():
+    from apps.indicator.management.commands.manage_tick_partitions import maintain_tick_partitions
+    maintain_tick_partitions()
+
+
+@celery_app.task(retry=False)
+def compact_ticks():
+    from apps.indicator.management.commands.compact_ticks import compact_ticks
+    compact_ticks()
+
+
 @shared_task
 def precache_info_bot():
     from apps.info_bot.helpers import precache_currency_info_for_info_bot
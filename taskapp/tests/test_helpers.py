@@ -1,9 +1,16 @@
 import logging
+import time
 import unittest
+from unittest import mock
 
-from django.test import SimpleTestCase
+from django.test import SimpleTestCase, TestCase
 
-from taskapp.helpers import get_source_name
+from apps.channel.models import ExchangeData
+from apps.indicator.models import Price, Volume, Tick
+from taskapp.helpers import get_source_name, replay_exchange_data, get_currency_pairs, _save_prices_and_volumes
+from taskapp.helpers import _compute_and_save_indicators
+
+from settings import POLONIEX, BTC, USDT, MEDIUM
 
 
 
@@ -14,4 +21,57 @@ class TestHelpers(SimpleTestCase):
         self.assertEqual(get_source_name(2), 'binance')
 
 
- 
\ No newline at end of file
+ 
+
+class TestReplayExchangeData(TestCase):
+
+    def setUp(self):
+        for timestamp in (1522066118, 1522066178):
+            exchange_data = ExchangeData(source=POLONIEX, timestamp=timestamp)
+            exchange_data.set_payload({'BTC_ETH': {'last': '0.07', 'baseVolume': '1234.5'},
+                                       'USDT_BTC': {'last': '8000.5', 'baseVolume': '10'},
+                                       'BTC_BROKEN': {'baseVolume': '1'}})
+            exchange_data.save()
+
+    def test_replay(self):
+        counts = replay_exchange_data(POLONIEX, 1522066000, 1522066200)
+        self.assertEqual((counts['tickers'], counts['prices'], counts['volumes'], counts['rejected']), (2, 4, 6, 2))
+        price = Price.objects.get(transaction_currency='ETH', timestamp=1522066118)
+        self.assertEqual((price.counter_currency, price.price), (BTC, 7000000))
+        self.assertEqual(Volume.objects.get(transaction_currency='BTC', timestamp=1522066178).volume, 10.0)
+
+    def test_replay_again_skips_saved_ticks(self):
+        replay_exchange_data(POLONIEX, 1522066000, 1522066200)
+        counts = replay_exchange_data(POLONIEX, 1522066000, 1522066200)
+        self.assertEqual((counts['prices'], counts['volumes'], counts['duplicates']), (0, 0, 16))
+        self.assertEqual(Price.objects.count(), 4)
+
+
+class TestPoloniexTicks(TestCase):
+
+    def test_saved_to_all_tables(self):
+        timestamp = time.time()
+        counts = _save_prices_and_volumes({'BTC_ETH': {'last': '0.07', 'baseVolume': '1234.5'},
+                                           'USDT_BTC': {'last': '8000.5', 'baseVolume': '10'}}, timestamp, POLONIEX)
+        self.assertEqual((counts['ticks'], counts['prices'], counts['volumes']), (2, 2, 2))
+        tick = Tick.objects.get(transaction_currency='ETH')
+        self.assertEqual((tick.counter_currency, tick.price, tick.volume), (BTC, 7000000, 1234.5))
+
+        self.assertEqual(sorted(get_currency_pairs(POLONIEX, 60)), [('BTC', USDT), ('ETH', BTC)])
+        Price.objects.filter(transaction_currency='ETH').delete()
+        with mock.patch('apps.indicator.models.price.TICKS_READ_UNIFIED', True):
+            self.assertEqual(sorted(get_currency_pairs(POLONIEX, 60)), [('BTC', USDT), ('ETH', BTC)])
+
+
+class TestComputeAndSaveIndicators(SimpleTestCase):
+
+    @mock.patch('taskapp.helpers.RUN_ANN', False)
+    @mock.patch('taskapp.helpers.get_currency_pairs', return_value=[])
+    @mock.patch('taskapp.helpers.backfill_bars')
+    @mock.patch('taskapp.helpers.resample_source', return_value=0)
+    def test_bars_are_on_the_period_grid(self, resample_source, backfill_bars, get_currency_pairs):
+        # a run queued a few minutes after 04:00 computes the 04:00 bar
+        with mock.patch('taskapp.helpers.time.time', return_value=1522065600 + 125.5):
+            _compute_and_save_indicators(POLONIEX, MEDIUM)
+        resample_source.assert_called_once_with(POLONIEX, MEDIUM, 1522065600)
+        self.assertEqual(backfill_bars.call_args[0][3], 1522065600 - 1)
@@ -20,6 +20,8 @@ from pyqs.utils import decode_message
 PREFETCH_MULTIPLIER = 2
 MESSAGE_DOWNLOAD_BATCH_SIZE = 10
 LONG_POLLING_INTERVAL = 20
+DELETE_BATCH_SIZE = 10  # SQS limit for DeleteMessageBatch
+DELETE_BATCH_MAX_DELAY = 5  # seconds, flush deletes even if the batch is not full
 logger = logging.getLogger("pyqs")
 
 
@@ -99,7 +101,7 @@ class ReadWorker(BaseWorker):
 
 
 class ProcessWorker(BaseWorker):
-    def __init__(self, internal_queue, custom_dispatch_func, connection_args=None, *args, **kwargs):
+    def __init__(self, internal_queue, custom_dispatch_func, connection_args=None, worker_init_func=None, *args, **kwargs):
         super(ProcessWorker, self).__init__(*args, **kwargs)
         if connection_args is None:
             self.conn = get_conn()
@@ -108,10 +110,18 @@ class ProcessWorker(BaseWorker):
         self.internal_queue = internal_queue
         self._messages_to_process_before_shutdown = 100
         self.custom_dispatch_func = custom_dispatch_func
+        self.worker_init_func = worker_init_func  # called in the child process right after fork
+        self._pending_deletes = {}  # queue_id -> receipt handles of processed messages
+        self._first_pending_delete_time = None
 
     def run(self):
         # Set the child process to not receive any keyboard interrupts
+        # and let the manager stop it with should_exit, so in-flight messages are finished
         signal.signal(signal.SIGINT, signal.SIG_IGN)
+        signal.signal(signal.SIGTERM, signal.SIG_IGN)
+
+        if self.worker_init_func is not None:
+            self.worker_init_func()
 
         logger.info("Running ProcessWorker, pid: {}".format(os.getpid()))
         messages_processed = 0
@@ -120,10 +130,41 @@ class ProcessWorker(BaseWorker):
             if processed:
                 messages_processed += 1
             else:
-                # If we have no messages wait a moment before rechecking.
+                # Nothing to do, acknowledge what we have and wait a moment before rechecking.
+                self.flush_deletes()
                 time.sleep(0.001)
+            if self._first_pending_delete_time and time.time() - self._first_pending_delete_time >= DELETE_BATCH_MAX_DELAY:
+                self.flush_deletes()
             if messages_processed >= self._messages_to_process_before_shutdown:
                 self.shutdown()
+        # Recycled or stopped worker must not lose acknowledgements of processed messages
+        self.flush_deletes()
+
+    def delete_message(self, queue_id, receipt_handle):
+        if self._first_pending_delete_time is None:
+            self._first_pending_delete_time = time.time()
+        receipt_handles = self._pending_deletes.setdefault(queue_id, [])
+        receipt_handles.append(receipt_handle)
+        if len(receipt_handles) >= DELETE_BATCH_SIZE:
+            self._delete_message_batch(queue_id, receipt_handles)
+            del self._pending_deletes[queue_id]
+
+    def flush_deletes(self):
+        for queue_id, receipt_handles in self._pending_deletes.items():
+            self._delete_message_batch(queue_id, receipt_handles)
+        self._pending_deletes = {}
+        self._first_pending_delete_time = None
+
+    def _delete_message_batch(self, queue_id, receipt_handles):
+        params = {}
+        for index, receipt_handle in enumerate(receipt_handles, start=1):
+            params['DeleteMessageBatchRequestEntry.{}.Id'.format(index)] = str(index)
+            params['DeleteMessageBatchRequestEntry.{}.ReceiptHandle'.format(index)] = receipt_handle
+        try:
+            self.conn.get_status('DeleteMessageBatch', params, queue_id)
+        except Exception:
+            # Messages will re-appear in the queue after visibility timeout
+            logger.exception("Failed to delete {} messages from queue {}".format(len(receipt_handles), queue_id))
 
     def process_message(self):
         try:
@@ -179,9 +220,8 @@ class ProcessWorker(BaseWorker):
             return True
         else:
             end_time = time.clock()
-            params = {'ReceiptHandle': message.receipt_handle}
-            # This delete line doesn't seem to be working so well.
-            self.conn.get_status('DeleteMessage', params, queue_id)
+            # Deletes are sent with DeleteMessageBatch, see flush_deletes
+            self.delete_message(queue_id, message.receipt_handle)
             logger.info(
                 "Processed task {} in {:.4f} seconds".format(
                     message_info,
@@ -193,7 +233,7 @@ class ProcessWorker(BaseWorker):
 
 class ManagerWorker(object):
 
-    def __init__(self, queue_prefixes, worker_concurrency, custom_dispatch_func, region='us-east-1', access_key_id=None, secret_access_key=None):
+    def __init__(self, queue_prefixes, worker_concurrency, custom_dispatch_func, region='us-east-1', access_key_id=None, secret_access_key=None, worker_init_func=None):
         self.connection_args = {
             "region": region,
             "access_key_id": access_key_id,
@@ -202,6 +242,7 @@ class ManagerWorker(object):
         self.load_queue_prefixes(queue_prefixes)
         self.queues = self.get_queues_from_queue_prefixes(self.queue_prefixes)
         self.custom_dispatch_func = custom_dispatch_func
+        self.worker_init_func = worker_init_func
         self.setup_internal_queue(worker_concurrency)
         self.reader_children = []
         self.worker_children = []
@@ -220,7 +261,10 @@ class ManagerWorker(object):
 
     def _initialize_worker_children(self, number):
         for index in range(number):
-            self.worker_children.append(ProcessWorker(self.internal_queue, connection_args=self.connection_args, custom_dispatch_func=self.custom_dispatch_func))
+            self.worker_children.append(self._new_worker())
+
+    def _new_worker(self):
+        return ProcessWorker(self.internal_queue, connection_args=self.connection_args, custom_dispatch_func=self.custom_dispatch_func, worker_init_func=self.worker_init_func)
 
     def load_queue_prefixes(self, queue_prefixes):
         self.queue_prefixes = queue_prefixes
@@ -303,10 +347,11 @@ class ManagerWorker(object):
                 self.reader_children.append(worker)
 
     def _replace_worker_children(self):
-        for index, worker in enumerate(self.worker_children):
+        # Don't pop from the list while iterating over it, it skips the next dead worker
+        for index, worker in enumerate(list(self.worker_children)):
             if not worker.is_alive():
                 logger.info("Worker Process {} is no longer responding, spawning a new channel.".format(worker.pid))
-                self.worker_children.pop(index)
-                worker = ProcessWorker(self.internal_queue, connection_args=self.connection_args, custom_dispatch_func=self.custom_dispatch_func)
-                worker.start()
-                self.worker_children.append(worker)
+                worker.join()
+                new_worker = self._new_worker()
+                new_worker.start()
+                self.worker_children[index] = new_worker